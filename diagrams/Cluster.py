@@ -1,6 +1,8 @@
+import uuid
+import weakref
 from graphviz import Digraph
 from .Context import Context
-from .utils import setcluster, getcluster, getdiagram
+from .utils import setcluster, getcluster, getdiagram, _diagram
 
 class Cluster(Context):
     # fmt: off
@@ -15,34 +17,33 @@ class Cluster(Context):
 
     # fmt: on
 
-    # FIXME:
-    #  Cluster direction does not work now. Graphviz couldn't render
-    #  correctly for a subgraph that has a different rank direction.
+    # Graphviz couldn't render correctly for a subgraph that has a different
+    # rank direction, so the direction only works with the independent
+    # cluster layout (Diagram cluster_layout).
     def __init__(
         self,
         label: str = "cluster",
-        direction: str = "LR",
+        direction: str = None,
         graph_attr: dict = {},
     ):
         """Cluster represents a cluster context.
 
         :param label: Cluster label.
-        :param direction: Data flow direction. Default is 'left to right'.
+        :param direction: Data flow direction. Default is the direction of
+            the parent cluster or diagram. Only honored by the independent
+            cluster layout, see the `cluster_layout` of Diagram.
         :param graph_attr: Provide graph_attr dot config attributes.
         """
         self.nodes = {}
         self.subgraphs = []
         self.label = label
-        super().__init__("cluster_" + self.label)
+        # The subgraph name must be unique, otherwise the clusters having
+        # the same label would be merged into one by graphviz.
+        super().__init__("cluster_" + uuid.uuid4().hex)
 
         # Set attributes.
-        for k, v in self._default_graph_attrs.items():
-            self.dot.graph_attr[k] = v
-        self.dot.graph_attr["label"] = self.label
-
-        if not self._validate_direction(direction):
+        if direction is not None and not self._validate_direction(direction):
             raise ValueError(f'"{direction}" is not a valid direction')
-        self.dot.graph_attr["rankdir"] = direction
 
         # Node must be belong to a diagrams.
         try:
@@ -50,6 +51,13 @@ class Cluster(Context):
         except EnvironmentError:
             self._parent = None
 
+        for k, v in self._default_graph_attrs.items():
+            self.dot.graph_attr[k] = v
+        self.dot.graph_attr.update(self.theme.cluster_attr)
+        self.dot.graph_attr["label"] = self.label
+        if direction is not None:
+            self.dot.graph_attr["rankdir"] = direction
+
         # Set cluster depth for distinguishing the background color
         self.depth = self._parent.depth + 1 if self._parent else 0
         coloridx = self.depth % len(self.bgcolors)
@@ -65,7 +73,14 @@ class Cluster(Context):
 
     def __exit__(self, exc_type, exc_value, traceback):
         if self._parent:
+            # A subgraph inherits the graph attributes of its parent,
+            # so there is no need to repeat the same values.
+            inherited = self._parent._effective_graph_attrs()
+            for k, v in list(self.dot.graph_attr.items()):
+                if inherited.get(k) == v:
+                    del self.dot.graph_attr[k]
             self._parent.subgraph(self.dot)
+            _diagram()._record_cluster(self)
 
         if len(self.nodes.values()) > 0:
             for node in self.nodes.values():
@@ -78,6 +93,16 @@ class Cluster(Context):
         setcluster(self._parent)
 
 
+    @property
+    def _parent(self):
+        # The parent is referenced weakly as it holds its children already,
+        # so the built diagrams can be freed without the cyclic GC.
+        return self.__parent() if self.__parent is not None else None
+
+    @_parent.setter
+    def _parent(self, parent):
+        self.__parent = weakref.ref(parent) if parent is not None else None
+
     def node(self, node: "Node") -> None:
         """Create a new node."""
         self.nodes[node.nodeid] = node
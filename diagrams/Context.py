@@ -1,14 +1,35 @@
 from graphviz import Digraph, lang
 from abc import ABC, abstractmethod
+from .Theme import Theme
+
+# The directions of the diagrams and the clusters.
+DIRECTIONS = ("TB", "BT", "LR", "RL")
+# The default background colors of the clusters, cycled by the cluster depth.
+BGCOLORS = ("#E5F5FD", "#EBF3E7", "#ECE8F6", "#FDF7E3")
+
+
+def valid_direction(direction: str) -> bool:
+    return direction.upper() in DIRECTIONS
+
 
 class Context(ABC):
-    __directions = ("TB", "BT", "LR", "RL")
-    __bgcolors = ("#E5F5FD", "#EBF3E7", "#ECE8F6", "#FDF7E3")
+    __bgcolors = BGCOLORS
     __depth = 0
+    __theme = Theme()
+
+    @property
+    def theme(self):
+        # Clusters share the theme of the diagram they belong to.
+        parent = getattr(self, "_parent", None)
+        return parent.theme if parent else self.__theme
+
+    @theme.setter
+    def theme(self, value):
+        self.__theme = value
 
     @property
     def bgcolors(self):
-        return self.__bgcolors
+        return self.theme.bgcolors or self.__bgcolors
 
     @property
     def depth(self):
@@ -31,11 +52,13 @@ class Context(ABC):
         pass
 
     def _validate_direction(self, direction: str) -> bool:
-        direction = direction.upper()
-        for v in self.__directions:
-            if v == direction:
-                return True
-        return False
+        return valid_direction(direction)
+
+    def _effective_graph_attrs(self) -> dict:
+        """Graph attributes in effect for this context, including inherited ones."""
+        parent = getattr(self, "_parent", None)
+        inherited = parent._effective_graph_attrs() if parent else {}
+        return {**inherited, **self.dot.graph_attr}
 
     def node(self, node: "Node") -> None:
         """Create a new node."""
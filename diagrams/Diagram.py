@@ -1,11 +1,40 @@
+import json
 import os
-from graphviz import Digraph
+from graphviz import Digraph, view
 from .Context import Context
-from .utils import setdiagram
+from .Edge import Edge
+from .force import _numpy, force_layout
+from .html import write_html
+from .layout import (
+    compute_cluster_layout,
+    compute_component_layout,
+    compute_layout,
+    export_layout,
+    fit_raster,
+    positioned,
+    raster_size,
+    render_positioned,
+)
+from .Theme import Theme
+from .model import ClusterModel, DiagramModel, EdgeModel, NodeModel, class_path
+from .presets import preset_attrs, preview_enabled
+from .presets import preview as preview_model
+from .svg import absolute_icons_file, embed_icons_file
+from .tiles import render_tiles
+from .utils import resource_dir, setcluster, setdiagram
+
+# The curve styles of the edges.
+CURVESTYLES = ("ortho", "curved")
+
+
+def valid_curvestyle(curvestyle: str) -> bool:
+    return curvestyle.lower() in CURVESTYLES
+
 
 class Diagram(Context):
-    __curvestyles = ("ortho", "curved")
-    __outformats = ("png", "jpg", "svg", "pdf")
+    __outformats = ("png", "jpg", "svg", "pdf", "json", "xdot", "html", "tiles")
+    __oversizes = ("scale", "error")
+    __layout_engines = ("dot", "force")
 
     # fmt: off
     _default_graph_attrs = {
@@ -46,12 +75,24 @@ class Diagram(Context):
         name: str = "",
         filename: str = "",
         direction: str = "LR",
-        curvestyle: str = "ortho",
+        curvestyle: str = None,
         outformat: str = "png",
         show: bool = True,
         graph_attr: dict = {},
         node_attr: dict = {},
         edge_attr: dict = {},
+        theme: Theme = None,
+        layout_cache: "LayoutCache" = None,
+        embed_icons: bool = False,
+        max_pixels: int = None,
+        max_bytes: int = None,
+        oversize: str = "scale",
+        preset: str = None,
+        layout_timeout: float = None,
+        preview: bool = None,
+        parallel_layout: bool = False,
+        cluster_layout: bool = False,
+        layout_engine: str = "dot",
     ):
         """Diagram represents a global diagrams context.
 
@@ -61,11 +102,49 @@ class Diagram(Context):
             If not given, it will be generated from the name.
         :param direction: Data flow direction. Default is 'left to right'.
         :param curvestyle: Curve bending style. One of "ortho" or "curved".
-        :param outformat: Output file format. Default is 'png'.
+            Default is "ortho", or the one of the preset.
+        :param outformat: Output file format. Default is 'png'. The 'json'
+            format writes the layout of the diagram elements, see `layout.export_layout`,
+            and the 'html' format writes an interactive page, see `html.write_html`.
+            The 'tiles' format writes a zoom pyramid of png tiles into the
+            "<filename>_tiles" directory, see `tiles.render_tiles`.
         :param show: Open generated image after save if true, just only save otherwise.
         :param graph_attr: Provide graph_attr dot config attributes.
         :param node_attr: Provide node_attr dot config attributes.
         :param edge_attr: Provide edge_attr dot config attributes.
+        :param theme: Shared attribute defaults for the nodes, edges and clusters.
+        :param layout_cache: Layout cache to reuse the layout of the previous
+            renders if only the presentation attributes have changed.
+        :param embed_icons: Embed the icons into the svg output, each distinct
+            icon once, to make it self-contained.
+        :param max_pixels: The maximum number of pixels of the png and jpg
+            outputs, estimated from the layout before rasterizing.
+        :param max_bytes: The maximum memory in bytes of the png and jpg
+            outputs while rasterizing, estimated from the layout as well.
+        :param oversize: What to do with the outputs over the limits. One of
+            "scale" (lower the dpi to fit) or "error" (raise ValueError).
+        :param preset: Layout preset trading the layout quality for the layout
+            time. One of "quality", "balanced", "fast" or "auto" (picked from
+            the size of the diagram), see `presets`. The curvestyle and the
+            graph_attr override it.
+        :param layout_timeout: Time limit of the layout in seconds. The layout
+            exceeding it is retried with cheaper settings in turn, see
+            `layout.compute_layout`, and the fallback used is set to
+            `layout_fallback`.
+        :param preview: Draw a quick preview without the icons, with straight
+            edges, the least layout effort and at a low resolution. Default
+            is turned on by the DIAGRAMS_PREVIEW environment variable.
+        :param parallel_layout: Lay out the connected components of the
+            diagram in parallel dot processes and pack them into one
+            drawing, see `layout.compute_component_layout`.
+        :param cluster_layout: Lay out each cluster independently in its own
+            direction, in parallel dot processes, see
+            `layout.compute_cluster_layout`. With a layout cache, the
+            unchanged clusters aren't laid out again.
+        :param layout_engine: Layout engine computing the positions. One of
+            "dot" or "force" (the NumPy force-directed engine for the very
+            large diagrams, see `force.force_layout`, which requires the
+            `force` extra). Graphviz draws the diagram in both cases.
         """
 
         if not name and not filename:
@@ -75,34 +154,79 @@ class Diagram(Context):
         self.filename = filename
         super().__init__(name, filename=filename)
         self.edges = {}
+        # Records of the emitted nodes, clusters and edges for snapshots.
+        self._nodes = {}
+        self._clusters = []
+        self._edges = []
+        self.theme = theme or Theme()
         # Set attributes.
         self.dot.attr(compound="true")
         for k, v in self._default_graph_attrs.items():
             self.dot.graph_attr[k] = v
+        self.dot.graph_attr.update(self.theme.graph_attr)
         self.dot.graph_attr["label"] = self.name
+        # Icons are referred relative to the resources directory which is set once here.
+        self.dot.graph_attr["imagepath"] = resource_dir()
         for k, v in self._default_node_attrs.items():
             self.dot.node_attr[k] = v
-        for k, v in self._default_edge_attrs.items():
+        self.dot.node_attr.update(self.theme.node_attr)
+        # Edge defaults are shared by all the edges instead of being repeated per edge.
+        for k, v in {**Edge._default_edge_attrs, **self._default_edge_attrs}.items():
             self.dot.edge_attr[k] = v
+        self.dot.edge_attr.update(self.theme.edge_attr)
 
         if not self._validate_direction(direction):
             raise ValueError(f'"{direction}" is not a valid direction')
         self.dot.graph_attr["rankdir"] = direction
 
-        if not self._validate_curvestyle(curvestyle):
+        if curvestyle is not None and not self._validate_curvestyle(curvestyle):
             raise ValueError(f'"{curvestyle}" is not a valid curvestyle')
-        self.dot.graph_attr["splines"] = curvestyle
+        self.dot.graph_attr["splines"] = curvestyle or "ortho"
+
+        if preset is not None:
+            # Validate the preset up front rather than when rendering.
+            preset_attrs(preset)
+        self.preset = preset
+        # The attributes given explicitly are kept over the preset ones.
+        self._explicit_graph_attrs = set(self.theme.graph_attr) | set(graph_attr)
+        if curvestyle is not None:
+            self._explicit_graph_attrs.add("splines")
 
         if not self._validate_outformat(outformat):
             raise ValueError(f'"{outformat}" is not a valid output format')
         self.outformat = outformat
 
+        if not self._validate_oversize(oversize):
+            raise ValueError(f'"{oversize}" is not a valid oversize')
+        if not self._validate_layout_engine(layout_engine):
+            raise ValueError(f'"{layout_engine}" is not a valid layout engine')
+        self.layout_engine = layout_engine.lower()
+        if self.layout_engine == "force":
+            # Fail here rather than when rendering if NumPy is missing.
+            _numpy()
+
+        self.max_pixels = max_pixels
+        self.max_bytes = max_bytes
+        self.oversize = oversize
+
         # Merge passed in attributes
         self.dot.graph_attr.update(graph_attr)
         self.dot.node_attr.update(node_attr)
         self.dot.edge_attr.update(edge_attr)
 
+        # Most of nodes have an icon, so the attributes shared by icon nodes
+        # are hoisted as well. The plain nodes override them back.
+        self._base_node_attrs = dict(self.dot.node_attr)
+        self.dot.node_attr.update(self.theme.icon_node_attr)
+
         self.show = show
+        self.layout_cache = layout_cache
+        self.layout_timeout = layout_timeout
+        self.layout_fallback = None
+        self.preview = preview_enabled() if preview is None else preview
+        self.parallel_layout = parallel_layout
+        self.cluster_layout = cluster_layout
+        self.embed_icons = embed_icons
 
     def __str__(self) -> str:
         return str(self.dot)
@@ -124,22 +248,19 @@ class Diagram(Context):
             if cluster_node2:
                 edge._attrs['lhead'] = node2.nodeid
                 node2 = cluster_node2
-            self.dot.edge(node1.nodeid, node2.nodeid, **edge.attrs)
+            self.dot.edge(node1.nodeid, node2.nodeid, **self.edge_overrides(edge.attrs))
 
         self.render()
         # Remove the graphviz file leaving only the image.
         os.remove(self.filename)
         setdiagram(None)
+        setcluster(None)
 
     def _repr_png_(self):
         return self.dot.pipe(format="png")
 
     def _validate_curvestyle(self, curvestyle: str) -> bool:
-        curvestyle = curvestyle.lower()
-        for v in self.__curvestyles:
-            if v == curvestyle:
-                return True
-        return False
+        return valid_curvestyle(curvestyle)
 
     def _validate_outformat(self, outformat: str) -> bool:
         outformat = outformat.lower()
@@ -148,12 +269,187 @@ class Diagram(Context):
                 return True
         return False
 
+    def _validate_oversize(self, oversize: str) -> bool:
+        return oversize.lower() in self.__oversizes
+
+    def _validate_layout_engine(self, layout_engine: str) -> bool:
+        return layout_engine.lower() in self.__layout_engines
+
+    def node_overrides(self, attrs: dict) -> dict:
+        """Return the node attributes which differ from the diagram node defaults."""
+        attrs = {**self._base_node_attrs, **attrs}
+        return {k: v for k, v in attrs.items() if self.dot.node_attr.get(k) != v}
+
+    def edge_overrides(self, attrs: dict) -> dict:
+        """Return the edge attributes which differ from the diagram edge defaults."""
+        return {k: v for k, v in attrs.items() if self.dot.edge_attr.get(k) != v}
+
     def connect(self, node: "Node", node2: "Node", edge: "Edge") -> None:
         """Connect the two Nodes."""
-        self.dot.edge(node.nodeid, node2.nodeid, **edge.attrs)
+        attrs = self.edge_overrides(edge.attrs)
+        self.dot.edge(node.nodeid, node2.nodeid, **attrs)
+        self._edges.append(EdgeModel(node.nodeid, node2.nodeid, attrs))
+
+    def _apply_preset(self) -> None:
+        if self.preset is None:
+            return
+        attrs = preset_attrs(self.preset, len(self._nodes), len(self._edges), len(self._clusters))
+        for k, v in attrs.items():
+            if k not in self._explicit_graph_attrs:
+                self.dot.graph_attr[k] = v
+
+    def snapshot(self) -> DiagramModel:
+        """Return a compact, picklable snapshot of the diagram."""
+        self._apply_preset()
+        graph_attr = {**self.dot.graph_attr, "compound": "true"}
+        # The resources directory is machine specific, so the snapshot
+        # only keeps the icon references relative to it.
+        if graph_attr.get("imagepath") == resource_dir():
+            del graph_attr["imagepath"]
+        return DiagramModel(
+            name=self.name,
+            filename=self.filename,
+            outformat=self.outformat,
+            graph_attr=graph_attr,
+            node_attr=dict(self.dot.node_attr),
+            edge_attr=dict(self.dot.edge_attr),
+            nodes=tuple(self._nodes.values()),
+            clusters=tuple(self._ordered_clusters()),
+            edges=tuple(self._edges),
+        )
+
+    def _ordered_clusters(self):
+        # The clusters are recorded when they are closed, so the nested ones
+        # come first. Reorder them to have the parents before their children.
+        children = {}
+        for cluster in self._clusters:
+            children.setdefault(cluster.parent, []).append(cluster)
+
+        def walk(parent):
+            for cluster in children.get(parent, ()):
+                yield cluster
+                yield from walk(cluster.id)
+
+        return walk(None)
+
+    def _record_node(self, node: "Node") -> None:
+        cluster = node._parent if node._parent is not self else None
+        self._nodes[node.nodeid] = NodeModel(
+            id=node.nodeid,
+            label=node.label,
+            cls=class_path(type(node)),
+            icon=node._loaded_icon,
+            attrs=dict(node._attrs),
+            cluster=cluster.dot.name if cluster else None,
+            tags=node.tags,
+            metadata=node.metadata,
+        )
+
+    def _forget_node(self, node: "Node") -> None:
+        self._nodes.pop(node.nodeid, None)
+
+    def _record_cluster(self, cluster: "Cluster") -> None:
+        parent = cluster._parent if cluster._parent is not self else None
+        self._clusters.append(
+            ClusterModel(
+                id=cluster.dot.name,
+                label=cluster.label,
+                cls=class_path(type(cluster)),
+                icon=getattr(cluster, "_loaded_icon", None),
+                attrs=dict(cluster.dot.graph_attr),
+                parent=parent.dot.name if parent else None,
+            )
+        )
+
+    def close(self) -> None:
+        """Release the built graph and the recorded elements.
+
+        The diagram can't be rendered nor snapshotted anymore after closing it.
+        """
+        self.dot.clear()
+        self._nodes.clear()
+        self._clusters.clear()
+        self._edges.clear()
 
     def render(self) -> None:
-        self.dot.render(format=self.outformat, view=self.show, quiet=True)
+        self._apply_preset()
+        if self.outformat == "tiles":
+            model = self.snapshot()
+            layout = self._layout(model)
+            self.dot.save()
+            render_tiles(model, f"{self.filename}_tiles", layout)
+            return
+        if self.outformat in ("json", "html"):
+            model = self.snapshot()
+            layout = self._layout(model)
+            # Keep the dot source file like the regular render does.
+            self.dot.save()
+            rendered = f"{self.filename}.{self.outformat}"
+            with open(rendered, "w", encoding="utf-8") as f:
+                if self.outformat == "json":
+                    json.dump(export_layout(model, layout), f)
+                else:
+                    f.write(write_html(model, layout))
+            if self.show:
+                view(rendered)
+            return
+        if self.preview:
+            # Keep the dot source file like the regular render does.
+            rendered = preview_model(self.snapshot()).to_dot().render(format=self.outformat, quiet=True)
+        elif self.outformat in ("png", "jpg") and (self.max_pixels or self.max_bytes):
+            rendered = self._render_limited()
+        elif self._draws_layout():
+            model = self.snapshot()
+            # Keep the dot source file like the regular render does.
+            rendered = render_positioned(positioned(model, self._layout(model)), cleanup=False)
+        else:
+            rendered = self.dot.render(format=self.outformat, quiet=True)
+        if self.outformat == "svg":
+            if self.embed_icons:
+                embed_icons_file(rendered, self.dot.graph_attr.get("imagepath"))
+            else:
+                absolute_icons_file(rendered, self.dot.graph_attr.get("imagepath"))
+        if self.show:
+            view(rendered)
+
+    def _draws_layout(self) -> bool:
+        # Whether the layout is computed apart and drawn by neato -n2.
+        return (
+            self.layout_cache is not None
+            or self.layout_timeout is not None
+            or self.parallel_layout
+            or self.cluster_layout
+            or self.layout_engine == "force"
+        )
+
+    def _layout(self, model: DiagramModel) -> "Layout":
+        if self.layout_engine == "force":
+            # The force layout is cheap compared to dot, so it isn't cached.
+            layout = force_layout(model)
+        elif self.layout_cache is not None:
+            layout = self.layout_cache.layout(model, self.layout_timeout, self.parallel_layout, self.cluster_layout)
+        elif self.cluster_layout:
+            layout = compute_cluster_layout(model, self.layout_timeout)
+        elif self.parallel_layout:
+            layout = compute_component_layout(model, self.layout_timeout)
+        else:
+            layout = compute_layout(model, self.layout_timeout)
+        self.layout_fallback = layout.fallback
+        return layout
+
+    def _render_limited(self) -> str:
+        # The layout is computed first to estimate the output size, and then
+        # drawn as is, so the diagram is laid out only once.
+        model = self.snapshot()
+        layout = self._layout(model)
+        dpi = fit_raster(model.graph_attr, layout, self.max_pixels, self.max_bytes)
+        if dpi is not None:
+            if self.oversize.lower() == "error":
+                width, height = raster_size(model.graph_attr, layout)
+                raise ValueError(f"{width}x{height} pixels {self.outformat} output of {self.name} exceeds the limit")
+            model = model._replace(graph_attr={**model.graph_attr, "dpi": str(dpi)})
+        # Keep the dot source file like the regular render does.
+        return render_positioned(positioned(model, layout), cleanup=False)
 
     def subgraph(self, dot: Digraph):
         """Create a subgraph for clustering"""
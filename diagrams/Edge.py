@@ -34,12 +34,10 @@ class Edge:
         self.forward = forward
         self.reverse = reverse
 
+        # The default attributes are shared on the diagram level, so an edge
+        # only keeps its own attributes.
         self._attrs = {}
 
-        # Set attributes.
-        for k, v in self._default_edge_attrs.items():
-            self._attrs[k] = v
-
         if label:
             # Graphviz complaining about using label for edges, so replace it with xlabel.
             # Update: xlabel option causes the misaligned label position: https://github.com/mingrammer/diagrams/issues/83
@@ -1,9 +1,9 @@
 import os, sys, uuid, html
 from pathlib import Path
-from typing import List, Union, Dict
+from typing import Iterable, List, Union, Dict
 from .Edge import Edge
 from .Cluster import Cluster
-from .utils import setcluster, getcluster, getdiagram, new_init
+from .utils import setcluster, getcluster, new_init, resource_dir, _diagram
 
 class Node(Cluster):
     """Node represents a node for a specific backend service."""
@@ -22,42 +22,38 @@ class Node(Cluster):
     def __init__(self,
                  label: str = "",
                  icon_size: int = None,
+                 tags: Iterable[str] = (),
+                 metadata: Dict = None,
                  **attrs: Dict):
         """Node represents a system component.
 
         :param label: Node label.
         :param icon_size: The icon size when used as a Cluster. Default is 30.
+        :param tags: Tags for selecting the node in the diagram views. They are not drawn.
+        :param metadata: Arbitrary data kept with the node. It is not drawn.
         """
         # Generates an ID for identifying a node.
         self._id = self._rand_id()
         self.label = label
+        self.tags = tuple(tags)
+        self.metadata = metadata
 
         super().__init__(self.label)
 
         if icon_size:
             self._icon_size = icon_size
 
-        # fmt: off
-        # If a node has an icon, increase the height slightly to avoid
-        # that label being spanned between icon image and white space.
-        # Increase the height by the number of new lines included in the label.
-        padding = 0.4 * (label.count('\n'))
         self._loaded_icon = self._load_icon()
-
-        
-        self._attrs = {
-            "shape": "none",
-            "height": str(self._height + padding),
-            "image": self._loaded_icon,
-        } if self._loaded_icon else {}
-
-        # fmt: on
+        self._attrs = self._icon_attrs(label, self._loaded_icon)
         self._attrs.update(attrs)
 
         # If a node is in the cluster context, add it to cluster.
         if self._parent is not None:
+            # Only the attributes which differ from the diagram defaults are emitted.
+            self._attrs = _diagram().node_overrides(self._attrs)
             # Adding node to diagram / cluster
             self._parent.node(self)
+            _diagram()._record_node(self)
         else:
             raise EnvironmentError("Node must be belong to a diagram or cluster")
 
@@ -65,6 +61,7 @@ class Node(Cluster):
         # If Node is used as context remove the node from the graph
         if self._parent is not None and getattr(self._parent, "remove_node", False):
             self._parent.remove_node(self)
+            _diagram()._forget_node(self)
         self._attrs = {}
 
     def __enter__(self):
@@ -73,15 +70,11 @@ class Node(Cluster):
         # Set attributes.
         for k, v in self._default_graph_attrs.items():
             self.dot.graph_attr[k] = v
+        self.dot.graph_attr.update(self.theme.cluster_attr)
 
         icon = self._load_icon()
         if icon:
-            lines = iter(html.escape(self.label).split("\n"))
-            self.dot.graph_attr["label"] = '<<TABLE border="0"><TR>' +\
-                f'<TD fixedsize="true" width="{self._icon_size}" height="{self._icon_size}"><IMG SRC="{icon}"></IMG></TD>' +\
-                f'<TD align="left">{next(lines)}</TD></TR>' +\
-                ''.join(f'<TR><TD colspan="2" align="left">{line}</TD></TR>' for line in lines) +\
-                '</TABLE>>'
+            self.dot.graph_attr["label"] = self._icon_label(self.label, icon, self._icon_size)
 
         if not self._validate_direction(self._direction):
             raise ValueError(f'"{self._direction}" is not a valid direction')
@@ -186,15 +179,52 @@ class Node(Cluster):
         if not isinstance(node, Edge):
             ValueError(f"{node} is not a valid Edge")
         # An edge must be added on the global diagrams, not a cluster.
-        getdiagram().connect(self, node, edge)
+        _diagram().connect(self, node, edge)
         return node
 
     @staticmethod
     def _rand_id():
         return uuid.uuid4().hex
 
+    @classmethod
+    def _icon_attrs(cls, label: str, icon: str) -> Dict:
+        """Return the node attributes for drawing the icon."""
+        if not icon:
+            return {}
+        # fmt: off
+        # If a node has an icon, increase the height slightly to avoid
+        # that label being spanned between icon image and white space.
+        # Increase the height by the number of new lines included in the label.
+        padding = 0.4 * (label.count('\n'))
+        return {
+            "shape": "none",
+            "height": str(cls._height + padding),
+            "image": icon,
+        }
+        # fmt: on
+
+    @staticmethod
+    def _icon_label(label: str, icon: str, icon_size: int) -> str:
+        """Return the HTML label of a node used as a cluster."""
+        lines = iter(html.escape(label).split("\n"))
+        return '<<TABLE border="0"><TR>' +\
+            f'<TD fixedsize="true" width="{icon_size}" height="{icon_size}"><IMG SRC="{icon}"></IMG></TD>' +\
+            f'<TD align="left">{next(lines)}</TD></TR>' +\
+            ''.join(f'<TR><TD colspan="2" align="left">{line}</TD></TR>' for line in lines) +\
+            '</TABLE>>'
+
     def _load_icon(self):
-        if self._icon and self._icon_dir:
+        return self._icon_ref()
+
+    @classmethod
+    def _icon_ref(cls):
+        if cls._icon and cls._icon_dir:
             basedir = Path(os.path.abspath(os.path.dirname(__file__)))
-            return os.path.join(basedir.parent, self._icon_dir, self._icon)
+            icon = basedir.parent.joinpath(cls._icon_dir, cls._icon)
+            try:
+                # The bundled icons are resolved through the diagram "imagepath",
+                # so only a short path relative to the resources is emitted.
+                return icon.relative_to(resource_dir()).as_posix()
+            except ValueError:
+                return str(icon)
         return None
@@ -0,0 +1,41 @@
+class Theme:
+    """Theme represents a set of shared attribute defaults for a diagram."""
+
+    # fmt: off
+    # Attributes every icon node shares. These are hoisted into the diagram
+    # node defaults so that icon nodes only emit their own image.
+    _default_icon_node_attrs = {
+        "shape": "none",
+        "height": "1.9",
+    }
+
+    # fmt: on
+
+    def __init__(
+        self,
+        graph_attr: dict = {},
+        node_attr: dict = {},
+        icon_node_attr: dict = {},
+        edge_attr: dict = {},
+        cluster_attr: dict = {},
+        bgcolors: tuple = (),
+    ):
+        """Theme represents a set of shared attribute defaults.
+
+        Themed attributes are set once on the diagram (or cluster) level
+        instead of being repeated by every node and edge, so only the
+        per-element overrides end up in the generated dot source.
+
+        :param graph_attr: Default graph attributes of the diagram.
+        :param node_attr: Default attributes of all nodes.
+        :param icon_node_attr: Default attributes of the nodes having an icon.
+        :param edge_attr: Default attributes of all edges.
+        :param cluster_attr: Default graph attributes of all clusters.
+        :param bgcolors: Cluster background colors cycled by the cluster depth.
+        """
+        self.graph_attr = dict(graph_attr)
+        self.node_attr = dict(node_attr)
+        self.icon_node_attr = {**self._default_icon_node_attrs, **icon_node_attr}
+        self.edge_attr = dict(edge_attr)
+        self.cluster_attr = dict(cluster_attr)
+        self.bgcolors = tuple(bgcolors)
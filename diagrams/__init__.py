@@ -2,5 +2,6 @@ from .Diagram import Diagram
 from .Cluster import Cluster
 from .Node import Node
 from .Edge import Edge
+from .Theme import Theme
 from .utils import getdiagram, setdiagram, getcluster, setcluster
 Group = Cluster
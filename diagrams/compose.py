@@ -0,0 +1,139 @@
+"""
+Compose provides the operations assembling diagram models into a new one.
+"""
+
+from typing import Dict, Iterable, Set
+
+from .Cluster import Cluster
+from .Context import BGCOLORS
+from .model import ClusterModel, DiagramModel, EdgeModel
+
+
+def merge(models: Iterable[DiagramModel], name: str = None, filename: str = None, wrap: bool = False) -> DiagramModel:
+    """Merge several diagram models into one.
+
+    The merged model takes the diagram options of the first model. The ids
+    colliding with the ones of the previous models are prefixed with the
+    filename of their model, e.g. "team_a.web". The element attributes are
+    adjusted if the models have different defaults, so every element is
+    drawn the same as in its own diagram.
+
+    :param models: Diagram models to merge.
+    :param name: Name of the merged diagram. Default is the name of the first model.
+    :param filename: Filename of the merged diagram. Default is the filename of the first model.
+    :param wrap: Wrap the elements of each model into a cluster labeled with the model name.
+    :return: The merged diagram model.
+    """
+    models = list(models)
+    if not models:
+        raise ValueError("at least one diagram model is required to merge")
+    target = models[0]
+    graph_attr = dict(target.graph_attr)
+    if name is not None:
+        graph_attr["label"] = name
+    target = target._replace(
+        name=name if name is not None else target.name,
+        filename=filename or target.filename,
+        graph_attr=graph_attr,
+        nodes=(),
+        clusters=(),
+        edges=(),
+    )
+    taken = set()
+    parts = []
+    for index, model in enumerate(models):
+        prefix = model.filename or f"diagram{index}"
+        node_ids = _remap_ids((node.id for node in model.nodes), prefix, taken)
+        cluster_ids = _remap_ids((cluster.id for cluster in model.clusters), f"cluster_{prefix}", taken)
+
+        parent = None
+        inherited = target.graph_attr
+        clusters = []
+        if wrap:
+            parent = _remap_ids([f"cluster_{prefix}"], f"cluster_{prefix}", taken)[f"cluster_{prefix}"]
+            attrs = {
+                **Cluster._default_graph_attrs,
+                "label": model.name,
+                "rankdir": model.graph_attr.get("rankdir", "LR"),
+                "bgcolor": BGCOLORS[1 % len(BGCOLORS)],
+            }
+            clusters.append(
+                ClusterModel(
+                    id=parent,
+                    label=model.name,
+                    cls="Cluster",
+                    icon=None,
+                    attrs=_overrides(attrs, target.graph_attr),
+                    parent=None,
+                )
+            )
+            inherited = {**target.graph_attr, **attrs}
+
+        depths = {None: 0}
+        for cluster in model.clusters:
+            attrs = cluster.attrs
+            depth = depths[cluster.id] = depths[cluster.parent] + 1
+            if wrap and attrs.get("bgcolor") == BGCOLORS[depth % len(BGCOLORS)]:
+                # Nested one more level, so take the background color of the next depth.
+                attrs = {**attrs, "bgcolor": BGCOLORS[(depth + 1) % len(BGCOLORS)]}
+            if cluster.parent is None:
+                # The top level clusters inherited the graph attributes of
+                # their own diagram, which aren't the same as the new parent.
+                attrs = _overrides({**model.graph_attr, **attrs}, inherited)
+            clusters.append(
+                cluster._replace(
+                    id=cluster_ids[cluster.id],
+                    attrs=attrs,
+                    parent=cluster_ids[cluster.parent] if cluster.parent else parent,
+                )
+            )
+
+        nodes = []
+        for node in model.nodes:
+            attrs = node.attrs
+            if model.node_attr != target.node_attr:
+                attrs = _overrides({**model.node_attr, **attrs}, target.node_attr)
+            nodes.append(
+                node._replace(
+                    id=node_ids[node.id],
+                    attrs=attrs,
+                    cluster=cluster_ids[node.cluster] if node.cluster else parent,
+                )
+            )
+
+        edges = []
+        for edge in model.edges:
+            attrs = edge.attrs
+            if model.edge_attr != target.edge_attr:
+                attrs = _overrides({**model.edge_attr, **attrs}, target.edge_attr)
+            if "ltail" in attrs or "lhead" in attrs:
+                attrs = dict(attrs)
+                for k in ("ltail", "lhead"):
+                    if k in attrs:
+                        attrs[k] = cluster_ids.get(attrs[k], attrs[k])
+            edges.append(EdgeModel(node_ids.get(edge.tail, edge.tail), node_ids.get(edge.head, edge.head), attrs))
+
+        parts.append(target._replace(nodes=tuple(nodes), clusters=tuple(clusters), edges=tuple(edges)))
+    return target.extend(*parts)
+
+
+def _remap_ids(ids: Iterable[str], prefix: str, taken: Set[str]) -> Dict[str, str]:
+    """Map the ids to unique ones, prefixing only the ones already taken."""
+    mapping = {}
+    for old in ids:
+        new = old
+        if new in taken:
+            # The cluster ids must keep the "cluster_" prefix.
+            local = old[len("cluster_") :] if old.startswith("cluster_") and prefix.startswith("cluster_") else old
+            new = f"{prefix}.{local}"
+            count = 1
+            while new in taken:
+                count += 1
+                new = f"{prefix}{count}.{local}"
+        taken.add(new)
+        mapping[old] = new
+    return mapping
+
+
+def _overrides(attrs: Dict, defaults: Dict) -> Dict:
+    return {k: v for k, v in attrs.items() if defaults.get(k) != v}
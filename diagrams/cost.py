@@ -0,0 +1,225 @@
+"""
+Cost estimates the layout time and the output size of a diagram model from
+its structure alone, without running the layout, so the expensive diagrams
+can be rejected or deferred up front.
+
+The layout time is modelled as a linear combination of the terms the dot
+layout passes grow with: the ranking and the positioning grow about
+n log n with the size of the graph, the crossing minimization with the
+fan-out of the edges, the clusters with their nesting, and the orthogonal
+edge routing about cubically, as measured. The default coefficients are
+fitted by `python -m scripts.benchmark cost` to the dot layout times of 48
+random inventories of 25 to 800 icon nodes, with graphviz 14.1 on one cpu,
+with a median relative error of 16%. Fit the coefficients to the measured
+layout times of your own diagrams and machines with `CostModel.fit`.
+
+The output size is estimated from the ranks of the graph: the longest path
+sets the number of the ranks, and the widest rank sets the other dimension.
+"""
+
+import math
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from .layout import RASTER_PIXEL_BYTES, Layout, _inches, raster_size
+from .model import DiagramModel
+
+# The default coefficients of the layout time terms in seconds, fitted to
+# the measured layout times. The clusters added no time of their own to the
+# layouts measured, beyond their nodes and edges.
+DEFAULT_COEFFICIENTS = (0.021, 2.32e-5, 1.35e-5, 0.0, 7.73e-9)
+
+
+class CostFeatures(NamedTuple):
+    """CostFeatures represents the structural features of a diagram model."""
+
+    nodes: int
+    edges: int
+    clusters: int
+    depth: int
+    fanout: int
+    ranks: int
+    rank_width: int
+    ortho: bool
+
+
+class CostEstimate(NamedTuple):
+    """CostEstimate represents the estimated layout time in seconds and output size of a diagram model."""
+
+    seconds: float
+    width: int
+    height: int
+    pixels: int
+    bytes: int
+
+
+class CostModel:
+    """CostModel estimates the cost of the diagram models with the given coefficients of the time terms."""
+
+    def __init__(self, coefficients: Tuple[float, ...] = DEFAULT_COEFFICIENTS):
+        self.coefficients = tuple(coefficients)
+
+    @classmethod
+    def fit(cls, samples: Iterable[Tuple[DiagramModel, float]]) -> "CostModel":
+        """Fit the coefficients to the measured layout times by least squares of the relative errors.
+
+        The terms only add time, so the terms which would take negative
+        coefficients are left out of the fit in turn.
+
+        :param samples: The diagram models along with their layout times in seconds.
+        """
+        rows, times = [], []
+        for model, seconds in samples:
+            if seconds <= 0:
+                raise ValueError(f"{seconds} is not a valid layout time")
+            rows.append(_terms(cost_features(model)))
+            times.append(seconds)
+        if len(rows) < len(DEFAULT_COEFFICIENTS):
+            raise ValueError(f"at least {len(DEFAULT_COEFFICIENTS)} samples are required to fit the cost model")
+        # Each sample is divided by its time, so the fast diagrams count as
+        # much as the slow ones rather than the slowest deciding the fit.
+        rows = [[term / time for term in row] for row, time in zip(rows, times)]
+        terms = list(range(len(rows[0])))
+        while True:
+            coefficients = _least_squares(rows, terms)
+            negative = min(terms, key=lambda i: coefficients[i])
+            if coefficients[negative] >= 0:
+                return cls(coefficients)
+            terms.remove(negative)
+
+    def estimate(self, model: DiagramModel) -> CostEstimate:
+        """Return the estimated layout time and raster output size of the model."""
+        features = cost_features(model)
+        seconds = sum(c * t for c, t in zip(self.coefficients, _terms(features)))
+        width, height = raster_size(model.graph_attr, Layout({"bb": _bb(model, features)}, {}, {}, {}))
+        return CostEstimate(seconds, width, height, width * height, width * height * RASTER_PIXEL_BYTES)
+
+
+def estimate_cost(model: DiagramModel) -> CostEstimate:
+    """Return the estimated layout time and raster output size of the model, by the default coefficients."""
+    return CostModel().estimate(model)
+
+
+def cost_features(model: DiagramModel) -> CostFeatures:
+    """Return the structural features of the model the cost is estimated from."""
+    parents = {cluster.id: cluster.parent for cluster in model.clusters}
+
+    def depth(cluster_id):
+        level = 0
+        while cluster_id is not None:
+            level, cluster_id = level + 1, parents.get(cluster_id)
+        return level
+
+    degrees = {}
+    for edge in model.edges:
+        degrees[edge.tail] = degrees.get(edge.tail, 0) + 1
+        degrees[edge.head] = degrees.get(edge.head, 0) + 1
+    ranks = _ranks(model)
+    widths = {}
+    for rank in ranks.values():
+        widths[rank] = widths.get(rank, 0) + 1
+    return CostFeatures(
+        nodes=len(model.nodes),
+        edges=len(model.edges),
+        clusters=len(model.clusters),
+        depth=max((depth(cluster.id) for cluster in model.clusters), default=0),
+        fanout=max(degrees.values(), default=0),
+        ranks=len(widths),
+        rank_width=max(widths.values(), default=0),
+        ortho=model.graph_attr.get("splines") == "ortho",
+    )
+
+
+def _terms(features: CostFeatures) -> List[float]:
+    size = features.nodes + features.edges
+    return [
+        1.0,
+        size * math.log2(size + 1),
+        features.edges * features.fanout,
+        features.clusters * features.depth,
+        size**3 if features.ortho else 0.0,
+    ]
+
+
+def _ranks(model: DiagramModel) -> Dict[str, int]:
+    """Return the ranks of the nodes by the longest path, ignoring the edges closing cycles."""
+    successors = {node.id: [] for node in model.nodes}
+    for edge in model.edges:
+        if edge.attrs.get("constraint") != "false" and edge.tail in successors and edge.head in successors:
+            successors[edge.tail].append(edge.head)
+
+    # Order the nodes topologically by a depth first search, which skips
+    # the back edges of the cycles as dot does.
+    order, state = [], {}
+    for root in successors:
+        if root in state:
+            continue
+        state[root] = 1
+        stack = [(root, iter(successors[root]))]
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                state[node] = 2
+                order.append(node)
+                stack.pop()
+            elif child not in state:
+                state[child] = 1
+                stack.append((child, iter(successors[child])))
+    order.reverse()
+    position = {node: i for i, node in enumerate(order)}
+
+    ranks = dict.fromkeys(order, 0)
+    for node in order:
+        for child in successors[node]:
+            if position[child] > position[node]:
+                ranks[child] = max(ranks[child], ranks[node] + 1)
+    return ranks
+
+
+def _bb(model: DiagramModel, features: CostFeatures) -> str:
+    node_width = _inches(model.node_attr.get("width"), 0.75) * 72
+    node_height = _inches(model.node_attr.get("height"), 0.5) * 72
+    ranksep = _inches(model.graph_attr.get("ranksep"), 0.5) * 72
+    nodesep = _inches(model.graph_attr.get("nodesep"), 0.25) * 72
+    ranks, rank_width = features.ranks, features.rank_width
+    # The clusters add their margins and labels around their content.
+    margin = features.depth * 2 * 16
+    if model.graph_attr.get("rankdir", "TB") in ("LR", "RL"):
+        width = ranks * node_width + max(ranks - 1, 0) * ranksep + margin
+        height = rank_width * node_height + max(rank_width - 1, 0) * nodesep + margin
+    else:
+        width = rank_width * node_width + max(rank_width - 1, 0) * nodesep + margin
+        height = ranks * node_height + max(ranks - 1, 0) * ranksep + margin
+    if model.graph_attr.get("label"):
+        height += 30
+    return f"0,0,{width:.2f},{height:.2f}"
+
+
+def _least_squares(rows: List[List[float]], terms: List[int]) -> List[float]:
+    """Return the coefficients of the given terms fitting the rows to one, and zero for the other terms."""
+    # Solve the normal equations, slightly regularized to keep them
+    # solvable when some terms are the same for all the samples.
+    matrix = [[sum(row[i] * row[j] for row in rows) for j in terms] for i in terms]
+    for k in range(len(terms)):
+        matrix[k][k] += 1e-9 * (matrix[k][k] or 1)
+    vector = [sum(row[i] for row in rows) for i in terms]
+    coefficients = [0.0] * len(rows[0])
+    for i, value in zip(terms, _solve(matrix, vector)):
+        coefficients[i] = value
+    return coefficients
+
+
+def _solve(matrix: List[List[float]], vector: List[float]) -> List[float]:
+    """Solve the linear equations by the Gaussian elimination with partial pivoting."""
+    size = len(vector)
+    rows = [list(row) + [value] for row, value in zip(matrix, vector)]
+    for col in range(size):
+        pivot = max(range(col, size), key=lambda r: abs(rows[r][col]))
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        if rows[col][col] == 0:
+            continue
+        for r in range(size):
+            if r != col and rows[r][col]:
+                factor = rows[r][col] / rows[col][col]
+                rows[r] = [a - factor * b for a, b in zip(rows[r], rows[col])]
+    return [rows[i][size] / rows[i][i] if rows[i][i] else 0.0 for i in range(size)]
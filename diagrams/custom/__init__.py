@@ -2,6 +2,8 @@
 Custom provides the possibility of load an image to be presented as a node.
 """
 
+import os
+
 from diagrams import Node
 
 
@@ -13,7 +15,8 @@ class Custom(Node):
     fontcolor = "#ffffff"
 
     def _load_icon(self):
-        return self._icon
+        # Custom icons aren't looked up in the diagram "imagepath".
+        return os.path.abspath(self._icon)
 
     def __init__(self, label, icon_path):
         self._icon = icon_path
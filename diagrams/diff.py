@@ -0,0 +1,263 @@
+"""
+Diff provides the structural comparison of diagram models.
+
+The elements of two models are matched by stable keys: their ids (e.g. the
+models compiled from specs) or their structure, which is the path of the
+cluster labels, the class and the label of an element. The latter matches
+the diagrams built by scripts, whose ids are random.
+"""
+
+import hashlib
+import json
+from collections import Counter
+from typing import Dict, FrozenSet, NamedTuple, Optional, Tuple
+
+from .model import ClusterModel, DiagramModel, EdgeModel, NodeModel
+
+# The colors of the added, removed and changed elements in a diff diagram.
+ADDED_COLOR = "#2E7D32"
+REMOVED_COLOR = "#C62828"
+CHANGED_COLOR = "#EF6C00"
+
+
+class ModelDiff(NamedTuple):
+    """ModelDiff represents the structural differences between two diagram models.
+
+    The changed elements are pairs of the old and the new ones, and the
+    changed attributes map the attribute names to pairs of the old and the
+    new values. The nodes whose tags or metadata changed, which aren't
+    drawn, are apart from the changed nodes. A diff is false if there is no
+    difference.
+    """
+
+    added_nodes: Tuple[NodeModel, ...]
+    removed_nodes: Tuple[NodeModel, ...]
+    changed_nodes: Tuple[Tuple[NodeModel, NodeModel], ...]
+    added_clusters: Tuple[ClusterModel, ...]
+    removed_clusters: Tuple[ClusterModel, ...]
+    changed_clusters: Tuple[Tuple[ClusterModel, ClusterModel], ...]
+    added_edges: Tuple[EdgeModel, ...]
+    removed_edges: Tuple[EdgeModel, ...]
+    changed_edges: Tuple[Tuple[EdgeModel, EdgeModel], ...]
+    graph_attr: Dict[str, Tuple[Optional[str], Optional[str]]]
+    node_attr: Dict[str, Tuple[Optional[str], Optional[str]]]
+    edge_attr: Dict[str, Tuple[Optional[str], Optional[str]]]
+    changed_metadata: Tuple[Tuple[NodeModel, NodeModel], ...]
+
+    def __bool__(self):
+        return any(len(field) for field in self)
+
+
+def diff(old: DiagramModel, new: DiagramModel, by: str = "id") -> ModelDiff:
+    """Compare two diagram models.
+
+    :param old: Old diagram model.
+    :param new: New diagram model.
+    :param by: How the elements are matched. One of "id" or "structure".
+    :return: The differences. It is false if the models are the same.
+    """
+    old_keys, new_keys = _Keys(old, by), _Keys(new, by)
+    nodes = _compare(old.nodes, new.nodes, old_keys.node, new_keys.node, old_keys.node_state, new_keys.node_state)
+    clusters = _compare(
+        old.clusters, new.clusters, old_keys.cluster, new_keys.cluster, old_keys.cluster_state, new_keys.cluster_state
+    )
+    edges = _compare(old.edges, new.edges, old_keys.edge, new_keys.edge, old_keys.edge_state, new_keys.edge_state)
+    _, _, metadata = _compare(
+        old.nodes, new.nodes, old_keys.node, new_keys.node, old_keys.metadata_state, new_keys.metadata_state
+    )
+    return ModelDiff(
+        *nodes,
+        *clusters,
+        *edges,
+        graph_attr=_compare_attrs(old.graph_attr, new.graph_attr),
+        node_attr=_compare_attrs(old.node_attr, new.node_attr),
+        edge_attr=_compare_attrs(old.edge_attr, new.edge_attr),
+        changed_metadata=metadata,
+    )
+
+
+def fingerprint(model: DiagramModel) -> str:
+    """Return a hash of the model structure, which doesn't depend on the element ids.
+
+    It can be stored along the rendered output to skip rendering unchanged diagrams.
+    """
+    return _hash({"outformat": model.outformat, **_structure(model)})
+
+
+def highlight(old: DiagramModel, new: DiagramModel, by: str = "id") -> DiagramModel:
+    """Build a diff diagram of two diagram models.
+
+    The diff diagram is the new model with the added and changed elements
+    highlighted, and the removed elements put back in dashed style.
+    """
+    changes = diff(old, new, by)
+    new_keys, old_keys = _Keys(new, by), _Keys(old, by)
+    # The ids of the old elements in the new model, for placing back the removed ones.
+    new_clusters = {new_keys.cluster(c): c.id for c in new.clusters}
+    new_nodes = {new_keys.node(n): n.id for n in new.nodes}
+
+    def cluster_id(cluster_id: Optional[str]) -> Optional[str]:
+        if cluster_id is None:
+            return None
+        return new_clusters.get(old_keys.cluster(old_keys.clusters[cluster_id]), cluster_id)
+
+    def node_id(node_id: str) -> str:
+        node = old_keys.nodes.get(node_id)
+        return new_nodes.get(old_keys.node(node), node_id) if node else node_id
+
+    added = {id(e) for e in changes.added_nodes + changes.added_clusters + changes.added_edges}
+    changed = {id(pair[1]) for pair in changes.changed_nodes + changes.changed_clusters + changes.changed_edges}
+
+    def style(element, attrs: Dict, removed: bool = False) -> Dict:
+        if removed:
+            return {**attrs, **_styles(element, REMOVED_COLOR, dashed=True)}
+        if id(element) in added:
+            return {**attrs, **_styles(element, ADDED_COLOR)}
+        if id(element) in changed:
+            return {**attrs, **_styles(element, CHANGED_COLOR)}
+        return attrs
+
+    nodes = [n._replace(attrs=style(n, n.attrs)) for n in new.nodes]
+    nodes += [
+        n._replace(attrs=style(n, n.attrs, removed=True), cluster=cluster_id(n.cluster)) for n in changes.removed_nodes
+    ]
+    clusters = [c._replace(attrs=style(c, c.attrs)) for c in new.clusters]
+    clusters += [
+        c._replace(attrs=style(c, c.attrs, removed=True), parent=cluster_id(c.parent)) for c in changes.removed_clusters
+    ]
+    edges = [e._replace(attrs=style(e, e.attrs)) for e in new.edges]
+    for e in changes.removed_edges:
+        attrs = {k: cluster_id(v) if k in ("ltail", "lhead") else v for k, v in e.attrs.items()}
+        edges.append(EdgeModel(node_id(e.tail), node_id(e.head), style(e, attrs, removed=True)))
+    return new._replace(nodes=tuple(nodes), clusters=tuple(clusters), edges=tuple(edges))
+
+
+class _Keys:
+    """Computes the stable keys and the comparable states of the model elements."""
+
+    def __init__(self, model: DiagramModel, by: str):
+        if by not in ("id", "structure"):
+            raise ValueError(f'"{by}" is not a valid diff key')
+        self.by = by
+        self.nodes = {n.id: n for n in model.nodes}
+        self.clusters = {c.id: c for c in model.clusters}
+        self._cluster_keys = {}
+        self._node_keys = {}
+        self._edge_keys = {}
+        # The index of each cluster among the clusters of the same parent, class and label.
+        self._sibling_index = {}
+        counts = Counter()
+        for cluster in model.clusters:
+            base = (cluster.parent, cluster.cls, cluster.label)
+            self._sibling_index[cluster.id] = counts[base]
+            counts[base] += 1
+        if by == "structure":
+            counts = Counter()
+            for node in model.nodes:
+                base = f"{self._structure_key(node.cluster)}/{node.cls}:{node.label}"
+                self._node_keys[node.id] = f"{base}#{counts[base]}"
+                counts[base] += 1
+        counts = Counter()
+        for edge in model.edges:
+            base = (self._node_key(edge.tail), self._node_key(edge.head))
+            self._edge_keys[id(edge)] = (*base, counts[base])
+            counts[base] += 1
+
+    def _structure_key(self, cluster_id: Optional[str]) -> str:
+        if cluster_id is None:
+            return ""
+        if cluster_id not in self._cluster_keys:
+            cluster = self.clusters[cluster_id]
+            base = f"{self._structure_key(cluster.parent)}/{cluster.cls}:{cluster.label}"
+            self._cluster_keys[cluster_id] = f"{base}#{self._sibling_index[cluster_id]}"
+        return self._cluster_keys[cluster_id]
+
+    def _cluster_key(self, cluster_id: Optional[str]) -> Optional[str]:
+        if cluster_id is None or self.by == "id" or cluster_id not in self.clusters:
+            return cluster_id
+        return self._structure_key(cluster_id)
+
+    def _node_key(self, node_id: str) -> str:
+        return self._node_keys.get(node_id, node_id)
+
+    def node(self, node: NodeModel) -> str:
+        return self._node_key(node.id)
+
+    def cluster(self, cluster: ClusterModel) -> str:
+        return self._cluster_key(cluster.id)
+
+    def edge(self, edge: EdgeModel) -> Tuple:
+        return self._edge_keys[id(edge)]
+
+    def node_state(self, node: NodeModel) -> Tuple:
+        return node.label, node.cls, node.icon, node.attrs, self._cluster_key(node.cluster)
+
+    def metadata_state(self, node: NodeModel) -> Tuple:
+        return node.tags, node.metadata
+
+    def cluster_state(self, cluster: ClusterModel) -> Tuple:
+        return cluster.label, cluster.cls, cluster.icon, cluster.attrs, self._cluster_key(cluster.parent)
+
+    def edge_state(self, edge: EdgeModel) -> Dict:
+        return {k: self._cluster_key(v) if k in ("ltail", "lhead") else v for k, v in edge.attrs.items()}
+
+
+def _structure(model: DiagramModel, ignore: FrozenSet[str] = frozenset()) -> Dict:
+    """Return the state of the model regardless of the element ids, without the ignored attributes."""
+    keys = _Keys(model, "structure")
+
+    def strip(attrs: Dict) -> Dict:
+        return {k: v for k, v in attrs.items() if k not in ignore}
+
+    return {
+        "graph_attr": strip(model.graph_attr),
+        "node_attr": strip(model.node_attr),
+        "edge_attr": strip(model.edge_attr),
+        "nodes": sorted((keys.node(n), keys.node_state(n._replace(attrs=strip(n.attrs)))) for n in model.nodes),
+        "clusters": sorted(
+            (keys.cluster(c), keys.cluster_state(c._replace(attrs=strip(c.attrs)))) for c in model.clusters
+        ),
+        "edges": sorted((keys.edge(e), keys.edge_state(e._replace(attrs=strip(e.attrs)))) for e in model.edges),
+    }
+
+
+def _hash(state: Dict) -> str:
+    return hashlib.sha256(json.dumps(state, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _compare(old, new, old_key, new_key, old_state, new_state):
+    old_elements = {old_key(e): e for e in old}
+    new_elements = {new_key(e): e for e in new}
+    added = tuple(e for k, e in new_elements.items() if k not in old_elements)
+    removed = tuple(e for k, e in old_elements.items() if k not in new_elements)
+    changed = tuple(
+        (old_elements[k], e)
+        for k, e in new_elements.items()
+        if k in old_elements and old_state(old_elements[k]) != new_state(e)
+    )
+    return added, removed, changed
+
+
+def _compare_attrs(old: Dict, new: Dict) -> Dict:
+    return {k: (old.get(k), new.get(k)) for k in {**old, **new} if old.get(k) != new.get(k)}
+
+
+def _styles(element, color: str, dashed: bool = False) -> Dict:
+    if isinstance(element, NodeModel):
+        # The icon nodes have no border, so draw a box around them.
+        return {
+            "shape": "box",
+            "style": "rounded,dashed" if dashed else "rounded,bold",
+            "color": color,
+            "fontcolor": color,
+            "penwidth": "2",
+        }
+    if isinstance(element, ClusterModel):
+        styles = {"pencolor": color, "penwidth": "2"}
+        if dashed:
+            styles["style"] = "rounded,dashed"
+        return styles
+    styles = {"color": color, "penwidth": "2"}
+    if dashed:
+        styles["style"] = "dashed"
+    return styles
@@ -0,0 +1,177 @@
+"""
+Draw provides the helpers shared by the writers drawing the diagrams from
+their layouts in plain python: the svg, the pdf and the html writers.
+
+The writers walk the exported layout along with the attributes of its
+elements, and resolve the line styles, the fonts, the icons and the cluster
+labels by the same rules, so their outputs look alike.
+"""
+
+import os
+import re
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple
+
+from .model import ClusterModel, DiagramModel
+from .utils import resource_dir
+
+# The default size of the icons of the clusters, as drawn by the nodes used as clusters.
+CLUSTER_ICON_SIZE = 30
+# The space between the icon and the label of a cluster, and between the label and the cluster border.
+CLUSTER_LABEL_PADDING = 8
+# The line height of the labels relative to their font size.
+LINE_HEIGHT = 1.2
+
+# The widths of the printable ascii characters in the Helvetica font, per 1000 units of the font size.
+# fmt: off
+_HELVETICA_WIDTHS = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+)
+# fmt: on
+
+_ICON_SIZE = re.compile(r'<TD[^>]*\bwidth="(\d+)"[^>]*><IMG', re.IGNORECASE)
+
+
+class LineStyle(NamedTuple):
+    """LineStyle represents the stroke of an element. The color is None if the element is invisible."""
+
+    color: Optional[str]
+    width: float
+    dash: Tuple[int, ...]
+
+
+class Font(NamedTuple):
+    """Font represents the font of a label."""
+
+    family: str
+    size: float
+    color: str
+
+
+class ClusterLabel(NamedTuple):
+    """ClusterLabel represents the position of a cluster label and of its icon, if any.
+
+    The text is aligned at x by the align ("start", "middle" or "end"), and
+    the icon is the left, top and size of its square.
+    """
+
+    align: str
+    x: float
+    y: float
+    icon: Optional[Tuple[float, float, float]]
+
+
+def clusters(model: DiagramModel, exported: Dict) -> Iterator[Tuple[Dict, ClusterModel, Dict]]:
+    """Yield the exported clusters along with their models and attributes, including the inherited ones."""
+    effective = model.effective_cluster_attrs()
+    models = {cluster.id: cluster for cluster in model.clusters}
+    for cluster in exported["clusters"]:
+        yield cluster, models[cluster["id"]], effective[cluster["id"]]
+
+
+def edges(model: DiagramModel, exported: Dict) -> Iterator[Tuple[Dict, Dict]]:
+    """Yield the exported edges along with their attributes, including the diagram defaults."""
+    # The exported edges keep the order of the model edges, skipping the ones without positions.
+    remaining = iter(model.edges)
+    for edge in exported["edges"]:
+        attrs = next(e for e in remaining if e.tail == edge["tail"] and e.head == edge["head"]).attrs
+        yield edge, {**model.edge_attr, **attrs}
+
+
+def nodes(model: DiagramModel, exported: Dict) -> Iterator[Tuple[Dict, Dict]]:
+    """Yield the exported nodes along with their attributes, including the diagram defaults."""
+    models = {node.id: node for node in model.nodes}
+    for node in exported["nodes"]:
+        yield node, {**model.node_attr, **models[node["id"]].attrs}
+
+
+def icon_path(model: DiagramModel, icon: str) -> str:
+    """Return the file path of an icon reference, resolved from the diagram "imagepath"."""
+    imagepath = model.graph_attr.get("imagepath") or resource_dir()
+    return os.path.normpath(icon if os.path.isabs(icon) else os.path.join(imagepath, icon))
+
+
+def cluster_icon_size(cluster: ClusterModel) -> float:
+    """Return the size of the icon of a cluster, from its html label."""
+    match = _ICON_SIZE.search(cluster.attrs.get("label", ""))
+    return float(match.group(1)) if match else CLUSTER_ICON_SIZE
+
+
+def cluster_label(exported: Dict, cluster: ClusterModel, attrs: Dict) -> ClusterLabel:
+    """Return the position of the label of an exported cluster, and of its icon left of the label."""
+    x0, y0, x1, _ = exported["bb"]
+    padding = CLUSTER_LABEL_PADDING
+    justify = attrs.get("labeljust", "c")
+    size = font_size(attrs)
+    icon_size = cluster_icon_size(cluster) if exported.get("icon") else 0
+    if "label_pos" in exported:
+        y = exported["label_pos"][1]
+    else:
+        y = y0 + padding + max(size, icon_size) / 2
+    if not icon_size:
+        align, x = {"l": ("start", x0 + padding), "r": ("end", x1 - padding)}.get(justify, ("middle", (x0 + x1) / 2))
+        return ClusterLabel(align, x, y, None)
+
+    # The icon and the first line of the label make a row, aligned as a whole.
+    width = icon_size + padding + text_width(exported["label"].split("\n")[0], size)
+    left = {"l": x0 + padding, "r": x1 - padding - width}.get(justify, (x0 + x1 - width) / 2)
+    return ClusterLabel("start", left + icon_size + padding, y, (left, y - icon_size / 2, icon_size))
+
+
+def line_style(attrs: Dict, color: str) -> LineStyle:
+    """Return the stroke of an element, whose color is the given attribute, falling back to "color"."""
+    style = attrs.get("style", "")
+    dash = (5, 2) if "dashed" in style else (1, 5) if "dotted" in style else ()
+    stroke = None if "invis" in style else first_color(attrs.get(color, attrs.get("color", "black")))
+    return LineStyle(stroke or None, to_float(attrs.get("penwidth"), 2 if "bold" in style else 1), dash)
+
+
+def fill_color(attrs: Dict) -> Optional[str]:
+    """Return the fill color of a node, or None if it isn't filled."""
+    if "filled" not in attrs.get("style", ""):
+        return None
+    return first_color(attrs.get("fillcolor", attrs.get("color", "lightgrey")))
+
+
+def font(attrs: Dict) -> Font:
+    return Font(attrs.get("fontname", "Times-Roman"), font_size(attrs), attrs.get("fontcolor", "black"))
+
+
+def shape(attrs: Dict) -> str:
+    """Return the drawn shape of a node: "box", "ellipse" or "none"."""
+    name = attrs.get("shape", "ellipse")
+    if name in ("box", "rect", "rectangle", "square"):
+        return "box"
+    if name in ("none", "plaintext", "plain"):
+        return "none"
+    return "ellipse"
+
+
+def first_color(color: str) -> str:
+    """Return the first color of the color lists, e.g. "red:blue"."""
+    return color.split(":")[0].split(";")[0].strip()
+
+
+def text_width(text: str, size: float) -> float:
+    """Return the width of the text, as drawn in Helvetica."""
+    units = sum(_HELVETICA_WIDTHS[ord(c) - 32] if 32 <= ord(c) < 127 else 556 for c in text)
+    return units * size / 1000
+
+
+def font_size(attrs: Dict) -> float:
+    return to_float(attrs.get("fontsize"), 14.0)
+
+
+def to_float(value, default: float) -> float:
+    try:
+        return float(str(value).split()[0])
+    except (IndexError, ValueError):
+        return default
+
+
+def num(value: float) -> str:
+    return f"{value:.2f}".rstrip("0").rstrip(".")
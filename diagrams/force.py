@@ -0,0 +1,316 @@
+"""
+Force provides a force-directed layout engine for the very large diagrams,
+e.g. network inventories of tens of thousands of nodes, whose hierarchical
+dot layout takes too long.
+
+The engine is multilevel: the graph is coarsened by merging the nodes along
+the edges, the coarsest graph is laid out from scratch, and each finer graph
+starts from the positions of the coarser one. The forces are vectorized with
+NumPy: the attraction along the edges, the repulsion between all the nodes,
+approximated by the centroids of a grid for the big graphs as Barnes-Hut
+does by a quadtree, and the gravity keeping the clusters together. The
+nodes are finally snapped to free slots, so none overlaps.
+
+The engine only computes the positions. The diagram is drawn by graphviz
+(`neato -n2`) with straight edges, as any cached layout.
+
+> The engine requires NumPy.
+"""
+
+import math
+from typing import Dict, List, Optional, Tuple
+
+from .diff import _Keys
+from .layout import Layout, _edge_key, _fit_clusters, _inches
+from .model import DiagramModel
+
+# The node count up to which the repulsion between all the node pairs is exact.
+EXACT_REPULSION_NODES = 1500
+# The node count of the coarsest graph of the multilevel layout.
+COARSEST_NODES = 50
+# The node count of the blocks the repulsion of the big graphs is computed by,
+# bounding the memory taken.
+BLOCK_NODES = 2048
+# The length of the arrowheads in points, as drawn by graphviz.
+ARROW_LENGTH = 10
+
+
+def force_layout(model: DiagramModel, iterations: int = 50, seed: int = 0) -> Layout:
+    """Lay out the model by the forces and return the positions.
+
+    :param model: Diagram model to lay out.
+    :param iterations: The number of the force iterations at each level.
+    :param seed: Seed of the random initial positions, for reproducible layouts.
+    """
+    np = _numpy()
+    keys = _Keys(model, "structure")
+    count = len(model.nodes)
+    if not count:
+        return Layout({"bb": "0,0,0,0"}, {}, {}, {})
+    index = {node.id: i for i, node in enumerate(model.nodes)}
+    pairs = [(index[e.tail], index[e.head]) for e in model.edges if e.tail in index and e.head in index]
+    edges = np.array([pair for pair in pairs if pair[0] != pair[1]], dtype=np.int64).reshape(-1, 2)
+
+    node_attr = model.node_attr
+    widths = np.array([_inches(n.attrs.get("width", node_attr.get("width")), 0.75) * 72 for n in model.nodes])
+    heights = np.array([_inches(n.attrs.get("height", node_attr.get("height")), 0.5) * 72 for n in model.nodes])
+    nodesep = _inches(model.graph_attr.get("nodesep"), 0.25) * 72
+    # The ideal distance of the connected nodes.
+    k = float(max(widths.max(), heights.max())) + nodesep
+
+    # The nodes of a top level cluster are pulled together.
+    clusters = {cluster.id: cluster for cluster in model.clusters}
+    tops = {}
+    for node in model.nodes:
+        cluster_id = node.cluster
+        while cluster_id is not None and clusters[cluster_id].parent is not None:
+            cluster_id = clusters[cluster_id].parent
+        tops[node.id] = cluster_id
+    top_ids = {cluster_id: i for i, cluster_id in enumerate(sorted(set(tops.values()) - {None}))}
+    groups = np.array([top_ids.get(tops[node.id], -1) for node in model.nodes], dtype=np.int64)
+
+    rng = np.random.default_rng(seed)
+    positions = _multilevel(np, rng, edges, groups, k, iterations)
+    slot_width, slot_height = float(widths.max()) + nodesep, float(heights.max()) + nodesep
+    positions = _snap(np, positions, slot_width, slot_height)
+
+    boxes = {}
+    nodes = {}
+    for i, node in enumerate(model.nodes):
+        x, y = float(positions[i, 0]), float(positions[i, 1])
+        boxes[node.id] = [x, y, float(widths[i]), float(heights[i])]
+        nodes[keys.node(node)] = {
+            "pos": f"{x:.2f},{y:.2f}",
+            "width": f"{widths[i] / 72:.4g}",
+            "height": f"{heights[i] / 72:.4g}",
+        }
+    cluster_positions, graph = _fit_clusters(model, keys, boxes)
+    # The edges are straight as the forces lay them out.
+    graph["splines"] = "line"
+    return Layout(graph, nodes, cluster_positions, _edge_positions(model, keys, boxes))
+
+
+def _edge_positions(model: DiagramModel, keys: _Keys, boxes: Dict[str, List[float]]) -> Dict[str, Dict[str, str]]:
+    """Return the straight splines of the edges between the node boxes, leaving the arrowheads room.
+
+    The loops are left to be routed when rendering.
+    """
+    edges = {}
+    for edge in model.edges:
+        if edge.tail == edge.head or edge.tail not in boxes or edge.head not in boxes:
+            continue
+        tail, head = boxes[edge.tail], boxes[edge.head]
+        direction = edge.attrs.get("dir", model.edge_attr.get("dir", "forward"))
+        arrow = ARROW_LENGTH * float(edge.attrs.get("arrowsize", model.edge_attr.get("arrowsize", 1)))
+        start, end = _clip(tail, head), _clip(head, tail)
+        items = []
+        if direction in ("back", "both"):
+            items.append("s,{:.2f},{:.2f}".format(*start))
+            start = _toward(start, end, arrow)
+        if direction in ("forward", "both"):
+            items.append("e,{:.2f},{:.2f}".format(*end))
+            end = _toward(end, start, arrow)
+        # The straight line as a cubic bezier curve.
+        for t in (0, 1 / 3, 2 / 3, 1):
+            items.append(f"{start[0] + (end[0] - start[0]) * t:.2f},{start[1] + (end[1] - start[1]) * t:.2f}")
+        edges[_edge_key(keys.edge(edge))] = {"pos": " ".join(items)}
+    return edges
+
+
+def _clip(box: List[float], other: List[float]) -> Tuple[float, float]:
+    """Return the point where the line from the center of the box to the other box leaves the box."""
+    x, y, width, height = box
+    dx, dy = other[0] - x, other[1] - y
+    scales = [width / 2 / abs(dx) if dx else math.inf, height / 2 / abs(dy) if dy else math.inf]
+    scale = min(min(scales), 1)
+    return x + dx * scale, y + dy * scale
+
+
+def _toward(point: Tuple[float, float], other: Tuple[float, float], length: float) -> Tuple[float, float]:
+    """Return the point moved by the length toward the other point, at most up to the middle."""
+    dx, dy = other[0] - point[0], other[1] - point[1]
+    distance = math.hypot(dx, dy)
+    if not distance:
+        return point
+    scale = min(length, distance / 2) / distance
+    return point[0] + dx * scale, point[1] + dy * scale
+
+
+def _multilevel(np, rng, edges, groups, k: float, iterations: int):
+    """Lay out the graph from its coarsest version to the finest one, and return the positions."""
+    levels = []
+    count = len(groups)
+    mass = np.ones(count)
+    while count > COARSEST_NODES and len(edges):
+        parents, coarse_count = _coarsen(np, rng, count, edges, groups)
+        # Stop when the matching hardly merges any node, e.g. in a star.
+        if coarse_count > count * 0.75:
+            break
+        levels.append((count, edges, groups, mass, parents))
+        coarse_edges = parents[edges]
+        coarse_edges = coarse_edges[coarse_edges[:, 0] != coarse_edges[:, 1]]
+        edges = np.unique(np.sort(coarse_edges, axis=1), axis=0) if len(coarse_edges) else coarse_edges
+        coarse_groups = np.full(coarse_count, -1, dtype=np.int64)
+        coarse_groups[parents] = groups
+        groups = coarse_groups
+        mass = np.bincount(parents, weights=mass, minlength=coarse_count)
+        count = coarse_count
+
+    side = k * math.sqrt(count)
+    positions = rng.uniform(0, side, (count, 2))
+    positions = _forces(np, positions, mass, edges, groups, k, iterations * 2, side / 5)
+    for count, edges, groups, mass, parents in reversed(levels):
+        # Each node starts next to the node it was merged into.
+        positions = positions[parents] + rng.normal(0, k / 10, (count, 2))
+        positions = _forces(np, positions, mass, edges, groups, k, iterations, k * 2)
+    return positions
+
+
+def _coarsen(np, rng, count: int, edges, groups) -> Tuple[object, int]:
+    """Match the nodes along the edges in random order, and return the coarse node of each node.
+
+    The coarse nodes merging the nodes of several clusters are pulled towards
+    one of them, which the finer levels correct.
+    """
+    parents = [-1] * count
+    coarse = 0
+    group_list = groups.tolist()
+    # The nodes of the same cluster are matched first, and the others after.
+    order = edges[rng.permutation(len(edges))].tolist()
+    for same_group in (True, False):
+        for a, b in order:
+            if parents[a] < 0 and parents[b] < 0 and (group_list[a] == group_list[b]) == same_group:
+                parents[a] = parents[b] = coarse
+                coarse += 1
+    # The unmatched nodes join a matched neighbour, which collapses the stars.
+    for a, b in order:
+        if parents[a] < 0 <= parents[b]:
+            parents[a] = parents[b]
+        elif parents[b] < 0 <= parents[a]:
+            parents[b] = parents[a]
+    for i in range(count):
+        if parents[i] < 0:
+            parents[i] = coarse
+            coarse += 1
+    return np.array(parents, dtype=np.int64), coarse
+
+
+def _forces(np, positions, mass, edges, groups, k: float, iterations: int, temperature: float):
+    """Move the nodes by the forces, cooling down linearly, and return the positions."""
+    count = len(positions)
+    grouped = groups >= 0
+    group_count = int(groups.max()) + 1 if grouped.any() else 0
+    for iteration in range(iterations):
+        step = temperature * (1 - iteration / iterations) + k / 100
+        displacement = _repulsion(np, positions, mass, k)
+        if len(edges):
+            # The attraction grows by the square of the distance.
+            delta = positions[edges[:, 0]] - positions[edges[:, 1]]
+            distance = np.sqrt((delta ** 2).sum(axis=1)) + 1e-9
+            force = delta * (distance / k)[:, None]
+            for axis in range(2):
+                displacement[:, axis] -= np.bincount(edges[:, 0], weights=force[:, axis], minlength=count)
+                displacement[:, axis] += np.bincount(edges[:, 1], weights=force[:, axis], minlength=count)
+        if group_count:
+            # The nodes of a cluster are pulled towards the center of the cluster.
+            sizes = np.bincount(groups[grouped], minlength=group_count)
+            for axis in range(2):
+                centers = np.bincount(groups[grouped], weights=positions[grouped, axis], minlength=group_count)
+                centers = centers / np.maximum(sizes, 1)
+                displacement[grouped, axis] -= (positions[grouped, axis] - centers[groups[grouped]]) / 2
+        # A weak gravity keeps the disconnected parts together.
+        displacement -= (positions - positions.mean(axis=0)) * 0.01
+        length = np.sqrt((displacement ** 2).sum(axis=1)) + 1e-9
+        positions = positions + displacement * (np.minimum(length, step) / length)[:, None]
+    return positions
+
+
+def _repulsion(np, positions, mass, k: float):
+    """Return the repulsion of the nodes, k^2 / d from each other, weighted by their mass."""
+    count = len(positions)
+    softening = (k / 100) ** 2
+    if count <= EXACT_REPULSION_NODES:
+        weights = k * k * mass[None, :] / (_distance2(np, positions, positions) + softening)
+        np.fill_diagonal(weights, 0)
+        # The sum of the weighted differences, w (p_i - p_j), by a matrix product.
+        return positions * weights.sum(axis=1)[:, None] - weights @ positions
+
+    # The far nodes repel by the centroids of the grid cells they are in.
+    side = max(2, int(math.ceil(2 * count ** 0.25)))
+    low, high = positions.min(axis=0), positions.max(axis=0)
+    cells = np.minimum(((positions - low) / np.maximum(high - low, 1e-9) * side).astype(np.int64), side - 1)
+    cell = cells[:, 0] * side + cells[:, 1]
+    cell_mass = np.bincount(cell, weights=mass, minlength=side * side)
+    sums = np.stack([np.bincount(cell, weights=mass * positions[:, axis], minlength=side * side) for axis in (0, 1)], 1)
+    centroids = sums / np.maximum(cell_mass, 1e-9)[:, None]
+
+    displacement = np.empty_like(positions)
+    for start in range(0, count, BLOCK_NODES):
+        block = positions[start : start + BLOCK_NODES]
+        own = cell[start : start + BLOCK_NODES]
+        weights = k * k * cell_mass[None, :] / (_distance2(np, block, centroids) + softening)
+        # The own cell of each node repels it by the centroid of the other nodes of the cell.
+        weights[np.arange(len(own)), own] = 0
+        displacement[start : start + BLOCK_NODES] = block * weights.sum(axis=1)[:, None] - weights @ centroids
+        block_mass = mass[start : start + BLOCK_NODES]
+        own_mass = cell_mass[own] - block_mass
+        own_centroid = (sums[own] - block_mass[:, None] * block) / np.maximum(own_mass, 1e-9)[:, None]
+        own_delta = block - own_centroid
+        own_weights = k * k * own_mass / ((own_delta ** 2).sum(axis=1) + softening)
+        displacement[start : start + BLOCK_NODES] += own_delta * own_weights[:, None]
+    return displacement
+
+
+def _distance2(np, points, others):
+    """Return the squared distances between the points and the others."""
+    return ((points ** 2).sum(axis=1)[:, None] + (others ** 2).sum(axis=1)[None, :] - 2 * points @ others.T).clip(min=0)
+
+
+def _snap(np, positions, slot_width: float, slot_height: float):
+    """Move each node to the nearest free slot of a grid, so that no nodes overlap."""
+    count = len(positions)
+    # Scale the layout to have about two slots per node, keeping its shape.
+    low, high = positions.min(axis=0), positions.max(axis=0)
+    span = np.maximum(high - low, 1e-9)
+    scale = math.sqrt(2 * count * slot_width * slot_height / float(span[0] * span[1])) if count > 1 else 1.0
+    grid = (positions - low) * scale / np.array([slot_width, slot_height])
+
+    taken = set()
+    slots: List[Optional[Tuple[int, int]]] = [None] * count
+    # The nodes nearer to the center are placed first, as they are the most crowded.
+    center = grid.mean(axis=0)
+    for i in np.argsort(((grid - center) ** 2).sum(axis=1)).tolist():
+        x, y = grid[i]
+        base_x, base_y = int(round(x)), int(round(y))
+        radius = 0
+        while slots[i] is None:
+            free = [slot for slot in _ring(base_x, base_y, radius) if slot not in taken]
+            if free:
+                slots[i] = min(free, key=lambda slot: (slot[0] - x) ** 2 + (slot[1] - y) ** 2)
+                taken.add(slots[i])
+            radius += 1
+    slots = np.array(slots, dtype=float)
+    slots -= slots.min(axis=0)
+    # Place the nodes at the centers of the slots in points.
+    return (slots + 0.5) * np.array([slot_width, slot_height])
+
+
+def _ring(x: int, y: int, radius: int) -> List[Tuple[int, int]]:
+    """Return the slots at the given Chebyshev distance from a slot."""
+    if not radius:
+        return [(x, y)]
+    side = range(-radius, radius)
+    return (
+        [(x + d, y - radius) for d in side]
+        + [(x + radius, y + d) for d in side]
+        + [(x - d, y + radius) for d in side]
+        + [(x - radius, y - d) for d in side]
+    )
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("NumPy is required for the force layout: pip install diagrams[force]")
+    return numpy
@@ -0,0 +1,303 @@
+"""
+Html provides the interactive html output of diagrams.
+
+The page draws the diagram layout on a canvas with pan and zoom. Only the
+elements in the viewport are drawn, and the icons are decoded only when
+their nodes get into view, so the huge diagrams open instantly. Every
+distinct icon is embedded once, so the page is self-contained.
+"""
+
+import json
+from typing import Dict
+from xml.sax.saxutils import escape
+
+from . import draw
+from .layout import Layout, compute_layout, export_layout
+from .model import DiagramModel
+from .svg import encode_icon
+
+# The canvas text alignments of the drawing ones.
+_ALIGNS = {"start": "left", "middle": "center", "end": "right"}
+
+_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+<style>
+html, body {{ margin: 0; height: 100%; overflow: hidden; background: {background}; }}
+canvas {{ display: block; width: 100%; height: 100%; cursor: grab; touch-action: none; }}
+canvas.panning {{ cursor: grabbing; }}
+</style>
+</head>
+<body>
+<canvas id="diagram"></canvas>
+<script>
+const diagram = {data};
+(function () {{
+  const canvas = document.getElementById("diagram");
+  const ctx = canvas.getContext("2d");
+  const view = {{ scale: 1, x: 0, y: 0 }};
+  const icons = {{}};
+  let pending = false;
+
+  // A grid of the elements by their boxes, to find the visible ones fast.
+  const CELL = 512;
+  const grid = new Map();
+  function index(kind, item, box) {{
+    item.kind = kind;
+    item.box = box;
+    for (let i = Math.floor(box[0] / CELL); i <= Math.floor(box[2] / CELL); i++) {{
+      for (let j = Math.floor(box[1] / CELL); j <= Math.floor(box[3] / CELL); j++) {{
+        const key = i + "," + j;
+        if (!grid.has(key)) grid.set(key, []);
+        grid.get(key).push(item);
+      }}
+    }}
+  }}
+  diagram.clusters.forEach((c, order) => {{ c.order = order; index(0, c, c.bb); }});
+  diagram.edges.forEach((e, order) => {{
+    const xs = e.points.map(p => p[0]), ys = e.points.map(p => p[1]);
+    e.order = order;
+    index(1, e, [Math.min(...xs) - 10, Math.min(...ys) - 10, Math.max(...xs) + 10, Math.max(...ys) + 10]);
+  }});
+  diagram.nodes.forEach((n, order) => {{
+    n.order = order;
+    index(2, n, [n.pos[0] - n.width / 2, n.pos[1] - n.height / 2, n.pos[0] + n.width / 2, n.pos[1] + n.height / 2]);
+  }});
+
+  function visible(left, top, right, bottom) {{
+    const found = new Set();
+    for (let i = Math.floor(left / CELL); i <= Math.floor(right / CELL); i++) {{
+      for (let j = Math.floor(top / CELL); j <= Math.floor(bottom / CELL); j++) {{
+        for (const item of grid.get(i + "," + j) || []) {{
+          const b = item.box;
+          if (b[0] <= right && b[2] >= left && b[1] <= bottom && b[3] >= top) found.add(item);
+        }}
+      }}
+    }}
+    // The clusters first, from the outer ones, then the edges and the nodes over them.
+    return [...found].sort((a, b) => a.kind - b.kind || a.order - b.order);
+  }}
+
+  function icon(ref) {{
+    if (!(ref in icons)) {{
+      icons[ref] = null;
+      const image = new Image();
+      image.onload = () => {{ icons[ref] = image; redraw(); }};
+      image.src = diagram.icons[ref];
+    }}
+    return icons[ref];
+  }}
+
+  function drawIcon(ref, x, top, size) {{
+    // Fit the icon into the square centered at x, keeping its aspect ratio.
+    const image = icon(ref);
+    if (!image) return;
+    const scale = size / Math.max(image.naturalWidth, image.naturalHeight);
+    const w = image.naturalWidth * scale, h = image.naturalHeight * scale;
+    ctx.drawImage(image, x - w / 2, top + (size - h) / 2, w, h);
+  }}
+
+  function text(label, x, y, font, align) {{
+    const lines = label.split("\\n");
+    ctx.font = font.size + "px " + font.family;
+    ctx.fillStyle = font.color;
+    ctx.textAlign = align || "center";
+    ctx.textBaseline = "middle";
+    lines.forEach((line, i) => ctx.fillText(line, x, y + (i - (lines.length - 1) / 2) * font.size * 1.2));
+  }}
+
+  function roundRect(x, y, w, h, r) {{
+    ctx.beginPath();
+    ctx.moveTo(x + r, y);
+    ctx.arcTo(x + w, y, x + w, y + h, r);
+    ctx.arcTo(x + w, y + h, x, y + h, r);
+    ctx.arcTo(x, y + h, x, y, r);
+    ctx.arcTo(x, y, x + w, y, r);
+    ctx.closePath();
+  }}
+
+  function draw() {{
+    pending = false;
+    const ratio = window.devicePixelRatio || 1;
+    const width = canvas.clientWidth, height = canvas.clientHeight;
+    if (canvas.width !== width * ratio || canvas.height !== height * ratio) {{
+      canvas.width = width * ratio;
+      canvas.height = height * ratio;
+    }}
+    ctx.setTransform(ratio, 0, 0, ratio, 0, 0);
+    ctx.clearRect(0, 0, width, height);
+    ctx.setTransform(ratio * view.scale, 0, 0, ratio * view.scale, ratio * view.x, ratio * view.y);
+    const left = -view.x / view.scale, top = -view.y / view.scale;
+    // Skip the details too small to see.
+    const detailed = view.scale > 0.25;
+    for (const item of visible(left, top, left + width / view.scale, top + height / view.scale)) {{
+      const style = item.style;
+      ctx.lineWidth = style.width;
+      ctx.strokeStyle = style.stroke;
+      ctx.setLineDash(style.dash);
+      if (item.kind === 0) {{
+        const [x0, y0, x1, y1] = item.bb;
+        roundRect(x0, y0, x1 - x0, y1 - y0, style.rounded ? 8 : 0);
+        if (style.fill) {{ ctx.fillStyle = style.fill; ctx.fill(); }}
+        ctx.stroke();
+        if (detailed && style.icon && diagram.icons[item.icon]) {{
+          const [iconLeft, iconTop, size] = style.icon;
+          drawIcon(item.icon, iconLeft + size / 2, iconTop, size);
+        }}
+        if (detailed && item.label) text(item.label, style.label.x, style.label.y, style.font, style.label.align);
+      }} else if (item.kind === 1) {{
+        const p = item.points;
+        ctx.beginPath();
+        ctx.moveTo(p[0][0], p[0][1]);
+        for (let i = 1; i + 2 < p.length; i += 3) {{
+          ctx.bezierCurveTo(p[i][0], p[i][1], p[i + 1][0], p[i + 1][1], p[i + 2][0], p[i + 2][1]);
+        }}
+        ctx.stroke();
+        ctx.setLineDash([]);
+        ctx.fillStyle = style.stroke;
+        for (const [end, base] of [["end", p[p.length - 1]], ["start", p[0]]]) {{
+          const tip = item[end];
+          if (!tip) continue;
+          const nx = (base[1] - tip[1]) * 0.35, ny = (tip[0] - base[0]) * 0.35;
+          ctx.beginPath();
+          ctx.moveTo(base[0] + nx, base[1] + ny);
+          ctx.lineTo(tip[0], tip[1]);
+          ctx.lineTo(base[0] - nx, base[1] - ny);
+          ctx.closePath();
+          ctx.fill();
+        }}
+        if (detailed && item.label && item.label_pos) {{
+          text(item.label, item.label_pos[0], item.label_pos[1], style.font);
+        }}
+      }} else {{
+        const [x, y] = item.pos;
+        const top = y - item.height / 2;
+        if (style.shape === "box") {{
+          roundRect(x - item.width / 2, top, item.width, item.height, style.rounded ? 8 : 0);
+          ctx.stroke();
+        }} else if (style.shape === "ellipse") {{
+          ctx.beginPath();
+          ctx.ellipse(x, y, item.width / 2, item.height / 2, 0, 0, 2 * Math.PI);
+          ctx.stroke();
+        }}
+        if (item.icon && diagram.icons[item.icon]) drawIcon(item.icon, x, top, Math.min(item.width, item.height));
+        if (detailed && item.label) {{
+          const lines = item.label.split("\\n").length;
+          const ly = style.bottom ? top + item.height - style.font.size * 1.2 * lines / 2 : y;
+          text(item.label, x, ly, style.font);
+        }}
+      }}
+    }}
+  }}
+
+  function redraw() {{
+    if (!pending) {{
+      pending = true;
+      requestAnimationFrame(draw);
+    }}
+  }}
+
+  function fit() {{
+    const width = canvas.clientWidth, height = canvas.clientHeight;
+    view.scale = Math.min(width / (diagram.width || 1), height / (diagram.height || 1), 1) * 0.95;
+    view.x = (width - diagram.width * view.scale) / 2;
+    view.y = (height - diagram.height * view.scale) / 2;
+    redraw();
+  }}
+
+  canvas.addEventListener("wheel", event => {{
+    event.preventDefault();
+    const factor = Math.exp(-event.deltaY * 0.0015);
+    view.x = event.offsetX - (event.offsetX - view.x) * factor;
+    view.y = event.offsetY - (event.offsetY - view.y) * factor;
+    view.scale *= factor;
+    redraw();
+  }}, {{ passive: false }});
+  let drag = null;
+  canvas.addEventListener("pointerdown", event => {{
+    drag = {{ x: event.clientX - view.x, y: event.clientY - view.y }};
+    canvas.setPointerCapture(event.pointerId);
+    canvas.classList.add("panning");
+  }});
+  canvas.addEventListener("pointermove", event => {{
+    if (!drag) return;
+    view.x = event.clientX - drag.x;
+    view.y = event.clientY - drag.y;
+    redraw();
+  }});
+  canvas.addEventListener("pointerup", () => {{ drag = null; canvas.classList.remove("panning"); }});
+  canvas.addEventListener("dblclick", fit);
+  window.addEventListener("resize", redraw);
+  fit();
+}})();
+</script>
+</body>
+</html>
+"""
+
+
+def write_html(model: DiagramModel, layout: Layout = None) -> str:
+    """Return the interactive html page of the diagram model.
+
+    The page is self-contained: the layout and every distinct icon are
+    embedded into it. It pans by dragging, zooms by the mouse wheel and fits
+    the diagram into the window by double clicking.
+
+    :param model: Diagram model to draw.
+    :param layout: Layout of the model, e.g. from a `LayoutCache`. Default is computed by dot.
+    """
+    layout = layout or compute_layout(model)
+    exported = export_layout(model, layout)
+
+    icons = {}
+
+    def add_icon(icon: str) -> None:
+        if icon not in icons:
+            try:
+                icons[icon] = encode_icon(draw.icon_path(model, icon)).data_uri
+            except OSError:
+                icons[icon] = None
+
+    for node, attrs in draw.nodes(model, exported):
+        node["style"] = {
+            **_stroke(attrs, "color"),
+            "shape": draw.shape(attrs),
+            "rounded": "rounded" in attrs.get("style", ""),
+            "bottom": attrs.get("labelloc") == "b",
+            "font": draw.font(attrs)._asdict(),
+        }
+        if node["icon"] and attrs.get("image"):
+            add_icon(node["icon"])
+
+    for cluster, cluster_model, attrs in draw.clusters(model, exported):
+        label = draw.cluster_label(cluster, cluster_model, attrs)
+        cluster["style"] = {
+            **_stroke(attrs, "pencolor"),
+            "fill": cluster_model.attrs.get("bgcolor"),
+            "rounded": "rounded" in attrs.get("style", ""),
+            "label": {"align": _ALIGNS[label.align], "x": label.x, "y": label.y},
+            "icon": label.icon,
+            "font": draw.font(attrs)._asdict(),
+        }
+        if label.icon:
+            add_icon(cluster["icon"])
+
+    for edge, attrs in draw.edges(model, exported):
+        edge["style"] = {**_stroke(attrs, "color"), "font": draw.font(attrs)._asdict()}
+
+    exported["icons"] = icons
+    # The data can't close the script element.
+    data = json.dumps(exported).replace("</", "<\\/")
+    return _TEMPLATE.format(
+        title=escape(model.name or model.filename),
+        background=escape(model.graph_attr.get("bgcolor", "white")),
+        data=data,
+    )
+
+
+def _stroke(attrs: Dict, color: str) -> Dict:
+    style = draw.line_style(attrs, color)
+    return {"stroke": style.color or "transparent", "width": style.width, "dash": list(style.dash)}
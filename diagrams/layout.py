@@ -0,0 +1,1058 @@
+"""
+Layout provides the computed positions of the diagram elements and a cache
+of them, so the diagrams only restyled are redrawn without running the
+dot layout again.
+
+The positions are keyed by the structure of the elements (see `diff`),
+which doesn't depend on the random ids of the diagrams built by scripts.
+A cached layout is drawn by `neato -n2`, which takes the positions as is.
+The layout of a changed diagram can be seeded from its previous version
+too, keeping the unchanged elements in place.
+"""
+
+import collections
+import concurrent.futures
+import hashlib
+import heapq
+import json
+import math
+import os
+import subprocess
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from graphviz.backend import ExecutableNotFound, run
+
+from .diff import _hash, _Keys, _structure
+from .model import ClusterModel, DiagramModel, EdgeModel, NodeModel
+from .presets import PRESETS
+
+# The attributes which don't change the positions of the elements. The
+# fonts (fontname, fontsize) are deliberately left out: they change the
+# size of the labels, so the nodes, the clusters and the edge labels would
+# overlap or clip when drawn at the cached positions, and dot has to lay
+# the diagram out again. The arrows (dir, arrowhead, arrowtail, arrowsize)
+# are left out too: dot clips the edges to make room for their arrows, and
+# records the clipped ends in the edge positions.
+PRESENTATION_ATTRS = frozenset(
+    {
+        "bgcolor",
+        "class",
+        "color",
+        "fillcolor",
+        "fontcolor",
+        "gradientangle",
+        "href",
+        "labelfontcolor",
+        "pencolor",
+        "penwidth",
+        "style",
+        "target",
+        "tooltip",
+        "URL",
+    }
+)
+
+# The position attributes of the elements in the layout output.
+_GRAPH_POSITIONS = ("bb", "lp")
+_NODE_POSITIONS = ("pos", "width", "height")
+_CLUSTER_POSITIONS = ("bb", "lp")
+_EDGE_POSITIONS = ("pos", "lp", "xlp", "head_lp", "tail_lp")
+
+# The cheaper settings the layout is retried with in turn when it exceeds
+# its time limit: the name, the extra command line arguments and the graph
+# attributes of each.
+FALLBACKS = (
+    ("no_ortho", (), {"splines": "spline"}),
+    ("reduced_mincross", (), PRESETS["fast"]),
+    ("sfdp", ("-Ksfdp",), {"splines": "line"}),
+)
+
+# The margin of the clusters around their content and the height of their
+# labels, in points.
+CLUSTER_MARGIN = 8
+CLUSTER_LABEL_HEIGHT = 20
+
+# The bytes per pixel of the surfaces the raster outputs are drawn on.
+RASTER_PIXEL_BYTES = 4
+
+# The incremental layouts are only seeded from the previous layouts having
+# at least this share of the nodes, and the diagrams are laid out by dot
+# again after this many incremental layouts in a row, so the placement
+# heuristics don't pile up.
+INCREMENTAL_MIN_OVERLAP = 0.5
+INCREMENTAL_MAX_EDITS = 10
+
+
+class Layout(NamedTuple):
+    """Layout represents the positions of the diagram elements keyed by their structure."""
+
+    graph: Dict[str, str]
+    nodes: Dict[str, Dict[str, str]]
+    clusters: Dict[str, Dict[str, str]]
+    edges: Dict[str, Dict[str, str]]
+    # The name of the fallback the layout was computed with, if any.
+    fallback: Optional[str] = None
+    # The number of the incremental layouts since the last dot layout.
+    seeded: int = 0
+
+
+def layout_key(model: DiagramModel) -> str:
+    """Return a hash of the model structure without the presentation attributes.
+
+    The models having the same key have the same layout.
+    """
+    return _hash(_structure(model, ignore=PRESENTATION_ATTRS))
+
+
+def compute_layout(model: DiagramModel, timeout: float = None) -> Layout:
+    """Run the dot layout of the model and return the positions.
+
+    :param model: Diagram model to lay out.
+    :param timeout: Time limit of the layout in seconds. The layout exceeding
+        it is killed and retried with the cheaper settings of the fallbacks in
+        turn, and the layout records the fallback it was computed with.
+    :raises subprocess.TimeoutExpired: if the last fallback exceeds the time limit too.
+    """
+    if timeout is None:
+        return parse_layout(model, model.to_dot().pipe(format="json"))
+    attempts = [(None, (), {})] + fallbacks(model)
+    for i, (name, args, attrs) in enumerate(attempts):
+        source = model._replace(graph_attr={**model.graph_attr, **attrs}).source
+        cmd = ["dot", *args, "-Tjson"]
+        try:
+            proc = subprocess.run(
+                cmd, input=source.encode(), stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout, check=True
+            )
+        except FileNotFoundError:
+            raise ExecutableNotFound(cmd)
+        except subprocess.TimeoutExpired:
+            if i == len(attempts) - 1:
+                raise
+            continue
+        return parse_layout(model, proc.stdout)._replace(fallback=name)
+
+
+def fallbacks(model: DiagramModel) -> List[Tuple[str, Tuple[str, ...], Dict[str, str]]]:
+    """Return the fallbacks the layout of the model is retried with when exceeding its time limit.
+
+    The ones not making the layout any cheaper, e.g. dropping the orthogonal
+    edges of a diagram without them, are skipped.
+    """
+    attempts = []
+    for name, args, attrs in FALLBACKS:
+        if name == "no_ortho" and model.graph_attr.get("splines") != "ortho":
+            continue
+        attempts.append((name, args, attrs))
+    return attempts
+
+
+def parse_layout(model: DiagramModel, data: bytes) -> Layout:
+    """Parse the positions of the model elements from the dot json output.
+
+    :param model: Diagram model laid out.
+    :param data: Output of the model rendered in the json format.
+    """
+    graph = json.loads(data)
+    keys = _Keys(model, "structure")
+    objects = graph.get("objects", [])
+    subgraph_count = graph.get("_subgraph_cnt", 0)
+
+    clusters = {}
+    for obj in objects[:subgraph_count]:
+        if obj["name"] in keys.clusters:
+            clusters[keys.cluster(keys.clusters[obj["name"]])] = _positions(obj, _CLUSTER_POSITIONS)
+    nodes = {}
+    for obj in objects[subgraph_count:]:
+        if obj["name"] in keys.nodes:
+            nodes[keys.node(keys.nodes[obj["name"]])] = _positions(obj, _NODE_POSITIONS)
+    # The edges are listed grouped by their tail nodes rather than in the
+    # order they were added, so they are matched by their ends, and the
+    # edges repeating the same ends in the order they were added.
+    names = {obj["_gvid"]: obj["name"] for obj in objects}
+    ends = {}
+    for obj in sorted(graph.get("edges", []), key=lambda obj: obj["_gvid"]):
+        ends.setdefault((names[obj["tail"]], names[obj["head"]]), collections.deque()).append(obj)
+    edges = {}
+    for edge in model.edges:
+        matched = ends.get((edge.tail, edge.head))
+        if matched:
+            edges[_edge_key(keys.edge(edge))] = _positions(matched.popleft(), _EDGE_POSITIONS)
+    return Layout(_positions(graph, _GRAPH_POSITIONS), nodes, clusters, edges)
+
+
+def split_components(model: DiagramModel) -> List[DiagramModel]:
+    """Split the model into its connected components, each a model of its own.
+
+    The nodes of a top level cluster are kept in one component, since the
+    cluster is laid out as a whole. The diagram label is left to the packed
+    layout of the components.
+    """
+    clusters = {cluster.id: cluster for cluster in model.clusters}
+
+    def top(cluster_id):
+        while clusters[cluster_id].parent is not None:
+            cluster_id = clusters[cluster_id].parent
+        return cluster_id
+
+    # Union the nodes connected by the edges or sharing a top level cluster.
+    parents = {node.id: node.id for node in model.nodes}
+
+    def find(item):
+        while parents[item] != item:
+            parents[item] = parents[parents[item]]
+            item = parents[item]
+        return item
+
+    def union(a, b):
+        parents[find(a)] = find(b)
+
+    tops = {}
+    for node in model.nodes:
+        if node.cluster is not None:
+            union(node.id, tops.setdefault(top(node.cluster), node.id))
+    for edge in model.edges:
+        if edge.tail in parents and edge.head in parents:
+            union(edge.tail, edge.head)
+
+    groups = {}
+    for node in model.nodes:
+        groups.setdefault(find(node.id), []).append(node)
+    graph_attr = {k: v for k, v in model.graph_attr.items() if k != "label"}
+    components = []
+    for nodes in groups.values():
+        ids = {node.id for node in nodes}
+        used = set()
+        for node in nodes:
+            cluster_id = node.cluster
+            while cluster_id is not None and cluster_id not in used:
+                used.add(cluster_id)
+                cluster_id = clusters[cluster_id].parent
+        components.append(
+            model._replace(
+                graph_attr=graph_attr,
+                nodes=tuple(nodes),
+                clusters=tuple(cluster for cluster in model.clusters if cluster.id in used),
+                edges=tuple(edge for edge in model.edges if edge.tail in ids),
+            )
+        )
+    return components
+
+
+def pack_layouts(model: DiagramModel, components: List[DiagramModel], layouts: List[Layout]) -> Layout:
+    """Pack the layouts of the components of the model into one layout of the model, as gvpack does.
+
+    The components are placed in rows by their height, filling about a square.
+
+    :param model: Diagram model the components were split from.
+    :param components: The components of the model, see `split_components`.
+    :param layouts: The layouts of the components.
+    """
+    pack = model.graph_attr.get("pack", "")
+    margin = float(pack) if pack.isdigit() else _inches(model.graph_attr.get("nodesep"), 0.25) * 72
+    boxes = [_box(layout.graph.get("bb", "0,0,0,0")) for layout in layouts]
+    sizes = [(right - left + margin, top - bottom + margin) for left, bottom, right, top in boxes]
+    row_width = max([math.sqrt(sum(w * h for w, h in sizes))] + [w for w, _ in sizes])
+
+    # Place the components from the top left, in rows of the tallest ones first.
+    offsets = [None] * len(layouts)
+    x = y = row_height = 0.0
+    for i in sorted(range(len(layouts)), key=lambda i: -sizes[i][1]):
+        width, height = sizes[i]
+        if x and x + width > row_width:
+            x, y, row_height = 0.0, y + row_height, 0.0
+        offsets[i] = (x, y)
+        x, row_height = x + width, max(row_height, height)
+    # The margin of the last row is left out.
+    total_height = y + row_height - margin
+
+    keys = _Keys(model, "structure")
+    graph, nodes, clusters, edges = {}, {}, {}, {}
+    fallback = next((layout.fallback for layout in layouts if layout.fallback), None)
+    placed = []
+    for component, layout, box, (x, y) in zip(components, layouts, boxes, offsets):
+        # The component keys are the ones computed by the component itself.
+        component_keys = _Keys(component, "structure")
+        # The y axis points up, so the rows go down from the top.
+        dx, dy = x - box[0], total_height - y - box[3]
+        placed.append((box[0] + dx, box[1] + dy, box[2] + dx, box[3] + dy))
+        for node in component.nodes:
+            positions = layout.nodes.get(component_keys.node(node))
+            if positions is not None:
+                nodes[keys.node(node)] = _shift(positions, dx, dy)
+        for cluster in component.clusters:
+            positions = layout.clusters.get(component_keys.cluster(cluster))
+            if positions is not None:
+                clusters[keys.cluster(cluster)] = _shift(positions, dx, dy)
+        for edge in component.edges:
+            positions = layout.edges.get(_edge_key(component_keys.edge(edge)))
+            if positions is not None:
+                edges[_edge_key(keys.edge(edge))] = _shift(positions, dx, dy)
+    if placed:
+        left, bottom = min(box[0] for box in placed), min(box[1] for box in placed)
+        right, top = max(box[2] for box in placed), max(box[3] for box in placed)
+        if model.graph_attr.get("label"):
+            bottom -= 30
+        graph["bb"] = f"{left:.2f},{bottom:.2f},{right:.2f},{top:.2f}"
+    return Layout(graph, nodes, clusters, edges, fallback)
+
+
+def compute_component_layout(model: DiagramModel, timeout: float = None, max_workers: int = None) -> Layout:
+    """Lay out the connected components of the model in parallel and pack them.
+
+    The components are laid out by dot processes of their own, run from
+    worker threads, so the diagram scripts aren't imported again by worker
+    processes, which the spawn start method of macOS and Windows would do.
+
+    :param model: Diagram model to lay out.
+    :param timeout: Time limit of the layout of each component, see `compute_layout`.
+    :param max_workers: The number of the layouts run at once. Default is decided by the executor.
+    """
+    components = split_components(model)
+    if len(components) < 2:
+        return compute_layout(model, timeout)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        layouts = list(executor.map(compute_layout, components, [timeout] * len(components)))
+    return pack_layouts(model, components, layouts)
+
+
+def compute_cluster_layout(
+    model: DiagramModel, timeout: float = None, cache: "LayoutCache" = None, max_workers: int = None
+) -> Layout:
+    """Lay out each cluster of the model independently and compose the layouts.
+
+    The content of each cluster is laid out in the direction of the cluster,
+    having its child clusters as boxes of their own layout size, so the
+    clusters can be laid out in their own directions, and the clusters of
+    the same depth in parallel dot processes. The edges crossing the
+    clusters are routed when rendering.
+
+    :param model: Diagram model to lay out.
+    :param timeout: Time limit of the layout of each cluster, see `compute_layout`.
+    :param cache: Layout cache to reuse the layouts of the unchanged clusters.
+    :param max_workers: The number of the layouts run at once. Default is decided by the executor.
+    """
+    if not model.clusters:
+        return compute_layout(model, timeout)
+    clusters = {cluster.id: cluster for cluster in model.clusters}
+    effective = model.effective_cluster_attrs()
+
+    def depth(cluster_id):
+        return 0 if cluster_id is None else depth(clusters[cluster_id].parent) + 1
+
+    levels = {}
+    for cluster in model.clusters:
+        levels.setdefault(depth(cluster.id), []).append(cluster.id)
+    # The children are laid out before their parents, as their sizes are
+    # taken by the layout of the parents.
+    scopes = [levels[d] for d in sorted(levels, reverse=True)] + [[None]]
+
+    results, sizes = {}, {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for level in scopes:
+            subs = {scope: _scope_model(model, scope, clusters, effective[scope], sizes) for scope in level}
+            layouts = {}
+            for scope, (sub, _) in subs.items():
+                if not sub.nodes:
+                    layouts[scope] = Layout({"bb": "0,0,0,0"}, {}, {}, {})
+                elif cache is not None:
+                    layouts[scope] = cache.get(sub)
+            pending = [scope for scope in level if layouts.get(scope) is None]
+            computed = executor.map(compute_layout, [subs[s][0] for s in pending], [timeout] * len(pending))
+            for scope, layout in zip(pending, computed):
+                layouts[scope] = layout
+                if cache is not None:
+                    cache.put(subs[scope][0], layout)
+            for scope in level:
+                results[scope] = (*subs[scope], layouts[scope])
+                if scope is not None:
+                    left, bottom, right, top = _box(layouts[scope].graph.get("bb", "0,0,0,0"))
+                    label = CLUSTER_LABEL_HEIGHT if clusters[scope].label else 0
+                    sizes[scope] = (right - left + 2 * CLUSTER_MARGIN, top - bottom + 2 * CLUSTER_MARGIN + label)
+
+    keys = _Keys(model, "structure")
+    nodes, cluster_positions, edges = {}, {}, {}
+
+    def place(scope, dx, dy):
+        sub, pairs, layout = results[scope]
+        sub_keys = _Keys(sub, "structure")
+        for node in sub.nodes:
+            positions = layout.nodes.get(sub_keys.node(node))
+            if positions is None:
+                continue
+            if node.id not in clusters:
+                nodes[keys.node(node)] = _shift(positions, dx, dy)
+                continue
+            # Place the cluster at its box, and its content below its label.
+            x, y = _point(positions["pos"])
+            x, y = x + dx, y + dy
+            cluster = clusters[node.id]
+            width, height = sizes[cluster.id]
+            bb = f"{x - width / 2:.2f},{y - height / 2:.2f},{x + width / 2:.2f},{y + height / 2:.2f}"
+            cluster_positions[keys.cluster(cluster)] = {"bb": bb}
+            left, bottom, right, top = _box(results[cluster.id][2].graph.get("bb", "0,0,0,0"))
+            label = CLUSTER_LABEL_HEIGHT if cluster.label else 0
+            place(cluster.id, x - (left + right) / 2, y - label / 2 - (bottom + top) / 2)
+        for sub_edge, edge in pairs:
+            positions = layout.edges.get(_edge_key(sub_keys.edge(sub_edge)))
+            if edge is not None and positions is not None:
+                edges[_edge_key(keys.edge(edge))] = _shift(positions, dx, dy)
+
+    place(None, 0, 0)
+    graph = dict(results[None][2].graph)
+    if model.graph_attr.get("label") and "bb" in graph:
+        left, bottom, right, top = _box(graph["bb"])
+        graph["bb"] = f"{left:.2f},{bottom - 30:.2f},{right:.2f},{top:.2f}"
+    fallback = next((result[2].fallback for result in results.values() if result[2].fallback), None)
+    return Layout(graph, nodes, cluster_positions, edges, fallback)
+
+
+def _scope_model(
+    model: DiagramModel,
+    scope: Optional[str],
+    clusters: Dict[str, ClusterModel],
+    attrs: Dict[str, str],
+    sizes: Dict[str, Tuple[float, float]],
+) -> Tuple[DiagramModel, List[Tuple[EdgeModel, Optional[EdgeModel]]]]:
+    """Return the model of the content of a cluster (or the diagram if None), with its child clusters as boxes.
+
+    The edges are returned along with the edges of the model they are laid
+    out for, or None if they only connect the boxes of the child clusters.
+    """
+
+    def item(node_id):
+        # The node, or the child cluster of the scope containing the node.
+        node = nodes[node_id]
+        if node.cluster == scope:
+            return node.id
+        cluster_id = node.cluster
+        while cluster_id is not None:
+            if clusters[cluster_id].parent == scope:
+                return cluster_id
+            cluster_id = clusters[cluster_id].parent
+        return None
+
+    nodes = {node.id: node for node in model.nodes}
+    scope_nodes = [node._replace(cluster=None) for node in model.nodes if node.cluster == scope]
+    for cluster in clusters.values():
+        if cluster.parent == scope:
+            width, height = sizes[cluster.id]
+            box = {"shape": "box", "fixedsize": "true", "width": f"{width / 72:.4f}", "height": f"{height / 72:.4f}"}
+            # The box is drawn by the cluster itself, so it has no label of its own.
+            scope_nodes.append(NodeModel(cluster.id, "", cluster.cls, None, box))
+
+    pairs = []
+    for edge in model.edges:
+        if edge.tail not in nodes or edge.head not in nodes:
+            continue
+        tail, head = item(edge.tail), item(edge.head)
+        if tail is None or head is None or tail == head:
+            continue
+        if (tail, head) == (edge.tail, edge.head):
+            edge_attrs = {k: v for k, v in edge.attrs.items() if k not in ("ltail", "lhead")}
+            pairs.append((EdgeModel(tail, head, edge_attrs), edge))
+        else:
+            pairs.append((EdgeModel(tail, head, {}), None))
+
+    graph_attr = {k: v for k, v in model.graph_attr.items() if k != "label"}
+    graph_attr.update({k: attrs[k] for k in ("rankdir", "nodesep", "ranksep") if k in attrs})
+    sub = model._replace(
+        graph_attr=graph_attr, nodes=tuple(scope_nodes), clusters=(), edges=tuple(edge for edge, _ in pairs)
+    )
+    return sub, pairs
+
+
+def seed_layout(model: DiagramModel, previous: Layout) -> Layout:
+    """Lay out the model incrementally from the layout of its previous version.
+
+    The nodes and the edges which were in the previous version keep their
+    positions, so the diagram doesn't jump around. The new nodes are placed
+    next to their neighbours, the clusters are fitted around their content
+    and the new edges are left to be routed when rendering. The new nodes
+    get no crossing minimization nor rank constraints, so `LayoutCache` only
+    seeds the layouts sharing most of their nodes with the previous one.
+
+    :param model: Diagram model to lay out.
+    :param previous: Layout of the previous version of the model.
+    """
+    keys = _Keys(model, "structure")
+    node_attr = model.node_attr
+    boxes = {}
+    for node in model.nodes:
+        positions = previous.nodes.get(keys.node(node))
+        if positions and "pos" in positions:
+            x, y = _point(positions["pos"])
+            width = _inches(positions.get("width"), 0.75) * 72
+            height = _inches(positions.get("height"), 0.5) * 72
+            boxes[node.id] = [x, y, width, height]
+
+    neighbours = {node.id: [] for node in model.nodes}
+    for edge in model.edges:
+        if edge.tail in neighbours and edge.head in neighbours:
+            neighbours[edge.tail].append(edge.head)
+            neighbours[edge.head].append(edge.tail)
+    rankdir = model.graph_attr.get("rankdir", "TB")
+    vertical = rankdir in ("TB", "BT")
+    ranksep = _inches(model.graph_attr.get("ranksep"), 0.5) * 72
+    nodesep = _inches(model.graph_attr.get("nodesep"), 0.25) * 72
+
+    sizes = {}
+    for node in model.nodes:
+        if node.id not in boxes:
+            width = _inches(node.attrs.get("width", node_attr.get("width")), 0.75) * 72
+            height = _inches(node.attrs.get("height", node_attr.get("height")), 0.5) * 72
+            sizes[node.id] = (width, height)
+    # The overlapping boxes are in the neighbouring cells of a grid of the
+    # biggest box size, so each box is only checked against those.
+    all_sizes = list(sizes.values()) + [(box[2], box[3]) for box in boxes.values()]
+    grid = _Grid(
+        max((w for w, _ in all_sizes), default=0) + nodesep, max((h for _, h in all_sizes), default=0) + nodesep
+    )
+    # The extents of the placed nodes of each cluster and of the whole diagram.
+    extents = {}
+    clusters_of = {node.id: node.cluster for node in model.nodes}
+
+    def add(node_id, box):
+        boxes[node_id] = box
+        grid.add(box)
+        for key in (("cluster", clusters_of[node_id]), ("all",)):
+            extents.setdefault(key, _Extent()).add(box)
+
+    for node_id, box in list(boxes.items()):
+        add(node_id, box)
+
+    # Place the nodes having the most placed neighbours first.
+    order = {node.id: i for i, node in enumerate(model.nodes)}
+    placed_neighbours = {node_id: sum(m in boxes for m in neighbours[node_id]) for node_id in sizes}
+    heap = [(-count, order[node_id], node_id) for node_id, count in placed_neighbours.items()]
+    heapq.heapify(heap)
+    scans = {}
+    while heap:
+        count, _, node_id = heapq.heappop(heap)
+        if node_id in boxes or -count != placed_neighbours[node_id]:
+            continue
+        width, height = sizes[node_id]
+        anchors = _Extent()
+        for m in neighbours[node_id]:
+            if m in boxes:
+                anchors.add(boxes[m])
+        if not anchors.count:
+            anchors = extents.get(("cluster", clusters_of[node_id])) or extents.get(("all",)) or anchors
+        if anchors.count:
+            # Next rank after the anchors.
+            x, y = anchors.x / anchors.count, anchors.y / anchors.count
+            if rankdir == "TB":
+                y = anchors.bottom - ranksep - height / 2
+            elif rankdir == "BT":
+                y = anchors.top + ranksep + height / 2
+            elif rankdir == "RL":
+                x = anchors.left - ranksep - width / 2
+            else:
+                x = anchors.right + ranksep + width / 2
+        else:
+            x, y = width / 2, height / 2
+        box = [x, y, width, height]
+        # The boxes are never moved, so the scan from the same start resumes
+        # where the previous one found a free place.
+        start = (x, y, width, height)
+        if start in scans:
+            box[0], box[1] = scans[start]
+        while grid.overlaps(box, nodesep):
+            if vertical:
+                box[0] += width + nodesep
+            else:
+                box[1] -= height + nodesep
+        scans[start] = box[0], box[1]
+        add(node_id, box)
+        for m in neighbours[node_id]:
+            if m in placed_neighbours and m not in boxes:
+                placed_neighbours[m] += 1
+                heapq.heappush(heap, (-placed_neighbours[m], order[m], m))
+
+    clusters, graph = _fit_clusters(model, keys, boxes)
+
+    nodes = {}
+    for node in model.nodes:
+        x, y, width, height = boxes[node.id]
+        nodes[keys.node(node)] = {
+            "pos": f"{x:.2f},{y:.2f}",
+            "width": f"{width / 72:.4g}",
+            "height": f"{height / 72:.4g}",
+        }
+    # The edges between the previous nodes keep their routes, and the new
+    # ones are routed when rendering.
+    edges = {}
+    for edge in model.edges:
+        key = _edge_key(keys.edge(edge))
+        if key in previous.edges:
+            edges[key] = previous.edges[key]
+    return Layout(graph, nodes, clusters, edges, seeded=previous.seeded + 1)
+
+
+def layout_overlap(model: DiagramModel, layout: Layout) -> float:
+    """Return the share of the nodes of the model positioned by the layout, from 0 to 1."""
+    if not model.nodes:
+        return 1.0
+    keys = _Keys(model, "structure")
+    return sum(keys.node(node) in layout.nodes for node in model.nodes) / len(model.nodes)
+
+
+def positioned(model: DiagramModel, layout: Layout) -> Optional[DiagramModel]:
+    """Return the model having the positions of the layout set to its elements.
+
+    The edges missing in the layout are routed when rendering.
+
+    :return: The positioned model, or None if the layout misses any node of the model.
+    """
+    keys = _Keys(model, "structure")
+    try:
+        nodes = tuple(n._replace(attrs={**n.attrs, **layout.nodes[keys.node(n)]}) for n in model.nodes)
+    except KeyError:
+        return None
+    clusters = tuple(c._replace(attrs={**c.attrs, **layout.clusters.get(keys.cluster(c), {})}) for c in model.clusters)
+    edges = tuple(e._replace(attrs={**e.attrs, **layout.edges.get(_edge_key(keys.edge(e)), {})}) for e in model.edges)
+    graph_attr = {**model.graph_attr, **layout.graph}
+    # The splines are given, so any spline style but none draws them.
+    if graph_attr.get("splines") in ("ortho", "curved", "polyline"):
+        graph_attr["splines"] = "true"
+    return model._replace(graph_attr=graph_attr, nodes=nodes, clusters=clusters, edges=edges)
+
+
+def render_positioned(
+    model: DiagramModel, directory: str = None, outformat: str = None, cleanup: bool = True
+) -> str:
+    """Render a positioned model without running the layout and return the output file path."""
+    outformat = outformat or model.outformat
+    dot = model.to_dot()
+    filepath = dot.save(directory=directory)
+    rendered = f"{filepath}.{outformat}"
+    cmd = ["neato", "-n2", f"-T{outformat}", "-o", rendered, filepath]
+    try:
+        run(cmd, capture_output=True, check=True)
+    finally:
+        if cleanup:
+            os.remove(filepath)
+    return rendered
+
+
+def raster_size(graph_attr: Dict[str, str], layout: Layout) -> Tuple[int, int]:
+    """Return the width and the height in pixels of the raster output of a layout.
+
+    :param graph_attr: The diagram attributes scaling the output (dpi, pad and size).
+    :param layout: Layout of the diagram.
+    """
+    left, bottom, right, top = _box(layout.graph.get("bb", "0,0,0,0"))
+    width, height = right - left, top - bottom
+    size = graph_attr.get("size", "")
+    size_width, size_height = _pair(size.rstrip("!"), 0)
+    if width and height and size_width and size_height:
+        scale = min(size_width * 72 / width, size_height * 72 / height)
+        # The drawing is scaled down to the size, or up too if it ends with "!".
+        if scale < 1 or size.endswith("!"):
+            width, height = width * scale, height * scale
+    pad_x, pad_y = _pair(graph_attr.get("pad"), 4 / 72)
+    dpi = _inches(graph_attr.get("dpi") or graph_attr.get("resolution"), 0) or 96.0
+    return (
+        math.ceil((width / 72 + 2 * pad_x) * dpi),
+        math.ceil((height / 72 + 2 * pad_y) * dpi),
+    )
+
+
+def fit_raster(
+    graph_attr: Dict[str, str], layout: Layout, max_pixels: int = None, max_bytes: int = None
+) -> Optional[float]:
+    """Return the dpi fitting the raster output of a layout into the limits.
+
+    The bytes are the ones of the surface the output is drawn on, which the
+    renderer holds in memory at once.
+
+    :param graph_attr: The diagram attributes scaling the output (dpi, pad and size).
+    :param layout: Layout of the diagram.
+    :param max_pixels: The maximum number of the output pixels.
+    :param max_bytes: The maximum size of the output surface in bytes.
+    :return: The fitting dpi, or None if the output fits already.
+    """
+    limits = [limit for limit in (max_pixels, max_bytes and max_bytes // RASTER_PIXEL_BYTES) if limit]
+    if not limits:
+        return None
+    limit = min(limits)
+    width, height = raster_size(graph_attr, layout)
+    if width * height <= limit:
+        return None
+    dpi = _inches(graph_attr.get("dpi") or graph_attr.get("resolution"), 0) or 96.0
+    # The output grows by the square of the dpi, and the rounding up of the
+    # pixels is made up for by shrinking it a bit further.
+    dpi = math.floor(dpi * math.sqrt(limit / (width * height)) * 100) / 100
+    while dpi > 0.01 and _area(raster_size({**graph_attr, "dpi": str(dpi)}, layout)) > limit:
+        dpi = math.floor(dpi * 99) / 100
+    return dpi
+
+
+def export_layout(model: DiagramModel, layout: Layout = None) -> Dict:
+    """Return the layout of the model as plain data for drawing it elsewhere, e.g. in a browser.
+
+    The coordinates are in points, with the origin at the top left corner
+    like in the svg output. The boxes are lists of the left, top, right and
+    bottom coordinates, and the edge splines are lists of the cubic bezier
+    control points. The label positions are the centers of the labels.
+
+    :param model: Diagram model to export.
+    :param layout: Layout of the model. Default is computed by dot.
+    """
+    layout = layout or compute_layout(model)
+    keys = _Keys(model, "structure")
+    left, bottom, right, top = _box(layout.graph.get("bb", "0,0,0,0"))
+
+    def point(x: float, y: float) -> List[float]:
+        return [round(x - left, 2), round(top - y, 2)]
+
+    def box(bb: str) -> List[float]:
+        x0, y0, x1, y1 = _box(bb)
+        return point(x0, y1) + point(x1, y0)
+
+    nodes = []
+    for node in model.nodes:
+        positions = layout.nodes.get(keys.node(node), {})
+        if "pos" not in positions:
+            continue
+        x, y = _point(positions["pos"])
+        nodes.append(
+            {
+                "id": node.id,
+                "label": node.label,
+                "class": node.cls,
+                "icon": node.icon,
+                "cluster": node.cluster,
+                "tags": list(node.tags),
+                "pos": point(x, y),
+                "width": round(_inches(positions.get("width"), 0.75) * 72, 2),
+                "height": round(_inches(positions.get("height"), 0.5) * 72, 2),
+            }
+        )
+    clusters = []
+    for cluster in model.clusters:
+        positions = layout.clusters.get(keys.cluster(cluster), {})
+        if "bb" not in positions:
+            continue
+        clusters.append(
+            {
+                "id": cluster.id,
+                "label": cluster.label,
+                "class": cluster.cls,
+                "icon": cluster.icon,
+                "parent": cluster.parent,
+                "bb": box(positions["bb"]),
+            }
+        )
+        if "lp" in positions:
+            clusters[-1]["label_pos"] = point(*_point(positions["lp"]))
+    edges = []
+    for edge in model.edges:
+        positions = layout.edges.get(_edge_key(keys.edge(edge)), {})
+        if "pos" not in positions:
+            continue
+        spline = _spline(positions["pos"])
+        exported = {
+            "tail": edge.tail,
+            "head": edge.head,
+            "label": edge.attrs.get("label", ""),
+            "points": [point(*p) for p in spline["points"]],
+        }
+        for end in ("start", "end"):
+            if end in spline:
+                exported[end] = point(*spline[end])
+        if "lp" in positions:
+            exported["label_pos"] = point(*_point(positions["lp"]))
+        edges.append(exported)
+    exported = {
+        "name": model.name,
+        "width": round(right - left, 2),
+        "height": round(top - bottom, 2),
+        "nodes": nodes,
+        "clusters": clusters,
+        "edges": edges,
+    }
+    if "lp" in layout.graph:
+        exported["label_pos"] = point(*_point(layout.graph["lp"]))
+    return exported
+
+
+class LayoutCache:
+    """LayoutCache stores the computed layouts in a directory, keyed by `layout_key`."""
+
+    def __init__(
+        self,
+        directory: str = None,
+        incremental: bool = False,
+        min_overlap: float = INCREMENTAL_MIN_OVERLAP,
+        max_edits: int = INCREMENTAL_MAX_EDITS,
+    ):
+        """LayoutCache represents a persistent layout cache.
+
+        :param directory: Cache directory. Default is "diagrams/layouts" in the user cache directory.
+        :param incremental: Lay out the changed diagrams from the layout of
+            their previous version (see `seed_layout`) instead of running
+            the dot layout again.
+        :param min_overlap: The least share of the nodes the previous layout
+            must have to lay a diagram out incrementally, see `layout_overlap`.
+        :param max_edits: The number of the incremental layouts in a row
+            after which the diagram is laid out by dot again.
+        """
+        if directory is None:
+            cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+            directory = os.path.join(cache_home, "diagrams", "layouts")
+        self.directory = directory
+        self.incremental = incremental
+        self.min_overlap = min_overlap
+        self.max_edits = max_edits
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _latest_path(self, model: DiagramModel) -> str:
+        # The latest layout of each diagram is kept by its filename.
+        return self._path("latest-" + hashlib.sha256(model.filename.encode()).hexdigest())
+
+    def get(self, model: DiagramModel) -> Optional[Layout]:
+        """Return the cached layout of the model, or None if it isn't cached."""
+        return self._read(self._path(layout_key(model)))
+
+    def previous(self, model: DiagramModel) -> Optional[Layout]:
+        """Return the latest layout rendered for the diagram of the same filename, or None."""
+        return self._read(self._latest_path(model))
+
+    def put(self, model: DiagramModel, layout: Layout) -> None:
+        """Store the layout of the model."""
+        self._write(self._path(layout_key(model)), layout)
+
+    def render(self, model: DiagramModel, directory: str = None, outformat: str = None, cleanup: bool = True) -> str:
+        """Render the model reusing its cached layout, or laying it out and caching the layout.
+
+        :param model: Diagram model to render.
+        :param directory: Output directory. Default is the current directory.
+        :param outformat: Output format. Default is the format of the model.
+        :param cleanup: Remove the dot source file after rendering.
+        :return: The output file path.
+        """
+        layout = self.layout(model)
+        return render_positioned(positioned(model, layout), directory=directory, outformat=outformat, cleanup=cleanup)
+
+    def layout(
+        self, model: DiagramModel, timeout: float = None, parallel: bool = False, clusters: bool = False
+    ) -> Layout:
+        """Return the cached layout of the model, or lay it out and cache the layout.
+
+        :param model: Diagram model to lay out.
+        :param timeout: Time limit of the layout, see `compute_layout`.
+        :param parallel: Lay out the connected components in parallel, see `compute_component_layout`.
+        :param clusters: Lay out the clusters independently, caching each of
+            them, see `compute_cluster_layout`.
+        """
+        layout = self.get(model)
+        if layout is None or positioned(model, layout) is None:
+            previous = self.previous(model) if self.incremental else None
+            if previous and self._seeds(model, previous):
+                layout = seed_layout(model, previous)
+            elif clusters:
+                layout = compute_cluster_layout(model, timeout, cache=self)
+            elif parallel:
+                layout = compute_component_layout(model, timeout)
+            else:
+                layout = compute_layout(model, timeout)
+            self.put(model, layout)
+        self._write(self._latest_path(model), layout)
+        return layout
+
+    def _seeds(self, model: DiagramModel, previous: Layout) -> bool:
+        # Whether the model is laid out from the previous layout rather than by dot.
+        return previous.seeded < self.max_edits and layout_overlap(model, previous) >= self.min_overlap
+
+    @staticmethod
+    def _read(path: str) -> Optional[Layout]:
+        try:
+            with open(path) as f:
+                return Layout(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _write(self, path: str, layout: Layout) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        # Write to a temporary file first, so the concurrent readers never see a partial layout.
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(layout._asdict(), f)
+        os.replace(tmp, path)
+
+
+def _point(pos: str) -> Tuple[float, float]:
+    x, y = pos.rstrip("!").split(",")[:2]
+    return float(x), float(y)
+
+
+def _box(bb: str) -> Tuple[float, float, float, float]:
+    x0, y0, x1, y1 = (float(v) for v in bb.split(","))
+    return x0, y0, x1, y1
+
+
+def _spline(pos: str) -> Dict:
+    """Parse an edge spline, e.g. "e,10,10 0,0 3,3 7,7 10,10".
+
+    The start and the end points are the tips of the arrows at the tail and the head.
+    """
+    spline = {"points": []}
+    # Only the first spline of the multi-edges split by ";" is taken.
+    for item in pos.split(";")[0].split():
+        parts = item.split(",")
+        if parts[0] in ("e", "s"):
+            spline["end" if parts[0] == "e" else "start"] = (float(parts[1]), float(parts[2]))
+        else:
+            spline["points"].append((float(parts[0]), float(parts[1])))
+    return spline
+
+
+def _shift(positions: Dict[str, str], dx: float, dy: float) -> Dict[str, str]:
+    """Return the positions moved by the offset."""
+
+    def point(item):
+        parts = item.split(",")
+        # The points of the splines may be prefixed by "e," or "s".
+        prefix, (x, y) = parts[:-2], parts[-2:]
+        pinned = "!" if y.endswith("!") else ""
+        return ",".join(prefix + [f"{float(x) + dx:.2f}", f"{float(y.rstrip('!')) + dy:.2f}{pinned}"])
+
+    shifted = {}
+    for name, value in positions.items():
+        if name == "bb":
+            left, bottom, right, top = _box(value)
+            shifted[name] = f"{left + dx:.2f},{bottom + dy:.2f},{right + dx:.2f},{top + dy:.2f}"
+        elif name in ("pos", "lp", "xlp", "head_lp", "tail_lp"):
+            shifted[name] = ";".join(" ".join(point(item) for item in spline.split()) for spline in value.split(";"))
+        else:
+            shifted[name] = value
+    return shifted
+
+
+def _inches(value: Optional[str], default: float) -> float:
+    # e.g. "0.75 equally" for ranksep.
+    try:
+        return float(str(value).split()[0])
+    except (IndexError, ValueError):
+        return default
+
+
+def _pair(value: Optional[str], default: float) -> Tuple[float, float]:
+    # e.g. "2.0" or "0.5,1" for pad and size.
+    try:
+        parts = [float(v) for v in str(value).split(",")[:2]]
+    except ValueError:
+        return default, default
+    return parts[0], parts[-1] if len(parts) > 1 else parts[0]
+
+
+def _area(size: Tuple[int, int]) -> int:
+    return size[0] * size[1]
+
+
+def _overlaps(box, other, gap: float) -> bool:
+    return abs(box[0] - other[0]) * 2 < box[2] + other[2] + gap and abs(box[1] - other[1]) * 2 < box[3] + other[3] + gap
+
+
+class _Extent:
+    """The running sums of the centers and the bounds of the boxes."""
+
+    def __init__(self):
+        self.count = 0
+        self.x = self.y = 0.0
+        self.left = self.bottom = math.inf
+        self.right = self.top = -math.inf
+
+    def add(self, box) -> None:
+        x, y, width, height = box
+        self.count += 1
+        self.x += x
+        self.y += y
+        self.left, self.right = min(self.left, x - width / 2), max(self.right, x + width / 2)
+        self.bottom, self.top = min(self.bottom, y - height / 2), max(self.top, y + height / 2)
+
+
+class _Grid:
+    """A grid of the boxes by their centers, for finding the overlapping ones nearby."""
+
+    def __init__(self, width: float, height: float):
+        self.width = width or 1.0
+        self.height = height or 1.0
+        self.cells = {}
+
+    def _cell(self, box) -> Tuple[int, int]:
+        return int(math.floor(box[0] / self.width)), int(math.floor(box[1] / self.height))
+
+    def add(self, box) -> None:
+        self.cells.setdefault(self._cell(box), []).append(box)
+
+    def overlaps(self, box, gap: float) -> bool:
+        col, row = self._cell(box)
+        return any(
+            _overlaps(box, other, gap)
+            for dx in (-1, 0, 1)
+            for dy in (-1, 0, 1)
+            for other in self.cells.get((col + dx, row + dy), ())
+        )
+
+
+def _bounds(boxes) -> Tuple[float, float, float, float]:
+    return (
+        min(box[0] - box[2] / 2 for box in boxes),
+        min(box[1] - box[3] / 2 for box in boxes),
+        max(box[0] + box[2] / 2 for box in boxes),
+        max(box[1] + box[3] / 2 for box in boxes),
+    )
+
+
+def _fit_clusters(model: DiagramModel, keys: _Keys, boxes: Dict[str, List[float]]) -> Tuple[Dict, Dict]:
+    """Fit the clusters around their content, and return their positions and the graph positions.
+
+    :param boxes: The center, the width and the height of each node by its id.
+    """
+    clusters = {}
+    members = {}
+    for node in model.nodes:
+        members.setdefault(node.cluster, []).append(boxes[node.id])
+    children = {}
+    for cluster in model.clusters:
+        children.setdefault(cluster.parent, []).append(cluster)
+
+    def fit(cluster):
+        content = list(members.get(cluster.id, ()))
+        for child in children.get(cluster.id, ()):
+            child_box = fit(child)
+            if child_box:
+                content.append(child_box)
+        if not content:
+            return None
+        left, bottom, right, top = _bounds(content)
+        left, bottom = left - CLUSTER_MARGIN, bottom - CLUSTER_MARGIN
+        right, top = right + CLUSTER_MARGIN, top + CLUSTER_MARGIN
+        if cluster.label:
+            top += CLUSTER_LABEL_HEIGHT
+        clusters[keys.cluster(cluster)] = {"bb": f"{left:.2f},{bottom:.2f},{right:.2f},{top:.2f}"}
+        return [(left + right) / 2, (bottom + top) / 2, right - left, top - bottom]
+
+    content = list(members.get(None, ()))
+    for cluster in children.get(None, ()):
+        cluster_box = fit(cluster)
+        if cluster_box:
+            content.append(cluster_box)
+    graph = {}
+    if content:
+        left, bottom, right, top = _bounds(content)
+        if model.graph_attr.get("label"):
+            bottom -= 30
+        graph["bb"] = f"{left:.2f},{bottom:.2f},{right:.2f},{top:.2f}"
+    return clusters, graph
+
+
+def _positions(obj: Dict, names) -> Dict[str, str]:
+    return {k: obj[k] for k in names if k in obj}
+
+
+def _edge_key(key) -> str:
+    return json.dumps(list(key))
@@ -0,0 +1,177 @@
+"""
+Model provides a compact, picklable snapshot of a built diagram.
+
+A snapshot holds only plain data (ids, labels, class paths, icon references
+and dot attributes), so it can be shipped to worker processes cheaply and
+turned back into the dot source or rendered there.
+"""
+
+import concurrent.futures
+import os
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from graphviz import Digraph
+
+from .utils import resource_dir
+
+
+class NodeModel(NamedTuple):
+    """NodeModel represents a node of a diagram snapshot."""
+
+    id: str
+    label: str
+    cls: str
+    icon: Optional[str]
+    attrs: Dict[str, str]
+    cluster: Optional[str] = None
+    tags: Tuple[str, ...] = ()
+    metadata: Optional[Dict] = None
+
+
+class ClusterModel(NamedTuple):
+    """ClusterModel represents a cluster of a diagram snapshot."""
+
+    id: str
+    label: str
+    cls: str
+    icon: Optional[str]
+    attrs: Dict[str, str]
+    parent: Optional[str] = None
+
+
+class EdgeModel(NamedTuple):
+    """EdgeModel represents an edge of a diagram snapshot."""
+
+    tail: str
+    head: str
+    attrs: Dict[str, str]
+
+
+class DiagramModel(NamedTuple):
+    """DiagramModel represents a finished diagram as plain data."""
+
+    name: str
+    filename: str
+    outformat: str
+    graph_attr: Dict[str, str]
+    node_attr: Dict[str, str]
+    edge_attr: Dict[str, str]
+    nodes: Tuple[NodeModel, ...] = ()
+    clusters: Tuple[ClusterModel, ...] = ()
+    edges: Tuple[EdgeModel, ...] = ()
+
+    def extend(self, *parts) -> "DiagramModel":
+        """Return a new model having the nodes, clusters and edges of the given parts appended.
+
+        :param parts: Objects having the nodes, clusters and edges, e.g. template instances.
+        """
+        return self._replace(
+            nodes=self.nodes + tuple(node for part in parts for node in part.nodes),
+            clusters=self.clusters + tuple(cluster for part in parts for cluster in part.clusters),
+            edges=self.edges + tuple(edge for part in parts for edge in part.edges),
+        )
+
+    def to_dot(self) -> Digraph:
+        """Build the graphviz dot graph of the snapshot."""
+        dot = Digraph(self.name, filename=self.filename)
+        dot.graph_attr.update(self.graph_attr)
+        # Icon references are relative to the resources of this installation.
+        dot.graph_attr.setdefault("imagepath", resource_dir())
+        dot.node_attr.update(self.node_attr)
+        dot.edge_attr.update(self.edge_attr)
+
+        nodes = {}
+        for node in self.nodes:
+            nodes.setdefault(node.cluster, []).append(node)
+        clusters = {}
+        for cluster in self.clusters:
+            clusters.setdefault(cluster.parent, []).append(cluster)
+
+        def build(graph: Digraph, parent: Optional[str]):
+            for node in nodes.get(parent, ()):
+                graph.node(node.id, label=node.label, **node.attrs)
+            for cluster in clusters.get(parent, ()):
+                subgraph = Digraph(cluster.id)
+                subgraph.graph_attr.update(cluster.attrs)
+                build(subgraph, cluster.id)
+                graph.subgraph(subgraph)
+
+        build(dot, None)
+        for edge in self.edges:
+            dot.edge(edge.tail, edge.head, **edge.attrs)
+        return dot
+
+    def effective_cluster_attrs(self) -> Dict[Optional[str], Dict[str, str]]:
+        """Return the attributes of the clusters along with the ones inherited from their parents.
+
+        The attributes are keyed by the cluster ids, and the None key holds the diagram ones.
+        """
+        clusters = {cluster.id: cluster for cluster in self.clusters}
+        effective = {None: self.graph_attr}
+
+        def resolve(cluster_id: Optional[str]) -> Dict[str, str]:
+            if cluster_id not in effective:
+                cluster = clusters[cluster_id]
+                effective[cluster_id] = {**resolve(cluster.parent), **cluster.attrs}
+            return effective[cluster_id]
+
+        for cluster_id in clusters:
+            resolve(cluster_id)
+        return effective
+
+    @property
+    def source(self) -> str:
+        return self.to_dot().source
+
+    def pipe(self, format: str = None) -> bytes:
+        """Return the output of the snapshot rendered in the given format."""
+        dot = self.to_dot()
+        data = dot.pipe(format=format or self.outformat)
+        if (format or self.outformat) == "svg":
+            # The svg module depends on the model.
+            from .svg import absolute_icons
+
+            data = absolute_icons(data.decode("utf-8"), dot.graph_attr["imagepath"]).encode("utf-8")
+        return data
+
+    def render(self, directory: str = None, outformat: str = None) -> str:
+        """Render the snapshot into a file and return the output file path."""
+        dot = self.to_dot()
+        rendered = dot.render(directory=directory, format=outformat or self.outformat, cleanup=True, quiet=True)
+        if (outformat or self.outformat) == "svg":
+            from .svg import absolute_icons_file
+
+            absolute_icons_file(rendered, dot.graph_attr["imagepath"])
+        return rendered
+
+
+def class_path(cls: type) -> str:
+    """Return the path of a node class relative to the diagrams package, e.g. "aws.compute.EC2"."""
+    module = cls.__module__
+    if module.startswith("diagrams."):
+        module = module[len("diagrams.") :]
+        # Core classes are exported by the diagrams package itself.
+        if module == cls.__name__:
+            return cls.__name__
+    return f"{module}.{cls.__name__}"
+
+
+def render_all(models: Iterable[DiagramModel], directory: str = None, max_workers: int = None) -> List[str]:
+    """Render the snapshots in parallel.
+
+    Each snapshot is rendered by graphviz processes of its own, run from
+    worker threads, so the calling script isn't imported again by worker
+    processes, which the spawn start method of macOS and Windows would do.
+
+    :param models: Diagram snapshots to render.
+    :param directory: Output directory. Default is the current directory.
+    :param max_workers: The number of the snapshots rendered at once. Default is the number of CPUs.
+    :return: The output file paths in the same order as the snapshots.
+    """
+    models = list(models)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        return list(executor.map(_render, models, [directory] * len(models)))
+
+
+def _render(model: DiagramModel, directory: Optional[str]) -> str:
+    return os.path.abspath(model.render(directory=directory))
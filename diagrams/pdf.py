@@ -0,0 +1,438 @@
+"""
+Pdf provides the multi-page pdf output of many diagrams at once.
+
+The diagrams are drawn from their layouts into one document, one page per
+diagram, and every distinct icon is embedded once and shared by all the
+pages. The decoded icons are cached for the whole process.
+"""
+
+import concurrent.futures
+import functools
+import struct
+import zlib
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from . import draw
+from .colors import rgb
+from .draw import LINE_HEIGHT, font_size, num, text_width, to_float
+from .layout import Layout, compute_layout, export_layout
+from .model import DiagramModel
+
+# The control point distance of the bezier curves approximating the quarter circles.
+_KAPPA = 0.5523
+# The valid bit depths of the png color types.
+_PNG_BITS = {0: (1, 2, 4, 8, 16), 2: (8, 16), 3: (1, 2, 4, 8), 4: (8, 16), 6: (8, 16)}
+
+
+class PdfImage(NamedTuple):
+    """PdfImage represents an icon decoded for embedding into pdf documents."""
+
+    width: int
+    height: int
+    color_space: str
+    bits: int
+    data: bytes
+    decode_parms: Optional[str] = None
+    smask: Optional[bytes] = None
+
+
+def write_pdf(
+    models: Iterable[DiagramModel], path: str, layouts: Iterable[Layout] = None, max_workers: int = None
+) -> str:
+    """Draw the diagram models into one pdf document, one page per diagram.
+
+    Every distinct icon is embedded once and shared by all the pages.
+
+    :param models: Diagram models to draw.
+    :param path: Output file path.
+    :param layouts: Layouts of the models in the same order, e.g. from a
+        `LayoutCache`. Default is computed by dot, in parallel.
+    :param max_workers: The number of the dot layouts run at once. Default is decided by the executor.
+    :return: The output file path.
+    """
+    models = list(models)
+    if layouts is None:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            layouts = list(executor.map(compute_layout, models))
+    document = _PdfDocument()
+    for model, layout in zip(models, layouts):
+        document.page(model, layout)
+    with open(path, "wb") as f:
+        f.write(document.build())
+    return path
+
+
+@functools.lru_cache(maxsize=None)
+def decode_icon(path: str) -> Optional[PdfImage]:
+    """Decode a png icon for embedding into pdf documents, or None if it isn't supported.
+
+    The icons are decoded once for the whole process. The interlaced ones
+    and the palette ones of less than 8 bits with transparency aren't supported.
+    The 16 bit ones are reduced to 8 bits, which pdf 1.4 is limited to.
+
+    :raises ValueError: If the png is malformed or truncated.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if data[:8] != b"\x89PNG\r\n\x1a\n":
+        return None
+    chunks = {}
+    idat = []
+    offset = 8
+    while offset + 8 <= len(data):
+        length, kind = struct.unpack(">I4s", data[offset : offset + 8])
+        if offset + 12 + length > len(data):
+            raise ValueError(f'"{path}" is a truncated png')
+        body = data[offset + 8 : offset + 8 + length]
+        if kind == b"IDAT":
+            idat.append(body)
+        else:
+            chunks.setdefault(kind, body)
+        offset += 12 + length
+    header = chunks.get(b"IHDR")
+    if header is None or len(header) != 13:
+        raise ValueError(f'"{path}" is a malformed png, having no valid IHDR chunk')
+    width, height, bits, color_type, _, _, interlace = struct.unpack(">IIBBBBB", header)
+    if bits not in _PNG_BITS.get(color_type, ()):
+        raise ValueError(f'"{path}" is a malformed png, having {bits} bits of color type {color_type}')
+    if not idat:
+        raise ValueError(f'"{path}" is a malformed png, having no IDAT chunk')
+    if interlace:
+        return None
+    idat = b"".join(idat)
+    channels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}[color_type]
+    if color_type == 3:
+        palette = chunks.get(b"PLTE", b"")
+        color_space = f"[/Indexed /DeviceRGB {len(palette) // 3 - 1} <{palette.hex()}>]"
+    else:
+        color_space = "/DeviceGray" if color_type in (0, 4) else "/DeviceRGB"
+
+    transparency = chunks.get(b"tRNS") if color_type == 3 else None
+    if bits <= 8 and (color_type in (0, 2) or (color_type == 3 and not transparency)):
+        # No transparency, so the compressed data is embedded as is.
+        colors = 1 if color_type == 3 else channels
+        parms = f"<< /Predictor 15 /Colors {colors} /BitsPerComponent {bits} /Columns {width} >>"
+        return PdfImage(width, height, color_space, bits, idat, parms)
+    if bits < 8:
+        return None
+
+    bpp = channels * bits // 8
+    try:
+        raw = zlib.decompress(idat)
+    except zlib.error as e:
+        raise ValueError(f'"{path}" is a malformed png, having corrupt image data: {e}')
+    if len(raw) != height * (1 + width * bpp):
+        raise ValueError(f'"{path}" is a malformed png, having image data not matching its size')
+    pixels = _unfilter(raw, width, height, bpp)
+    if bits == 16:
+        # Only the high bytes of the samples.
+        pixels = pixels[0::2]
+    if color_type in (0, 2):
+        return PdfImage(width, height, color_space, 8, zlib.compress(bytes(pixels)))
+    if color_type == 3:
+        alpha = bytes(transparency[i] if i < len(transparency) else 255 for i in pixels)
+        color = pixels
+    else:
+        alpha = pixels[channels - 1 :: channels]
+        color = bytearray(len(pixels) // channels * (channels - 1))
+        for channel in range(channels - 1):
+            color[channel :: channels - 1] = pixels[channel::channels]
+    return PdfImage(width, height, color_space, 8, zlib.compress(bytes(color)), smask=zlib.compress(alpha))
+
+
+class _PdfDocument:
+    """Accumulates the pages and the shared resources of a pdf document."""
+
+    def __init__(self):
+        self.pages = []
+        self.images = {}
+
+    def page(self, model: DiagramModel, layout: Layout) -> None:
+        page = _PdfPage(self, model, layout)
+        self.pages.append((page.width, page.height, page.draw()))
+
+    def image(self, path: str) -> Optional[Tuple[str, PdfImage]]:
+        """Return the resource name and the image of the icon, registering it once for all the pages."""
+        if path not in self.images:
+            image = decode_icon(path)
+            self.images[path] = (f"Im{len(self.images)}", image) if image else None
+        return self.images[path]
+
+    def build(self) -> bytes:
+        objects = []
+
+        def add(content) -> int:
+            objects.append(content)
+            return len(objects)
+
+        catalog = add(None)
+        pages = add(None)
+        font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        xobjects = []
+        for name, image in filter(None, self.images.values()):
+            smask = ""
+            if image.smask is not None:
+                mask = _stream(
+                    f"/Type /XObject /Subtype /Image /Width {image.width} /Height {image.height} "
+                    f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode",
+                    image.smask,
+                )
+                smask = f" /SMask {add(mask)} 0 R"
+            parms = f" /DecodeParms {image.decode_parms}" if image.decode_parms else ""
+            number = add(
+                _stream(
+                    f"/Type /XObject /Subtype /Image /Width {image.width} /Height {image.height} "
+                    f"/ColorSpace {image.color_space} /BitsPerComponent {image.bits} "
+                    f"/Filter /FlateDecode{parms}{smask}",
+                    image.data,
+                )
+            )
+            xobjects.append(f"/{name} {number} 0 R")
+        # The pages share one resources dictionary, so each icon is embedded once.
+        resources = add(f"<< /Font << /F1 {font} 0 R >> /XObject << {' '.join(xobjects)} >> >>".encode())
+        kids = []
+        for width, height, content in self.pages:
+            contents = add(_stream("/Filter /FlateDecode", zlib.compress(content.encode("latin-1"))))
+            kids.append(
+                add(
+                    f"<< /Type /Page /Parent {pages} 0 R /MediaBox [0 0 {num(width)} {num(height)}] "
+                    f"/Resources {resources} 0 R /Contents {contents} 0 R >>".encode()
+                )
+            )
+        objects[catalog - 1] = f"<< /Type /Catalog /Pages {pages} 0 R >>".encode()
+        refs = " ".join(f"{kid} 0 R" for kid in kids)
+        objects[pages - 1] = f"<< /Type /Pages /Kids [{refs}] /Count {len(kids)} >>".encode()
+
+        output = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, content in enumerate(objects, 1):
+            offsets.append(len(output))
+            output += f"{number} 0 obj\n".encode() + content + b"\nendobj\n"
+        xref = len(output)
+        output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+        output += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+        output += f"trailer\n<< /Size {len(objects) + 1} /Root {catalog} 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+        return bytes(output)
+
+
+class _PdfPage:
+    """Draws a diagram into the content stream of a pdf page."""
+
+    def __init__(self, document: _PdfDocument, model: DiagramModel, layout: Layout):
+        self.document = document
+        self.model = model
+        self.exported = export_layout(model, layout)
+        self.margin = to_float(model.graph_attr.get("pad"), 0.0555) * 72
+        self.width = self.exported["width"] + 2 * self.margin
+        self.height = self.exported["height"] + 2 * self.margin
+        self.ops = []
+
+    def draw(self) -> str:
+        model, exported = self.model, self.exported
+        background = rgb(model.graph_attr.get("bgcolor", "white"))
+        if background:
+            self.ops.append(f"{_color(background)} rg 0 0 {num(self.width)} {num(self.height)} re f")
+        for cluster, cluster_model, attrs in draw.clusters(model, exported):
+            self.cluster(cluster, cluster_model, attrs)
+        for edge, attrs in draw.edges(model, exported):
+            self.edge(edge, attrs)
+        for node, attrs in draw.nodes(model, exported):
+            self.node(node, attrs)
+        label = model.graph_attr.get("label")
+        if label:
+            x, y = exported.get("label_pos", (exported["width"] / 2, exported["height"] - 10))
+            self.text(label, x, y, model.graph_attr)
+        return "\n".join(self.ops)
+
+    def point(self, x: float, y: float) -> str:
+        """Return the pdf coordinates of a point of the exported layout."""
+        return f"{num(x + self.margin)} {num(self.height - self.margin - y)}"
+
+    def cluster(self, exported: Dict, cluster, attrs: Dict) -> None:
+        x0, y0, x1, y1 = exported["bb"]
+        # The background colors aren't inherited, the nested clusters are drawn over their parents.
+        fill = rgb(cluster.attrs.get("bgcolor", "none"))
+        self.shape("box", x0, y0, x1 - x0, y1 - y0, attrs, fill, draw.line_style(attrs, "pencolor"))
+        if cluster.label or exported.get("icon"):
+            label = draw.cluster_label(exported, cluster, attrs)
+            if label.icon:
+                left, top, size = label.icon
+                self.icon(exported["icon"], left + size / 2, top, size)
+            if cluster.label:
+                self.text(cluster.label, label.x, label.y, attrs, align=label.align)
+
+    def node(self, exported: Dict, attrs: Dict) -> None:
+        x, y = exported["pos"]
+        width, height = exported["width"], exported["height"]
+        left, top = x - width / 2, y - height / 2
+        shape = draw.shape(attrs)
+        if shape != "none":
+            fill = draw.fill_color(attrs)
+            self.shape(shape, left, top, width, height, attrs, fill and rgb(fill), draw.line_style(attrs, "color"))
+        if exported.get("icon") and attrs.get("image"):
+            self.icon(exported["icon"], x, top, min(width, height))
+        label = exported["label"]
+        if label:
+            if attrs.get("labelloc") == "b":
+                lines = len(label.split("\n"))
+                y = top + height - font_size(attrs) * LINE_HEIGHT * (lines - 0.5)
+                self.text(label, x, y, attrs, first_line=True)
+            else:
+                self.text(label, x, y, attrs)
+
+    def edge(self, exported: Dict, attrs: Dict) -> None:
+        points = exported["points"]
+        style = draw.line_style(attrs, "color")
+        color = style.color and rgb(style.color)
+        if not points or color is None:
+            return
+        ops = [f"{_color(color)} RG {_color(color)} rg", _line_style(style), f"{self.point(*points[0])} m"]
+        for i in range(1, len(points) - 2, 3):
+            ops.append(" ".join(self.point(*p) for p in points[i : i + 3]) + " c")
+        ops.append("S [] 0 d")
+        for end, base in (("end", points[-1]), ("start", points[0])):
+            if end in exported:
+                tip = exported[end]
+                nx, ny = (base[1] - tip[1]) * 0.35, (tip[0] - base[0]) * 0.35
+                corners = [(base[0] + nx, base[1] + ny), tip, (base[0] - nx, base[1] - ny)]
+                ops.append(f"{self.point(*corners[0])} m {self.point(*corners[1])} l {self.point(*corners[2])} l b")
+        self.ops.append(f"q {' '.join(ops)} Q")
+        if exported["label"] and "label_pos" in exported:
+            self.text(exported["label"], *exported["label_pos"], attrs)
+
+    def shape(self, shape: str, left: float, top: float, width: float, height: float, attrs, fill, line) -> None:
+        stroke = line.color and rgb(line.color)
+        if fill is None and stroke is None:
+            return
+        ops = [_line_style(line)]
+        if fill:
+            ops.append(f"{_color(fill)} rg")
+        if stroke:
+            ops.append(f"{_color(stroke)} RG")
+        x, y = left + self.margin, self.height - self.margin - top - height
+        if shape == "box":
+            radius = 8 if "rounded" in attrs.get("style", "") else 0
+            ops.append(_rounded_rect(x, y, width, height, radius))
+        else:
+            ops.append(_ellipse(x + width / 2, y + height / 2, width / 2, height / 2))
+        ops.append("B" if fill and stroke else "f" if fill else "S")
+        self.ops.append(f"q {' '.join(ops)} Q")
+
+    def icon(self, icon: str, x: float, top: float, size: float) -> None:
+        registered = self.document.image(draw.icon_path(self.model, icon))
+        if registered is None:
+            return
+        name, image = registered
+        # Fit the icon into the square keeping its aspect ratio.
+        scale = size / max(image.width, image.height)
+        width, height = image.width * scale, image.height * scale
+        left = x - width / 2 + self.margin
+        bottom = self.height - self.margin - top - (size + height) / 2
+        self.ops.append(f"q {num(width)} 0 0 {num(height)} {num(left)} {num(bottom)} cm /{name} Do Q")
+
+    def text(self, label: str, x: float, y: float, attrs: Dict, align: str = "middle", first_line: bool = False):
+        """Draw the label centered at the given position, or starting there if first_line."""
+        font = draw.font(attrs)
+        color = rgb(font.color) or (0, 0, 0)
+        size = font.size
+        line_height = size * LINE_HEIGHT
+        lines = label.split("\n")
+        if not first_line:
+            y -= line_height * (len(lines) - 1) / 2
+        ops = [f"BT /F1 {num(size)} Tf {_color(color)} rg"]
+        for i, line in enumerate(lines):
+            width = text_width(line, size)
+            left = {"start": x, "end": x - width}.get(align, x - width / 2)
+            # The baseline is about a third of the font size below the center of the line.
+            baseline = y + i * line_height + size * 0.35
+            ops.append(f"1 0 0 1 {self.point(left, baseline)} Tm ({_escape(line)}) Tj")
+        ops.append("ET")
+        self.ops.append(" ".join(ops))
+
+
+def _unfilter(data: bytes, width: int, height: int, bpp: int) -> bytearray:
+    """Reverse the png row filters and return the pixel bytes."""
+    stride = width * bpp
+    pixels = bytearray(stride * height)
+    previous = bytearray(stride)
+    offset = 0
+    for row in range(height):
+        kind = data[offset]
+        line = bytearray(data[offset + 1 : offset + 1 + stride])
+        offset += 1 + stride
+        if kind == 1:
+            for i in range(bpp, stride):
+                line[i] = (line[i] + line[i - bpp]) & 0xFF
+        elif kind == 2:
+            line = bytearray((a + b) & 0xFF for a, b in zip(line, previous))
+        elif kind == 3:
+            for i in range(stride):
+                left = line[i - bpp] if i >= bpp else 0
+                line[i] = (line[i] + ((left + previous[i]) >> 1)) & 0xFF
+        elif kind == 4:
+            for i in range(stride):
+                a = line[i - bpp] if i >= bpp else 0
+                b = previous[i]
+                c = previous[i - bpp] if i >= bpp else 0
+                p = a + b - c
+                pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+                predictor = a if pa <= pb and pa <= pc else b if pb <= pc else c
+                line[i] = (line[i] + predictor) & 0xFF
+        elif kind != 0:
+            raise ValueError(f"{kind} is not a valid png filter type")
+        pixels[row * stride : (row + 1) * stride] = line
+        previous = line
+    return pixels
+
+
+def _line_style(style: draw.LineStyle) -> str:
+    return f"{num(style.width)} w [{' '.join(map(str, style.dash))}] 0 d"
+
+
+def _stream(dictionary: str, data: bytes) -> bytes:
+    return f"<< {dictionary} /Length {len(data)} >>\nstream\n".encode() + data + b"\nendstream"
+
+
+def _rounded_rect(x: float, y: float, width: float, height: float, radius: float) -> str:
+    if not radius:
+        return f"{num(x)} {num(y)} {num(width)} {num(height)} re"
+    r = min(radius, width / 2, height / 2)
+    k = r * (1 - _KAPPA)
+    x1, y1 = x + width, y + height
+    return " ".join(
+        [
+            f"{num(x + r)} {num(y)} m {num(x1 - r)} {num(y)} l",
+            f"{num(x1 - k)} {num(y)} {num(x1)} {num(y + k)} {num(x1)} {num(y + r)} c",
+            f"{num(x1)} {num(y1 - r)} l",
+            f"{num(x1)} {num(y1 - k)} {num(x1 - k)} {num(y1)} {num(x1 - r)} {num(y1)} c",
+            f"{num(x + r)} {num(y1)} l",
+            f"{num(x + k)} {num(y1)} {num(x)} {num(y1 - k)} {num(x)} {num(y1 - r)} c",
+            f"{num(x)} {num(y + r)} l",
+            f"{num(x)} {num(y + k)} {num(x + k)} {num(y)} {num(x + r)} {num(y)} c h",
+        ]
+    )
+
+
+def _ellipse(cx: float, cy: float, rx: float, ry: float) -> str:
+    kx, ky = rx * _KAPPA, ry * _KAPPA
+    return " ".join(
+        [
+            f"{num(cx + rx)} {num(cy)} m",
+            f"{num(cx + rx)} {num(cy + ky)} {num(cx + kx)} {num(cy + ry)} {num(cx)} {num(cy + ry)} c",
+            f"{num(cx - kx)} {num(cy + ry)} {num(cx - rx)} {num(cy + ky)} {num(cx - rx)} {num(cy)} c",
+            f"{num(cx - rx)} {num(cy - ky)} {num(cx - kx)} {num(cy - ry)} {num(cx)} {num(cy - ry)} c",
+            f"{num(cx + kx)} {num(cy - ry)} {num(cx + rx)} {num(cy - ky)} {num(cx + rx)} {num(cy)} c h",
+        ]
+    )
+
+
+def _color(components: Tuple[float, float, float]) -> str:
+    return " ".join(num(c) for c in components)
+
+
+def _escape(text: str) -> str:
+    text = text.encode("cp1252", errors="replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
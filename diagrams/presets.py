@@ -0,0 +1,138 @@
+"""
+Presets provides the layout settings trading the layout quality for the
+layout time of big diagrams.
+
+The orthogonal edges and the crossing minimization are the expensive
+passes of the dot layout, so the presets change the spline style and bound
+the iterations of the layout passes:
+
+- quality: the orthogonal edges and the full crossing minimization.
+- balanced: the curved edges and halved crossing minimization effort.
+- fast: the straight edges and the minimal layout passes.
+
+The "auto" preset picks one of them from the size of the diagram, and the
+preview drops the icons and draws the fast layout at a low resolution for
+a quick look at the structure while authoring.
+
+The auto thresholds are set from the layout times measured by
+`python -m scripts.benchmark presets` with graphviz 14.1 on one cpu, on
+random inventories of icon nodes with a third more edges than nodes:
+
+- quality: 0.2s at 100 nodes, 0.5s at 160 nodes, 1.3s at 200 nodes, 5s at
+  400 nodes and 26s at 800 nodes.
+- balanced: 0.2s at 200 nodes, 1s at 800 nodes and 3-6s at 1600 nodes.
+- fast: 0.5s at 800 nodes and 1.8s at 1600 nodes.
+"""
+
+import os
+from typing import Dict
+
+from .model import DiagramModel
+
+PRESETS = {
+    "quality": {
+        "splines": "ortho",
+        "mclimit": "1.0",
+        "remincross": "true",
+    },
+    "balanced": {
+        "splines": "spline",
+        "mclimit": "0.5",
+        "nslimit": "2.0",
+        "nslimit1": "2.0",
+        "searchsize": "20",
+        "remincross": "false",
+    },
+    "fast": {
+        "splines": "line",
+        "mclimit": "0.1",
+        "nslimit": "0.5",
+        "nslimit1": "0.5",
+        "searchsize": "10",
+        "remincross": "false",
+    },
+}
+
+# The fast preset drawn at a low resolution.
+PREVIEW_ATTRS = {**PRESETS["fast"], "dpi": "48"}
+
+# The environment variable turning the preview of the diagrams on, e.g.
+# DIAGRAMS_PREVIEW=1, so the scripts can be previewed without editing them.
+PREVIEW_ENV = "DIAGRAMS_PREVIEW"
+
+# The sizes up to which the auto preset picks the quality and the balanced
+# presets, which keep their layouts within about 0.5s and 1s as measured.
+# A cluster weighs as several nodes, since the clusters constrain the
+# orthogonal edge routing: a cluster per ten nodes added as much quality
+# layout time as about five more nodes or edges per cluster did.
+AUTO_QUALITY_SIZE = 400
+AUTO_BALANCED_SIZE = 2000
+CLUSTER_WEIGHT = 5
+
+
+def auto_preset(nodes: int, edges: int, clusters: int = 0) -> str:
+    """Return the name of the preset fitting a diagram of the given counts.
+
+    :param nodes: The number of the nodes.
+    :param edges: The number of the edges.
+    :param clusters: The number of the clusters.
+    """
+    size = nodes + edges + clusters * CLUSTER_WEIGHT
+    if size <= AUTO_QUALITY_SIZE:
+        return "quality"
+    if size <= AUTO_BALANCED_SIZE:
+        return "balanced"
+    return "fast"
+
+
+def preset_attrs(preset: str, nodes: int = 0, edges: int = 0, clusters: int = 0) -> Dict[str, str]:
+    """Return the graph attributes of a preset.
+
+    :param preset: One of "quality", "balanced", "fast" or "auto".
+    :param nodes: The number of the nodes, for the auto preset.
+    :param edges: The number of the edges, for the auto preset.
+    :param clusters: The number of the clusters, for the auto preset.
+    """
+    if preset == "auto":
+        preset = auto_preset(nodes, edges, clusters)
+    if preset not in PRESETS:
+        raise ValueError(f'"{preset}" is not a valid preset')
+    return dict(PRESETS[preset])
+
+
+def apply_preset(model: DiagramModel, preset: str) -> DiagramModel:
+    """Return the model having the graph attributes of a preset.
+
+    The preset overrides the spline style and the layout limits of the model.
+    """
+    attrs = preset_attrs(preset, len(model.nodes), len(model.edges), len(model.clusters))
+    return model._replace(graph_attr={**model.graph_attr, **attrs})
+
+
+def preview(model: DiagramModel) -> DiagramModel:
+    """Return the model drawn quickly for a preview.
+
+    The icons are omitted, the edges are straight lines, the crossing
+    minimization takes the least effort and the raster outputs are drawn
+    at a low resolution.
+    """
+    # The icon nodes have no shape of their own, so they are boxed instead.
+    boxed = {"shape": "box", "style": "rounded"}
+    nodes = tuple(n._replace(attrs={**_without_icon(n.attrs), **boxed}) if n.icon else n for n in model.nodes)
+    # The clusters having an icon draw it in their html label.
+    clusters = tuple(c._replace(attrs={**c.attrs, "label": c.label}) if c.icon else c for c in model.clusters)
+    return model._replace(
+        graph_attr={**model.graph_attr, **PREVIEW_ATTRS},
+        node_attr=_without_icon(model.node_attr),
+        nodes=nodes,
+        clusters=clusters,
+    )
+
+
+def preview_enabled() -> bool:
+    """Return whether the preview is turned on by the environment."""
+    return os.environ.get(PREVIEW_ENV, "").lower() in ("1", "true", "yes")
+
+
+def _without_icon(attrs: Dict[str, str]) -> Dict[str, str]:
+    return {k: v for k, v in attrs.items() if k not in ("image", "imagescale")}
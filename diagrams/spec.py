@@ -0,0 +1,339 @@
+"""
+Spec provides a declarative format for diagrams.
+
+A spec is a plain dict, usually loaded from a JSON or YAML file, describing
+the nodes, clusters and edges of a diagram. It is compiled straight into the
+diagram model without running a diagram script, and only the node classes
+used by the spec are imported.
+
+    {
+        "name": "Web Service",
+        "direction": "TB",
+        "clusters": [
+            {"id": "web", "label": "Web Tier"},
+        ],
+        "nodes": [
+            {"id": "lb", "class": "aws.network.ELB", "label": "lb"},
+            {"id": "web1", "class": "aws.compute.EC2", "label": "web1", "cluster": "web"},
+        ],
+        "edges": [
+            {"tail": "lb", "head": "web1", "forward": true},
+        ],
+    }
+"""
+
+import functools
+import importlib
+import json
+import os
+from typing import Dict, Optional, Tuple, Union
+
+from .Cluster import Cluster
+from .Context import valid_direction
+from .Diagram import Diagram, valid_curvestyle
+from .Edge import Edge
+from .Node import Node
+from .model import ClusterModel, DiagramModel, EdgeModel, NodeModel, class_path
+
+
+@functools.lru_cache(maxsize=None)
+def resolve_class(path: str) -> type:
+    """Import and return a class by its path, e.g. "aws.compute.EC2".
+
+    The path is looked up in the diagrams package first, and then as an
+    absolute path for the classes defined outside of it.
+    """
+    module, _, name = path.rpartition(".")
+    for candidate in (f"diagrams.{module}" if module else "diagrams", module):
+        if not candidate:
+            continue
+        try:
+            return getattr(importlib.import_module(candidate), name)
+        except (ImportError, AttributeError):
+            continue
+    raise ValueError(f'"{path}" is not a valid class path')
+
+
+def build(spec: Dict) -> DiagramModel:
+    """Compile a diagram spec into a diagram model.
+
+    :param spec: Diagram spec. "name", "filename", "direction", "curvestyle",
+        "outformat", "graph_attr", "node_attr" and "edge_attr" are passed to the
+        Diagram. "nodes", "clusters" and "edges" list the diagram elements.
+    :return: The compiled diagram model.
+    """
+    diagram = Diagram(
+        name=spec.get("name", ""),
+        filename=spec.get("filename", ""),
+        direction=spec.get("direction", "LR"),
+        curvestyle=spec.get("curvestyle", "ortho"),
+        outformat=spec.get("outformat", "png"),
+        show=False,
+        graph_attr=spec.get("graph_attr", {}),
+        node_attr=spec.get("node_attr", {}),
+        edge_attr=spec.get("edge_attr", {}),
+    )
+    _validate_ids(spec)
+    compiler = _Compiler(diagram, spec.get("clusters", ()))
+    for cluster in spec.get("clusters", ()):
+        compiler.cluster(cluster["id"])
+    nodes = tuple(compiler.node(node) for node in spec.get("nodes", ()))
+    node_ids = {node.id for node in nodes}
+    edges = tuple(compiler.edge(edge, nodes, node_ids) for edge in spec.get("edges", ()))
+    return diagram.snapshot()._replace(nodes=nodes, clusters=tuple(compiler.clusters.values()), edges=edges)
+
+
+def export(diagram: Union[Diagram, DiagramModel]) -> Dict:
+    """Export a diagram or a diagram model into a diagram spec.
+
+    Only the attributes which can't be derived from the node classes and the
+    diagram options are exported.
+    """
+    model = diagram.snapshot() if isinstance(diagram, Diagram) else diagram
+    spec = {"name": model.name, "filename": model.filename, "outformat": model.outformat}
+    for key, attr, validate in (("direction", "rankdir", valid_direction), ("curvestyle", "splines", valid_curvestyle)):
+        value = model.graph_attr.get(attr)
+        if value and validate(value):
+            spec[key] = value
+    reference = build(spec)
+    for key in ("graph_attr", "node_attr", "edge_attr"):
+        attrs = _diff(getattr(model, key), getattr(reference, key))
+        if attrs:
+            spec[key] = attrs
+
+    diagram = Diagram(**spec, show=False)
+    compiler = _Compiler(diagram, ())
+    spec["clusters"] = []
+    for cluster in model.clusters:
+        item = {"id": _cluster_key(cluster.id), "label": cluster.label}
+        if cluster.cls != "Cluster":
+            item["class"] = cluster.cls
+        if cluster.parent:
+            item["parent"] = _cluster_key(cluster.parent)
+        inherited = compiler.effective[item.get("parent")]
+        direction = cluster.attrs.get("rankdir", inherited.get("rankdir"))
+        if direction != getattr(resolve_class(cluster.cls), "_direction", inherited.get("rankdir")):
+            item["direction"] = direction
+        compiler.specs[item["id"]] = item
+        # The exported attributes must be compared with the ones derived
+        # from the same parent, so the clusters are compiled one by one.
+        derived = compiler.cluster(item["id"])
+        attrs = _diff(cluster.attrs, derived.attrs)
+        if attrs:
+            item["attrs"] = attrs
+        compiler.clusters[item["id"]] = cluster
+        compiler.effective[item["id"]] = {**inherited, **cluster.attrs}
+        spec["clusters"].append(item)
+
+    spec["nodes"] = []
+    for node in model.nodes:
+        item = {"id": node.id, "class": node.cls, "label": node.label}
+        cls = resolve_class(node.cls)
+        if node.icon != cls._icon_ref():
+            item["icon"] = node.icon
+        if node.cluster:
+            item["cluster"] = _cluster_key(node.cluster)
+        attrs = _diff(node.attrs, compiler.node(item).attrs)
+        if attrs:
+            item["attrs"] = attrs
+        if node.tags:
+            item["tags"] = list(node.tags)
+        if node.metadata is not None:
+            item["metadata"] = node.metadata
+        spec["nodes"].append(item)
+
+    spec["edges"] = []
+    for edge in model.edges:
+        item = {"tail": edge.tail, "head": edge.head}
+        attrs = dict(edge.attrs)
+        direction = attrs.pop("dir", "none")
+        if direction in ("forward", "both"):
+            item["forward"] = True
+        if direction in ("back", "both"):
+            item["reverse"] = True
+        if attrs:
+            item["attrs"] = attrs
+        spec["edges"].append(item)
+    return spec
+
+
+def load(path: str) -> DiagramModel:
+    """Load a diagram spec from a JSON or YAML file and compile it."""
+    with open(path) as f:
+        if _is_yaml(path):
+            spec = _yaml().safe_load(f)
+        else:
+            spec = json.load(f)
+    return build(spec)
+
+
+def dump(diagram: Union[Diagram, DiagramModel], path: str) -> None:
+    """Export a diagram or a diagram model into a JSON or YAML spec file."""
+    spec = export(diagram)
+    with open(path, "w") as f:
+        if _is_yaml(path):
+            _yaml().safe_dump(spec, f, sort_keys=False)
+        else:
+            json.dump(spec, f, indent=2)
+
+
+class _Compiler:
+    """Compiles the spec elements with the defaults of the given diagram."""
+
+    def __init__(self, diagram: Diagram, clusters):
+        self.diagram = diagram
+        self.specs = {cluster["id"]: cluster for cluster in clusters}
+        self.clusters = {}
+        self.effective = {None: diagram._effective_graph_attrs()}
+        self.depths = {None: 0}
+
+    def cluster(self, key: str) -> ClusterModel:
+        if key in self.clusters:
+            return self.clusters[key]
+        try:
+            spec = self.specs[key]
+        except KeyError:
+            raise ValueError(f'"{key}" is not a valid cluster')
+        parent = spec.get("parent")
+        if parent is not None:
+            self.cluster(parent)
+
+        cluster, attrs = self.compile_cluster(key, spec)
+        self.depths[key] = self.depths[parent] + 1
+        self.effective[key] = {**self.effective[parent], **attrs}
+        self.clusters[key] = cluster
+        return cluster
+
+    def compile_cluster(self, key: str, spec: Dict) -> Tuple[ClusterModel, Dict]:
+        """Compile a cluster whose parent is compiled already.
+
+        :return: The compiled cluster and its attributes before dropping the inherited ones.
+        """
+        parent = spec.get("parent")
+        cls = resolve_class(spec.get("class", "Cluster"))
+        if not issubclass(cls, Cluster):
+            raise ValueError(f'"{spec.get("class")}" is not a valid cluster class')
+        label = spec.get("label", "cluster")
+        direction = spec.get("direction")
+        icon = None
+        attrs = {**Cluster._default_graph_attrs, **self.diagram.theme.cluster_attr, "label": label}
+        if issubclass(cls, Node):
+            direction = spec.get("direction") or cls._direction
+            icon = cls._icon_ref()
+            if icon:
+                attrs["label"] = cls._icon_label(label, icon, spec.get("icon_size") or cls._icon_size)
+        if direction is not None:
+            if not self.diagram._validate_direction(direction):
+                raise ValueError(f'"{direction}" is not a valid direction')
+            attrs["rankdir"] = direction
+
+        # Set cluster depth for distinguishing the background color
+        depth = self.depths[parent] + 1
+        bgcolors = self.diagram.bgcolors
+        attrs["bgcolor"] = bgcolors[depth % len(bgcolors)]
+        attrs.update(spec.get("attrs", {}))
+
+        inherited = self.effective[parent]
+        cluster = ClusterModel(
+            id=_cluster_id(key),
+            label=label,
+            cls=class_path(cls),
+            icon=icon,
+            attrs={k: v for k, v in attrs.items() if inherited.get(k) != v},
+            parent=_cluster_id(parent),
+        )
+        return cluster, attrs
+
+    def node(self, spec: Dict) -> NodeModel:
+        cls = resolve_class(spec.get("class", "Node"))
+        if not issubclass(cls, Node):
+            raise ValueError(f'"{spec.get("class")}" is not a valid node class')
+        label = spec.get("label", "")
+        # Custom icons aren't looked up in the diagram "imagepath".
+        icon = os.path.abspath(spec["icon"]) if spec.get("icon") else cls._icon_ref()
+        attrs = cls._icon_attrs(label, icon)
+        attrs.update(spec.get("attrs", {}))
+        cluster = spec.get("cluster")
+        if cluster is not None:
+            self.cluster(cluster)
+        return NodeModel(
+            id=spec["id"],
+            label=label,
+            cls=class_path(cls),
+            icon=icon,
+            attrs=self.diagram.node_overrides(attrs),
+            cluster=_cluster_id(cluster),
+            tags=tuple(spec.get("tags", ())),
+            metadata=spec.get("metadata"),
+        )
+
+    def edge(self, spec: Dict, nodes, node_ids) -> EdgeModel:
+        attrs = dict(spec.get("attrs", {}))
+        for key in ("label", "color", "style"):
+            if key in spec:
+                attrs[key] = spec[key]
+        edge = Edge(forward=spec.get("forward", False), reverse=spec.get("reverse", False), **attrs)
+        tail, head = spec["tail"], spec["head"]
+        for end in (tail, head):
+            if end not in node_ids and end not in self.specs:
+                raise ValueError(f'"{end}" is not a valid node or cluster')
+        # An edge connected to a cluster is drawn from/to one of its nodes,
+        # and clipped at the cluster boundary.
+        if tail in self.specs:
+            edge._attrs["ltail"] = _cluster_id(tail)
+            tail = self._cluster_node(tail, nodes)
+        if head in self.specs:
+            edge._attrs["lhead"] = _cluster_id(head)
+            head = self._cluster_node(head, nodes)
+        return EdgeModel(tail, head, self.diagram.edge_overrides(edge.attrs))
+
+    def _cluster_node(self, key: str, nodes) -> str:
+        clusters = {_cluster_id(key)}
+        for cluster in self.clusters.values():
+            if cluster.parent in clusters:
+                clusters.add(cluster.id)
+        for node in nodes:
+            if node.cluster in clusters:
+                return node.id
+        raise ValueError(f'"{key}" cluster does not have any node')
+
+
+def _validate_ids(spec: Dict) -> None:
+    """Raise ValueError on the duplicate ids, which would silently replace the elements."""
+    clusters = set()
+    for cluster in spec.get("clusters", ()):
+        if cluster["id"] in clusters:
+            raise ValueError(f'"{cluster["id"]}" is a duplicate cluster id')
+        clusters.add(cluster["id"])
+    nodes = set()
+    for node in spec.get("nodes", ()):
+        if node["id"] in nodes:
+            raise ValueError(f'"{node["id"]}" is a duplicate node id')
+        # The edges refer to the nodes and the clusters by the same ids.
+        if node["id"] in clusters:
+            raise ValueError(f'"{node["id"]}" is both a node and a cluster id')
+        nodes.add(node["id"])
+
+
+def _cluster_id(key: Optional[str]) -> Optional[str]:
+    return f"cluster_{key}" if key is not None else None
+
+
+def _cluster_key(cluster_id: str) -> str:
+    return cluster_id[len("cluster_") :]
+
+
+def _diff(attrs: Dict, reference: Dict) -> Dict:
+    return {k: v for k, v in attrs.items() if reference.get(k) != v}
+
+
+def _is_yaml(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in (".yaml", ".yml")
+
+
+def _yaml():
+    try:
+        import yaml
+    except ImportError:
+        raise ImportError("PyYAML is required for the YAML diagram specs: pip install pyyaml")
+    return yaml
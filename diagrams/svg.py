@@ -0,0 +1,390 @@
+"""
+Svg provides the self-contained svg output, embedding the icons instead of
+referring to them by their file paths, and an svg writer drawing diagrams
+from their layouts without graphviz.
+
+Every distinct icon is embedded once as a symbol, which the nodes reuse, so
+the size of the output grows with the number of distinct icons rather than
+the number of nodes. The encoded icons are cached for the whole process.
+"""
+
+import base64
+import functools
+import os
+import re
+import struct
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from . import draw
+from .draw import LINE_HEIGHT, font_size, num, to_float
+from .layout import Layout, compute_layout, export_layout
+from .model import DiagramModel
+from .utils import resource_dir
+
+_MIME_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".svg": "image/svg+xml",
+}
+
+_SVG_TAG = re.compile(r"<svg\b[^>]*>")
+_IMAGE_TAG = re.compile(r"<image\b([^>]*?)/?>(?:</image>)?")
+_ATTR = re.compile(r'([\w:-]+)="([^"]*)"')
+
+
+class Icon(NamedTuple):
+    """Icon represents an icon file encoded as a data uri."""
+
+    data_uri: str
+    width: Optional[int]
+    height: Optional[int]
+
+
+@functools.lru_cache(maxsize=None)
+def encode_icon(path: str) -> Icon:
+    """Encode the icon file as a data uri, along with its size in pixels if known.
+
+    The icons are encoded once for the whole process.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    mime = _MIME_TYPES.get(os.path.splitext(path)[1].lower(), "application/octet-stream")
+    width, height = _image_size(data)
+    return Icon(f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}", width, height)
+
+
+def embed_icons(svg: str, imagepath: str = None) -> str:
+    """Embed the icons referred by the svg images into the svg itself.
+
+    :param svg: Svg output of a diagram.
+    :param imagepath: Directory the relative icon references are resolved
+        from. Default is the resources directory.
+    :return: The self-contained svg.
+    """
+    imagepath = imagepath or resource_dir()
+    symbols = {}
+    defs = []
+
+    def replace(match) -> str:
+        attrs = dict(_ATTR.findall(match.group(1)))
+        href = attrs.pop("xlink:href", None) or attrs.pop("href", None)
+        if href is None or href.startswith("data:"):
+            return match.group(0)
+        path = os.path.normpath(href if os.path.isabs(href) else os.path.join(imagepath, href))
+        try:
+            icon = encode_icon(path)
+        except OSError:
+            return match.group(0)
+        if icon.width is None:
+            # The symbols need the icon size, so the icon is inlined as is.
+            return _tag("image", {"xlink:href": icon.data_uri, **attrs})
+
+        aspect = attrs.pop("preserveAspectRatio", "xMidYMid meet")
+        key = (path, aspect)
+        if key not in symbols:
+            symbols[key] = f"icon{len(symbols)}"
+            image = _tag("image", {"width": icon.width, "height": icon.height, "xlink:href": icon.data_uri})
+            symbol_attrs = {
+                "id": symbols[key],
+                "viewBox": f"0 0 {icon.width} {icon.height}",
+                "preserveAspectRatio": aspect,
+            }
+            defs.append(f"{_tag('symbol', symbol_attrs, close=False)}{image}</symbol>")
+        return _tag("use", {"xlink:href": f"#{symbols[key]}", **attrs})
+
+    svg = _IMAGE_TAG.sub(replace, svg)
+    if not defs:
+        return svg
+    opening = _SVG_TAG.search(svg)
+    if opening is None:
+        return svg
+    return f"{svg[:opening.end()]}\n<defs>\n" + "\n".join(defs) + f"\n</defs>{svg[opening.end():]}"
+
+
+def embed_icons_file(path: str, imagepath: str = None) -> None:
+    """Embed the icons into the svg file in place."""
+    with open(path, encoding="utf-8") as f:
+        svg = f.read()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(embed_icons(svg, imagepath))
+
+
+def absolute_icons(svg: str, imagepath: str = None) -> str:
+    """Refer to the icons of the svg images by their absolute paths.
+
+    Graphviz writes the icon references as given, relative to the diagram
+    "imagepath", and they don't resolve once the svg is opened from another
+    directory.
+
+    :param svg: Svg output of a diagram.
+    :param imagepath: Directory the relative icon references are resolved
+        from. Default is the resources directory.
+    """
+    imagepath = imagepath or resource_dir()
+
+    def replace(match) -> str:
+        tag = match.group(0)
+        for name, href in _ATTR.findall(match.group(1)):
+            if name not in ("xlink:href", "href") or href.startswith(("data:", "#")) or os.path.isabs(href):
+                continue
+            path = os.path.normpath(os.path.join(imagepath, href))
+            if os.path.exists(path):
+                tag = tag.replace(f'{name}="{href}"', f'{name}="{escape(path)}"')
+        return tag
+
+    return _IMAGE_TAG.sub(replace, svg)
+
+
+def absolute_icons_file(path: str, imagepath: str = None) -> None:
+    """Refer to the icons of the svg file by their absolute paths in place."""
+    with open(path, encoding="utf-8") as f:
+        svg = f.read()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(absolute_icons(svg, imagepath))
+
+
+def write_svg(model: DiagramModel, layout: Layout = None, embed_icons: bool = True) -> str:
+    """Draw the diagram model as svg from its layout, without running graphviz to draw it.
+
+    The clusters, the nodes with their icons and labels, and the edges with
+    their arrows and labels are drawn from the layout positions and the
+    element attributes. It is plain python, so the drawings can be made in
+    parallel and cached apart from the layouts.
+
+    :param model: Diagram model to draw.
+    :param layout: Layout of the model, e.g. from a `LayoutCache`. Default is computed by dot.
+    :param embed_icons: Embed the icons, each distinct icon once. Otherwise they are referred by their file paths.
+    :return: The svg document.
+    """
+    layout = layout or compute_layout(model)
+    exported = export_layout(model, layout)
+    writer = _SvgWriter(model, embed_icons)
+    margin = to_float(model.graph_attr.get("pad"), 0.0555) * 72
+    width, height = exported["width"] + 2 * margin, exported["height"] + 2 * margin
+    writer.body.append(f'<g transform="translate({margin:.2f},{margin:.2f})">')
+
+    for cluster, cluster_model, attrs in draw.clusters(model, exported):
+        writer.cluster(cluster, cluster_model, attrs)
+    for edge, attrs in draw.edges(model, exported):
+        writer.edge(edge, attrs)
+    for node, attrs in draw.nodes(model, exported):
+        writer.node(node, attrs)
+    label = model.graph_attr.get("label")
+    if label:
+        # The diagram label is drawn at the bottom center by default.
+        x, y = exported.get("label_pos", (exported["width"] / 2, exported["height"] - 10))
+        writer.text(label, x, y, model.graph_attr, anchor="middle")
+    writer.body.append("</g>")
+
+    background = model.graph_attr.get("bgcolor", "white")
+    return "\n".join(
+        [
+            '<?xml version="1.0" encoding="UTF-8" standalone="no"?>',
+            f'<svg width="{width:.0f}pt" height="{height:.0f}pt" viewBox="0 0 {width:.2f} {height:.2f}"',
+            ' xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">',
+            "<defs>",
+            *writer.defs,
+            "</defs>",
+            f'<rect width="100%" height="100%" fill="{_color(background)}"/>',
+            *writer.body,
+            "</svg>",
+            "",
+        ]
+    )
+
+
+class _SvgWriter:
+    """Accumulates the svg elements of a diagram."""
+
+    def __init__(self, model: DiagramModel, embed_icons: bool):
+        self.model = model
+        self.embed_icons = embed_icons
+        self.defs = []
+        self.body = []
+        self._symbols = {}
+
+    def cluster(self, exported: Dict, cluster, attrs: Dict) -> None:
+        # The background colors aren't inherited, the nested clusters are drawn over their parents.
+        fill = cluster.attrs.get("bgcolor", "none")
+        x0, y0, x1, y1 = exported["bb"]
+        self.body.append(
+            _tag(
+                "rect",
+                {
+                    "x": num(x0),
+                    "y": num(y0),
+                    "width": num(x1 - x0),
+                    "height": num(y1 - y0),
+                    **({"rx": "8", "ry": "8"} if "rounded" in attrs.get("style", "") else {}),
+                    "fill": _color(fill),
+                    **self._stroke(attrs, "pencolor"),
+                },
+            )
+        )
+        if cluster.label or exported.get("icon"):
+            label = draw.cluster_label(exported, cluster, attrs)
+            if label.icon:
+                self.icon(exported["icon"], *label.icon)
+            if cluster.label:
+                self.text(cluster.label, label.x, label.y, attrs, anchor=label.align)
+
+    def node(self, exported: Dict, attrs: Dict) -> None:
+        x, y = exported["pos"]
+        width, height = exported["width"], exported["height"]
+        left, top = x - width / 2, y - height / 2
+        shape = draw.shape(attrs)
+        if shape == "box":
+            self.body.append(
+                _tag(
+                    "rect",
+                    {
+                        "x": num(left),
+                        "y": num(top),
+                        "width": num(width),
+                        "height": num(height),
+                        **({"rx": "8", "ry": "8"} if "rounded" in attrs.get("style", "") else {}),
+                        "fill": self._fill(attrs),
+                        **self._stroke(attrs, "color"),
+                    },
+                )
+            )
+        elif shape == "ellipse":
+            self.body.append(
+                _tag(
+                    "ellipse",
+                    {
+                        "cx": num(x),
+                        "cy": num(y),
+                        "rx": num(width / 2),
+                        "ry": num(height / 2),
+                        "fill": self._fill(attrs),
+                        **self._stroke(attrs, "color"),
+                    },
+                )
+            )
+        if exported.get("icon") and attrs.get("image"):
+            # The icon takes the top square of the node, above its label.
+            size = min(width, height)
+            self.icon(exported["icon"], x - size / 2, top, size)
+        label = exported["label"]
+        if label:
+            lines = label.split("\n")
+            if attrs.get("labelloc") == "b":
+                line_height = font_size(attrs) * LINE_HEIGHT
+                y = top + height - line_height * (len(lines) - 0.5)
+                self.text(label, x, y, attrs, anchor="middle", first_line=True)
+            else:
+                self.text(label, x, y, attrs, anchor="middle")
+
+    def edge(self, exported: Dict, attrs: Dict) -> None:
+        points = exported["points"]
+        if not points:
+            return
+        color = _color(attrs.get("color", "black"))
+        path = f"M{num(points[0][0])},{num(points[0][1])}"
+        for i in range(1, len(points) - 2, 3):
+            controls = points[i : i + 3]
+            path += "C" + " ".join(f"{num(px)},{num(py)}" for px, py in controls)
+        self.body.append(_tag("path", {"d": path, "fill": "none", **self._stroke(attrs, "color")}))
+        for end, base in (("end", points[-1]), ("start", points[0])):
+            if end in exported:
+                arrow = {"points": _arrow(base, exported[end]), "fill": color, "stroke": color}
+                self.body.append(_tag("polygon", arrow))
+        if exported["label"] and "label_pos" in exported:
+            x, y = exported["label_pos"]
+            self.text(exported["label"], x, y, attrs, anchor="middle")
+
+    def icon(self, icon: str, x: float, y: float, size: float) -> None:
+        path = draw.icon_path(self.model, icon)
+        box = {"x": num(x), "y": num(y), "width": num(size), "height": num(size)}
+        if not self.embed_icons:
+            self.body.append(_tag("image", {"xlink:href": escape(path), **box}))
+            return
+        try:
+            encoded = encode_icon(path)
+        except OSError:
+            return
+        if encoded.width is None:
+            self.body.append(_tag("image", {"xlink:href": encoded.data_uri, **box}))
+            return
+        if path not in self._symbols:
+            self._symbols[path] = f"icon{len(self._symbols)}"
+            image = _tag("image", {"width": encoded.width, "height": encoded.height, "xlink:href": encoded.data_uri})
+            symbol_attrs = {"id": self._symbols[path], "viewBox": f"0 0 {encoded.width} {encoded.height}"}
+            self.defs.append(f"{_tag('symbol', symbol_attrs, close=False)}{image}</symbol>")
+        self.body.append(_tag("use", {"xlink:href": f"#{self._symbols[path]}", **box}))
+
+    def text(self, label: str, x: float, y: float, attrs: Dict, anchor: str = "middle", first_line: bool = False):
+        """Draw the label centered at the given position, or starting there if first_line."""
+        lines = label.split("\n")
+        font = draw.font(attrs)
+        line_height = font.size * LINE_HEIGHT
+        if not first_line:
+            y -= line_height * (len(lines) - 1) / 2
+        text_attrs = {
+            "text-anchor": anchor,
+            "dominant-baseline": "central",
+            "font-family": escape(font.family),
+            "font-size": num(font.size),
+            "fill": _color(font.color),
+        }
+        spans = "".join(
+            f'<tspan x="{num(x)}" y="{num(y + i * line_height)}">{escape(line)}</tspan>'
+            for i, line in enumerate(lines)
+        )
+        self.body.append(f"{_tag('text', text_attrs, close=False)}{spans}</text>")
+
+    @staticmethod
+    def _fill(attrs: Dict) -> str:
+        return _color(draw.fill_color(attrs) or "none")
+
+    @staticmethod
+    def _stroke(attrs: Dict, color: str) -> Dict:
+        style = draw.line_style(attrs, color)
+        if style.color is None:
+            return {"stroke": "none"}
+        stroke = {"stroke": _color(style.color), "stroke-width": num(style.width)}
+        if style.dash:
+            stroke["stroke-dasharray"] = ",".join(map(str, style.dash))
+        return stroke
+
+
+def _arrow(base: List[float], tip: List[float]) -> str:
+    """Return the points of the arrow polygon from its base center to its tip."""
+    # The half width of the normal arrow is about a third of its length.
+    nx, ny = (base[1] - tip[1]) * 0.35, (tip[0] - base[0]) * 0.35
+    corners = [(base[0] + nx, base[1] + ny), tuple(tip), (base[0] - nx, base[1] - ny)]
+    return " ".join(f"{num(px)},{num(py)}" for px, py in corners)
+
+
+def _color(color: str) -> str:
+    return escape(draw.first_color(color)) or "none"
+
+
+def _tag(name: str, attrs: Dict, close: bool = True) -> str:
+    rendered = " ".join(f'{k}="{v}"' for k, v in attrs.items())
+    return f"<{name} {rendered}{'/' if close else ''}>"
+
+
+def _image_size(data: bytes) -> Tuple[Optional[int], Optional[int]]:
+    """Return the size of a png, gif or jpeg image, or None if unknown."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        return struct.unpack("<HH", data[6:10])
+    if data[:2] == b"\xff\xd8":
+        offset = 2
+        while offset + 9 <= len(data):
+            if data[offset] != 0xFF:
+                break
+            marker = data[offset + 1]
+            length = struct.unpack(">H", data[offset + 2 : offset + 4])[0]
+            # The start of frame markers, but the huffman and arithmetic tables ones.
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack(">HH", data[offset + 5 : offset + 9])
+                return width, height
+            offset += 2 + length
+    return None, None
@@ -0,0 +1,163 @@
+"""
+Template provides reusable clusters which are defined once and instantiated
+many times into diagram models.
+
+A template is compiled once for each distinct place it is instantiated in
+(the diagram defaults and the parent cluster attributes), and every copy
+only remaps the element ids and copies the compiled attributes, so the
+copies can be changed apart from each other. So stamping out the same
+cluster hundreds of times takes near constant time per copy.
+"""
+
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from .Diagram import Diagram
+from .model import ClusterModel, DiagramModel, EdgeModel, NodeModel
+from .spec import _Compiler, _cluster_id
+
+# The local key of the template cluster itself.
+_ROOT = ""
+
+
+class TemplateInstance(NamedTuple):
+    """TemplateInstance represents the elements of an instantiated template."""
+
+    nodes: Tuple[NodeModel, ...]
+    clusters: Tuple[ClusterModel, ...]
+    edges: Tuple[EdgeModel, ...]
+
+
+class ClusterTemplate:
+    """ClusterTemplate represents a cluster defined once and instantiated many times."""
+
+    def __init__(self, spec: Dict):
+        """ClusterTemplate represents a reusable cluster.
+
+        :param spec: Template spec. "label", "class", "direction" and "attrs"
+            describe the template cluster itself, and "clusters", "nodes" and
+            "edges" list its content in the diagram spec format. The elements
+            without a parent cluster belong to the template cluster.
+        """
+        self.spec = spec
+        self._root = {k: spec[k] for k in ("label", "class", "direction", "attrs", "icon_size") if k in spec}
+        self._root["id"] = _ROOT
+        self._clusters = [{"parent": _ROOT, **cluster} for cluster in spec.get("clusters", ())]
+        self._nodes = [{"cluster": _ROOT, **node} for node in spec.get("nodes", ())]
+        self._edges = list(spec.get("edges", ()))
+        self._compiled = {}
+
+    def instantiate(
+        self,
+        model: DiagramModel,
+        key: str,
+        label: str = None,
+        labels: Dict[str, str] = {},
+        parent: str = None,
+    ) -> TemplateInstance:
+        """Instantiate the template for the given diagram model.
+
+        The element ids are prefixed with the instance key, e.g. the "web1"
+        node of the "us" instance gets the "us.web1" id and the instance
+        cluster gets the "cluster_us" id.
+
+        :param model: Diagram model the instance is added to.
+        :param key: Unique key of the instance.
+        :param label: Label of the instance cluster. Default is the template label.
+        :param labels: Label overrides of the nodes and nested clusters by their template ids.
+        :param parent: Id of the cluster the instance is placed in. Default is the diagram.
+        :return: The instance elements. Add them with `model.extend(instance)`.
+        """
+        compiler, nodes, clusters, edges = self._compile(model, parent)
+        if label is not None:
+            labels = {**labels, _ROOT: label}
+
+        def cluster_id(local: Optional[str]) -> Optional[str]:
+            if local is None:
+                return parent
+            local = local[len("cluster_") :]
+            return _cluster_id(f"{key}.{local}" if local else key)
+
+        def node_id(local: str) -> str:
+            return f"{key}.{local}"
+
+        instance_clusters = []
+        for spec, cluster in zip([self._root] + self._clusters, clusters):
+            if spec["id"] in labels:
+                cluster, _ = compiler.compile_cluster(spec["id"], {**spec, "label": labels[spec["id"]]})
+            # Each copy gets its own attributes, so changing one copy leaves the others alone.
+            instance_clusters.append(
+                cluster._replace(
+                    id=cluster_id(cluster.id), parent=cluster_id(cluster.parent), attrs=dict(cluster.attrs)
+                )
+            )
+
+        instance_nodes = []
+        for spec, node in zip(self._nodes, nodes):
+            if spec["id"] in labels:
+                node = compiler.node({**spec, "label": labels[spec["id"]]})
+            instance_nodes.append(
+                node._replace(id=node_id(node.id), cluster=cluster_id(node.cluster), attrs=dict(node.attrs))
+            )
+
+        instance_edges = []
+        for edge in edges:
+            attrs = dict(edge.attrs)
+            for k in ("ltail", "lhead"):
+                if k in attrs:
+                    attrs[k] = cluster_id(attrs[k])
+            instance_edges.append(EdgeModel(node_id(edge.tail), node_id(edge.head), attrs))
+
+        return TemplateInstance(tuple(instance_nodes), tuple(instance_clusters), tuple(instance_edges))
+
+    def _compile(self, model: DiagramModel, parent: Optional[str]):
+        """Compile the template for the place it is instantiated in, or reuse the compiled one."""
+        inherited = dict(model.graph_attr)
+        depth = 0
+        if parent is not None:
+            clusters = {cluster.id: cluster for cluster in model.clusters}
+            chain = []
+            cluster_id = parent
+            while cluster_id is not None:
+                try:
+                    cluster = clusters[cluster_id]
+                except KeyError:
+                    raise ValueError(f'"{cluster_id}" is not a valid cluster')
+                chain.append(cluster)
+                cluster_id = cluster.parent
+            for cluster in reversed(chain):
+                inherited.update(cluster.attrs)
+            depth = len(chain)
+
+        context = (
+            depth,
+            tuple(sorted(inherited.items())),
+            tuple(sorted(model.node_attr.items())),
+            tuple(sorted(model.edge_attr.items())),
+        )
+        if context not in self._compiled:
+            compiler = _Compiler(_context_diagram(model), [self._root] + self._clusters)
+            # The template is compiled as a top level cluster of a diagram
+            # having the attributes and the depth of the actual parent.
+            compiler.effective[None] = inherited
+            compiler.depths[None] = depth
+            clusters = tuple(compiler.cluster(spec["id"]) for spec in [self._root] + self._clusters)
+            nodes = tuple(compiler.node(spec) for spec in self._nodes)
+            node_ids = {node.id for node in nodes}
+            edges = tuple(compiler.edge(spec, nodes, node_ids) for spec in self._edges)
+            self._compiled[context] = (compiler, nodes, clusters, edges)
+        return self._compiled[context]
+
+
+def _context_diagram(model: DiagramModel) -> Diagram:
+    """Return a diagram having the same defaults as the given diagram model."""
+    diagram = Diagram(name=model.name, show=False)
+    diagram.dot.graph_attr.update(model.graph_attr)
+    # The plain nodes override the hoisted icon node attributes back to the base ones.
+    hoisted = diagram.theme.icon_node_attr
+    base = {k: v for k, v in diagram._base_node_attrs.items() if k in hoisted}
+    diagram._base_node_attrs = {**model.node_attr, **base}
+    diagram.dot.node_attr.clear()
+    diagram.dot.node_attr.update(model.node_attr)
+    diagram.dot.edge_attr.clear()
+    diagram.dot.edge_attr.update(model.edge_attr)
+    return diagram
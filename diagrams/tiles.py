@@ -0,0 +1,117 @@
+"""
+Tiles provides the deep zoom output of huge diagrams: a pyramid of fixed
+size raster tiles and a manifest describing it.
+
+The diagram is laid out once, and every tile is drawn from the layout by
+its own `neato -n2` run clipped to the tile (the `viewport` attribute), so
+no run ever holds more than one tile in memory, and the runs go in parallel.
+"""
+
+import concurrent.futures
+import json
+import math
+import os
+from typing import Dict, List
+
+from graphviz.backend import run
+
+from .layout import Layout, _box, compute_layout, positioned
+from .model import DiagramModel
+
+MANIFEST = "manifest.json"
+
+
+def tile_levels(width: float, height: float, tile_size: int = 256, max_zoom: float = 1.0) -> List[Dict]:
+    """Return the levels of the zoom pyramid of a drawing of the given size in points.
+
+    Each level halves the scale of the next one, from the level fitting into
+    one tile up to the full resolution.
+    """
+    full = max(width, height) * max_zoom
+    count = max(1, math.ceil(math.log2(max(full / tile_size, 1))) + 1)
+    levels = []
+    for level in range(count):
+        scale = max_zoom / 2 ** (count - 1 - level)
+        level_width, level_height = max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale))
+        levels.append(
+            {
+                "level": level,
+                "scale": scale,
+                "width": level_width,
+                "height": level_height,
+                "columns": math.ceil(level_width / tile_size),
+                "rows": math.ceil(level_height / tile_size),
+            }
+        )
+    return levels
+
+
+def render_tiles(
+    model: DiagramModel,
+    directory: str,
+    layout: Layout = None,
+    tile_size: int = 256,
+    max_zoom: float = 1.0,
+    outformat: str = "png",
+    max_workers: int = None,
+) -> str:
+    """Render the diagram model into a zoom pyramid of tiles.
+
+    The tiles are written to "<level>/<column>_<row>.<format>" in the
+    directory, the level 0 showing the whole diagram in one tile, and the
+    manifest is written to "manifest.json".
+
+    :param model: Diagram model to render.
+    :param directory: Output directory.
+    :param layout: Layout of the model, e.g. from a `LayoutCache`. Default is computed by dot.
+    :param tile_size: Width and height of the tiles in pixels.
+    :param max_zoom: Scale of the most detailed level, in pixels per point.
+    :param outformat: Raster format of the tiles.
+    :param max_workers: The number of the tiles rendered at once. Default is decided by the executor.
+    :return: The manifest file path.
+    """
+    layout = layout or compute_layout(model)
+    left, bottom, right, top = _box(layout.graph.get("bb", "0,0,0,0"))
+    width, height = right - left, top - bottom
+    levels = tile_levels(width, height, tile_size, max_zoom)
+
+    os.makedirs(directory, exist_ok=True)
+    source = positioned(model, layout).to_dot().save(os.path.join(directory, "tiles.gv"))
+    tiles = []
+    for level in levels:
+        os.makedirs(os.path.join(directory, str(level["level"])), exist_ok=True)
+        scale = level["scale"]
+        span = tile_size / scale
+        for column in range(level["columns"]):
+            for row in range(level["rows"]):
+                # The viewport is centered at the tile center in the graph
+                # coordinates, whose y axis points up.
+                x = left + (column + 0.5) * span
+                y = top - (row + 0.5) * span
+                path = os.path.join(directory, str(level["level"]), f"{column}_{row}.{outformat}")
+                tiles.append((path, f"{tile_size},{tile_size},{scale:g},{x:.2f},{y:.2f}"))
+
+    def render(tile):
+        path, viewport = tile
+        cmd = ["neato", "-n2", "-Gdpi=72", f"-Gviewport={viewport}", f"-T{outformat}", "-o", path, source]
+        run(cmd, capture_output=True, check=True)
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(render, tiles))
+    finally:
+        os.remove(source)
+
+    manifest = {
+        "name": model.name,
+        "width": levels[-1]["width"],
+        "height": levels[-1]["height"],
+        "tile_size": tile_size,
+        "format": outformat,
+        "tiles": "{level}/{column}_{row}." + outformat,
+        "levels": levels,
+    }
+    path = os.path.join(directory, MANIFEST)
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return path
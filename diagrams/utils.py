@@ -1,4 +1,5 @@
 import contextvars
+import os
 
 # Global contexts for a diagrams and a cluster.
 #
@@ -19,6 +20,14 @@ def setdiagram(diagram):
     __diagram.set(diagram)
 
 
+def _diagram():
+    # The context is reset to None when a diagram exits, which isn't a diagram either.
+    diagram = getdiagram()
+    if diagram is None:
+        raise EnvironmentError("Global diagrams context not set up")
+    return diagram
+
+
 def getcluster():
     try:
         return __cluster.get()
@@ -29,6 +38,11 @@ def getcluster():
 def setcluster(cluster):
     __cluster.set(cluster)
 
+def resource_dir() -> str:
+    """Return the absolute path of the bundled icon resources directory."""
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources")
+
+
 def new_init(cls, init):
     def reset_init(*args, **kwargs):
         cls.__init__ = init
@@ -0,0 +1,153 @@
+"""
+View provides the extraction of subgraphs (views) from a diagram model.
+
+A view is a diagram model keeping only the selected nodes, the edges between
+them and the clusters containing them. Views are extracted from one shared
+model through an index, so the big diagram is never rebuilt, and they can be
+rendered in parallel with `model.render_all`.
+"""
+
+import functools
+from collections import deque
+from typing import FrozenSet, Iterable, Optional, Tuple, Union
+
+from .model import DiagramModel, class_path
+from .spec import resolve_class
+
+Selector = Union[str, Iterable[str]]
+
+
+class ModelIndex:
+    """ModelIndex indexes the nodes of a diagram model for extracting views."""
+
+    def __init__(self, model: DiagramModel):
+        """ModelIndex indexes the nodes by their tags, providers, types,
+        classes and neighbours.
+
+        :param model: Diagram model to index.
+        """
+        self.model = model
+        self._keys = {}
+        self._neighbours = {node.id: set() for node in model.nodes}
+        for node in model.nodes:
+            keys = [("tags", tag) for tag in node.tags] + [("cls", node.cls)]
+            provider, typ = _kind(node.cls)
+            if provider:
+                keys += [("provider", provider), ("type", typ), ("type", f"{provider}.{typ}")]
+            for key in keys:
+                self._keys.setdefault(key, set()).add(node.id)
+        for edge in model.edges:
+            if edge.tail in self._neighbours and edge.head in self._neighbours:
+                self._neighbours[edge.tail].add(edge.head)
+                self._neighbours[edge.head].add(edge.tail)
+
+    def select(
+        self,
+        tags: Selector = None,
+        provider: Selector = None,
+        type: Selector = None,
+        cls: Selector = None,
+    ) -> FrozenSet[str]:
+        """Select the node ids matching all the given criteria.
+
+        Each criterion takes a value or a list of values, and a node matches
+        the criterion if it matches any of the values.
+
+        :param tags: Node tags.
+        :param provider: Node providers, e.g. "aws".
+        :param type: Node types with or without the provider, e.g. "aws.database" or "database".
+        :param cls: Node class paths or their aliases, e.g. "aws.compute.EC2".
+        :return: The selected node ids.
+        """
+        selected = None
+        for field, values in (("tags", tags), ("provider", provider), ("type", type), ("cls", cls)):
+            if values is None:
+                continue
+            if isinstance(values, str):
+                values = (values,)
+            if field == "cls":
+                # Aliases, e.g. "aws.network.ELB", select their actual classes.
+                values = [_class_path(value) for value in values]
+            matched = set()
+            for value in values:
+                matched |= self._keys.get((field, value), set())
+            selected = matched if selected is None else selected & matched
+        return frozenset(self._neighbours if selected is None else selected)
+
+    def neighbourhood(self, ids: Iterable[str], hops: int = 1) -> FrozenSet[str]:
+        """Return the node ids within the given number of hops from the given nodes.
+
+        The edges are followed regardless of their direction.
+        """
+        seen = {node_id for node_id in ids if node_id in self._neighbours}
+        queue = deque((node_id, 0) for node_id in seen)
+        while queue:
+            node_id, distance = queue.popleft()
+            if distance == hops:
+                continue
+            for neighbour in self._neighbours[node_id]:
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    queue.append((neighbour, distance + 1))
+        return frozenset(seen)
+
+    def view(self, ids: Iterable[str], name: str = None, filename: str = None) -> DiagramModel:
+        """Extract the view of the given nodes.
+
+        :param ids: Node ids to keep.
+        :param name: Name of the view. Default is the name of the model.
+        :param filename: Filename of the view. If not given, it will be generated from the name.
+        :return: The view as a diagram model.
+        """
+        ids = set(ids)
+        model = self.model
+        nodes = tuple(node for node in model.nodes if node.id in ids)
+
+        parents = {cluster.id: cluster.parent for cluster in model.clusters}
+        cluster_ids = set()
+        for node in nodes:
+            cluster_id = node.cluster
+            while cluster_id is not None and cluster_id not in cluster_ids:
+                cluster_ids.add(cluster_id)
+                cluster_id = parents.get(cluster_id)
+        clusters = tuple(cluster for cluster in model.clusters if cluster.id in cluster_ids)
+
+        edges = []
+        for edge in model.edges:
+            if edge.tail not in ids or edge.head not in ids:
+                continue
+            # The edges can't be clipped at the clusters which aren't in the view.
+            dropped = [k for k in ("ltail", "lhead") if k in edge.attrs and edge.attrs[k] not in cluster_ids]
+            if dropped:
+                edge = edge._replace(attrs={k: v for k, v in edge.attrs.items() if k not in dropped})
+            edges.append(edge)
+
+        graph_attr = model.graph_attr
+        if name is not None:
+            graph_attr = {**graph_attr, "label": name}
+            filename = filename or "_".join(name.split()).lower()
+        return model._replace(
+            name=name if name is not None else model.name,
+            filename=filename or model.filename,
+            graph_attr=graph_attr,
+            nodes=nodes,
+            clusters=clusters,
+            edges=tuple(edges),
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def _kind(cls: str) -> Tuple[Optional[str], Optional[str]]:
+    """Return the provider and the type of a node class path."""
+    try:
+        node_cls = resolve_class(cls)
+    except ValueError:
+        return None, None
+    return node_cls._provider, node_cls._type
+
+
+def _class_path(path: str) -> str:
+    try:
+        return class_path(resolve_class(path))
+    except ValueError:
+        return path
@@ -0,0 +1,197 @@
+"""
+benchmark.py compares the layout times of the force engine with the dot and
+the sfdp layouts of graphviz on random network-like diagrams.
+
+Usage: python -m scripts.benchmark [<nodes> ...]
+       python -m scripts.benchmark presets [<nodes> ...]
+       python -m scripts.benchmark cost [<nodes> ...]
+
+The diagrams are random trees, as the network inventories mostly are, with
+a third of the nodes grouped in clusters. The graphviz layouts exceeding the
+time limit are reported as such rather than waited for.
+
+The presets command measures the dot layout times of the layout presets on
+random inventories of icon nodes, with and without clusters, along with the
+preset the auto preset picks for them.
+
+The cost command fits the coefficients of the cost model to the dot layout
+times of the same inventories, with the orthogonal and the spline edges,
+and prints the fitted coefficients along with the estimates they make.
+"""
+
+import random
+import subprocess
+import sys
+import time
+
+from diagrams.cost import CostModel
+from diagrams.force import force_layout
+from diagrams.model import ClusterModel, DiagramModel, EdgeModel, NodeModel
+from diagrams.presets import PRESETS, apply_preset, auto_preset
+from diagrams.spec import build
+
+_usage = "Usage: benchmark.py [presets|cost] [<nodes> ...]"
+
+SIZES = (1000, 5000, 20000)
+PRESET_SIZES = (25, 50, 100, 200, 400, 800, 1600)
+COST_SIZES = (25, 50, 100, 200, 400, 800)
+COST_SEEDS = 2
+CLUSTERS = 20
+TIMEOUT = 600
+
+
+def network(nodes: int, seed: int = 0) -> DiagramModel:
+    """Return a random tree of the given number of the nodes, a third of them in clusters."""
+    rng = random.Random(seed)
+    # The cluster ids need the "cluster" prefix, so that graphviz draws them as clusters.
+    clusters = tuple(ClusterModel(f"cluster_{i}", f"cluster{i}", "Cluster", None, {}) for i in range(CLUSTERS))
+    return DiagramModel(
+        name="benchmark",
+        filename="benchmark",
+        outformat="png",
+        graph_attr={"nodesep": "0.6", "ranksep": "0.75", "splines": "line"},
+        node_attr={"shape": "box", "width": "1.4", "height": "1.4", "fixedsize": "true"},
+        edge_attr={},
+        nodes=tuple(
+            NodeModel(f"n{i}", f"node{i}", "Node", None, {}, f"cluster_{i % CLUSTERS}" if i % 3 == 0 else None)
+            for i in range(nodes)
+        ),
+        clusters=clusters,
+        edges=tuple(EdgeModel(f"n{i}", f"n{rng.randrange(i)}", {}) for i in range(1, nodes)),
+    )
+
+
+def inventory(nodes: int, clusters: int = 0, seed: int = 0) -> DiagramModel:
+    """Return a random inventory of icon nodes, built as the diagram specs are.
+
+    The nodes make a random tree along with the cross links of a third of
+    the nodes, and most of them are in the clusters, which are nested at
+    random.
+    """
+    rng = random.Random(seed)
+    groups = [{"id": f"c{i}", "label": f"group{i}"} for i in range(clusters)]
+    for i, group in enumerate(groups[1:], 1):
+        if rng.random() < 0.3:
+            group["parent"] = f"c{rng.randrange(i)}"
+    spec = {
+        "name": "benchmark",
+        "clusters": groups,
+        "nodes": [
+            {
+                "id": f"n{i}",
+                "class": "aws.compute.EC2",
+                "label": f"node{i}",
+                **({"cluster": f"c{rng.randrange(clusters)}"} if clusters and rng.random() < 0.6 else {}),
+            }
+            for i in range(nodes)
+        ],
+        "edges": [{"tail": f"n{rng.randrange(i)}", "head": f"n{i}", "forward": True} for i in range(1, nodes)]
+        + [
+            {"tail": f"n{rng.randrange(nodes)}", "head": f"n{rng.randrange(nodes)}", "forward": True}
+            for _ in range(nodes * 3 // 10)
+        ],
+    }
+    return build(spec)
+
+
+def graphviz(engine: str):
+    """Return the benchmark of a graphviz layout engine."""
+
+    def run(model: DiagramModel) -> None:
+        subprocess.run(
+            ["dot", f"-K{engine}", "-Tjson"],
+            input=model.source.encode(),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=TIMEOUT,
+            check=True,
+        )
+
+    return run
+
+
+def measure(run, model: DiagramModel) -> str:
+    start = time.perf_counter()
+    try:
+        run(model)
+    except FileNotFoundError:
+        return "missing"
+    except subprocess.TimeoutExpired:
+        return f">{TIMEOUT}s"
+    return f"{time.perf_counter() - start:.2f}s"
+
+
+# fmt: off
+engines = {
+    "force": force_layout,
+    "dot": graphviz("dot"),
+    "sfdp": graphviz("sfdp"),
+}
+# fmt: on
+
+
+def presets(sizes) -> None:
+    """Print the dot layout times of the presets, without clusters and with a cluster per ten nodes."""
+    widths = (8, 8, 10, 10) + (10,) * len(PRESETS)
+    header = ["nodes", "edges", "clusters", "auto", *PRESETS]
+    print("".join(value.ljust(width) for value, width in zip(header, widths)))
+    for size in sizes:
+        for clusters in (0, size // 10):
+            model = inventory(size, clusters)
+            counts = (len(model.nodes), len(model.edges), len(model.clusters))
+            times = [measure(graphviz("dot"), apply_preset(model, preset)) for preset in PRESETS]
+            row = [str(count) for count in counts] + [auto_preset(*counts)] + times
+            print("".join(value.ljust(width) for value, width in zip(row, widths)))
+
+
+def cost(sizes) -> None:
+    """Fit the cost model to the dot layout times and print the fit."""
+    run = graphviz("dot")
+    samples = []
+    for size in sizes:
+        for clusters in (0, size // 10):
+            for splines in ("ortho", "spline"):
+                for seed in range(COST_SEEDS):
+                    model = inventory(size, clusters, seed)
+                    model = model._replace(graph_attr={**model.graph_attr, "splines": splines})
+                    start = time.perf_counter()
+                    try:
+                        run(model)
+                    except subprocess.TimeoutExpired:
+                        continue
+                    samples.append((model, time.perf_counter() - start))
+
+    cost_model = CostModel.fit(samples)
+    widths = (8, 8, 10, 10, 12, 12)
+    header = ["nodes", "edges", "clusters", "splines", "measured", "estimated"]
+    print("".join(value.ljust(width) for value, width in zip(header, widths)))
+    errors = []
+    for model, seconds in samples:
+        estimated = cost_model.estimate(model).seconds
+        errors.append(abs(estimated - seconds) / seconds)
+        counts = (len(model.nodes), len(model.edges), len(model.clusters))
+        row = [str(count) for count in counts] + [model.graph_attr["splines"], f"{seconds:.2f}s", f"{estimated:.2f}s"]
+        print("".join(value.ljust(width) for value, width in zip(row, widths)))
+    print(f"coefficients: ({', '.join(f'{c:.3g}' for c in cost_model.coefficients)})")
+    print(f"samples: {len(samples)}, median relative error: {sorted(errors)[len(errors) // 2]:.0%}")
+
+
+commands = {"presets": (presets, PRESET_SIZES), "cost": (cost, COST_SIZES)}
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args.pop(0) if args and args[0] in commands else None
+    try:
+        sizes = [int(arg) for arg in args] or (commands[command][1] if command else SIZES)
+    except ValueError:
+        print(_usage)
+        sys.exit()
+
+    if command:
+        commands[command][0](sizes)
+        sys.exit()
+
+    print("nodes".ljust(10) + "".join(name.ljust(12) for name in engines))
+    for size in sizes:
+        model = network(size)
+        print(str(size).ljust(10) + "".join(measure(run, model).ljust(12) for run in engines.values()))
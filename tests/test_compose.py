@@ -0,0 +1,55 @@
+import unittest
+
+from diagrams.compose import merge
+from diagrams.spec import build
+
+
+class MergeTest(unittest.TestCase):
+    def setUp(self):
+        self.team_a = build(
+            {
+                "name": "Team A",
+                "clusters": [{"id": "web", "label": "Web"}],
+                "nodes": [
+                    {"id": "lb", "class": "aws.network.ELB"},
+                    {"id": "web1", "class": "aws.compute.EC2", "cluster": "web"},
+                ],
+                "edges": [{"tail": "lb", "head": "web", "forward": True}],
+            }
+        )
+        self.team_b = build(
+            {
+                "name": "Team B",
+                "edge_attr": {"color": "red"},
+                "clusters": [{"id": "web", "label": "Web"}],
+                "nodes": [
+                    {"id": "lb", "class": "aws.network.ELB"},
+                    {"id": "db", "class": "aws.database.RDS", "cluster": "web"},
+                ],
+                "edges": [{"tail": "lb", "head": "db"}],
+            }
+        )
+
+    def test_merge(self):
+        model = merge([self.team_a, self.team_b], name="Global")
+        self.assertEqual(model.name, "Global")
+        self.assertEqual(model.graph_attr["label"], "Global")
+        self.assertEqual([n.id for n in model.nodes], ["lb", "web1", "team_b.lb", "db"])
+        self.assertEqual([c.id for c in model.clusters], ["cluster_web", "cluster_team_b.web"])
+        self.assertEqual(model.nodes[3].cluster, "cluster_team_b.web")
+        self.assertEqual((model.edges[1].tail, model.edges[1].head), ("team_b.lb", "db"))
+        self.assertEqual(model.edges[0].attrs["lhead"], "cluster_web")
+        # The edge defaults of the second model are kept on its own edges.
+        self.assertEqual(model.edges[1].attrs["color"], "red")
+
+    def test_merge_with_wrap(self):
+        model = merge([self.team_a, self.team_b], wrap=True)
+        wrappers = [c for c in model.clusters if c.parent is None]
+        self.assertEqual([c.label for c in wrappers], ["Team A", "Team B"])
+        self.assertEqual(model.nodes[0].cluster, "cluster_team_a")
+        self.assertEqual(model.clusters[1].parent, "cluster_team_a")
+        self.assertNotEqual(model.clusters[1].attrs["bgcolor"], wrappers[0].attrs["bgcolor"])
+
+    def test_merge_nothing(self):
+        with self.assertRaises(ValueError):
+            merge([])
@@ -0,0 +1,76 @@
+import os
+import shutil
+import unittest
+
+from diagrams import Cluster, Diagram, Edge, setcluster, setdiagram
+from diagrams.aws.compute import EC2
+from diagrams.cost import CostModel, cost_features, estimate_cost
+
+
+class CostTest(unittest.TestCase):
+    def setUp(self):
+        self.name = "cost_test"
+
+    def tearDown(self):
+        setdiagram(None)
+        setcluster(None)
+        try:
+            shutil.rmtree(self.name)
+        except OSError:
+            pass
+
+    def _model(self, workers=2, curvestyle="ortho"):
+        with Diagram(name=os.path.join(self.name, "diagram"), show=False, curvestyle=curvestyle) as diagram:
+            lb = EC2("lb")
+            with Cluster("Web"):
+                with Cluster("Pool"):
+                    web = EC2("web")
+            lb >> web
+            for i in range(workers):
+                web >> EC2(f"worker{i}")
+            # The edges closing cycles don't add ranks.
+            web >> Edge(color="red") >> lb
+            model = diagram.snapshot()
+        diagram.close()
+        return model
+
+    def test_cost_features(self):
+        features = cost_features(self._model())
+        self.assertEqual((features.nodes, features.edges, features.clusters), (4, 4, 2))
+        self.assertEqual(features.depth, 2)
+        self.assertEqual(features.fanout, 4)
+        self.assertEqual((features.ranks, features.rank_width), (3, 2))
+        self.assertTrue(features.ortho)
+        self.assertFalse(cost_features(self._model(curvestyle="curved")).ortho)
+
+    def test_estimate_cost(self):
+        small, big = estimate_cost(self._model()), estimate_cost(self._model(workers=50))
+        self.assertGreater(big.seconds, small.seconds)
+        self.assertGreater(big.height, small.height)
+        self.assertEqual(big.width, small.width)
+        self.assertEqual(big.pixels, big.width * big.height)
+        self.assertEqual(big.bytes, big.pixels * 4)
+        self.assertLess(estimate_cost(self._model(curvestyle="curved")).seconds, small.seconds)
+
+    def test_fit(self):
+        truth = CostModel((0.1, 2e-3, 1e-3, 0.05, 1e-4))
+        samples = [
+            (model, truth.estimate(model).seconds)
+            for model in (
+                self._model(workers, curvestyle) for workers in (1, 5, 20, 80) for curvestyle in ("ortho", "curved")
+            )
+        ]
+        fitted = CostModel.fit(samples)
+        for model, seconds in samples:
+            self.assertAlmostEqual(fitted.estimate(model).seconds, seconds, places=3)
+        with self.assertRaises(ValueError):
+            CostModel.fit(samples[:2])
+        with self.assertRaises(ValueError):
+            CostModel.fit([(model, 0.0) for model, _ in samples])
+
+    def test_fit_non_negative(self):
+        # The bigger diagrams are laid out faster, which no term explains.
+        samples = [(self._model(workers), 1.0 / workers) for workers in (1, 2, 5, 10, 20, 40)]
+        fitted = CostModel.fit(samples)
+        self.assertTrue(all(c >= 0 for c in fitted.coefficients))
+        self.assertGreater(fitted.coefficients[0], 0)
@@ -1,8 +1,10 @@
+import gc
 import os
 import shutil
 import unittest
+import weakref
 
-from diagrams import Cluster, Diagram, Edge, Node
+from diagrams import Cluster, Diagram, Edge, Node, Theme
 from diagrams.aws.compute import EC2
 from diagrams import getcluster, getdiagram, setcluster, setdiagram
 
@@ -46,7 +48,7 @@ class DiagramTest(unittest.TestCase):
 
     def test_validate_outformat(self):
         # Normal output formats.
-        for fmt in ("png", "jpg", "svg", "pdf"):
+        for fmt in ("png", "jpg", "svg", "pdf", "json", "xdot", "html", "tiles"):
             Diagram(outformat=fmt)
 
         # Invalid output formats.
@@ -65,6 +67,18 @@ class DiagramTest(unittest.TestCase):
         with self.assertRaises(EnvironmentError):
             Node("node")
 
+    def test_node_after_diagram(self):
+        with Diagram(name=os.path.join(self.name, "node_after_diagram"), show=False):
+            node = Node("node")
+            cluster = Cluster("cluster")
+        # The nodes can't be connected once the diagram is closed.
+        with self.assertRaises(EnvironmentError):
+            node >> node
+        # A cluster context left over without a diagram.
+        setcluster(cluster)
+        with self.assertRaises(EnvironmentError):
+            Node("node")
+
     def test_node_to_node(self):
         with Diagram(name=os.path.join(self.name, "node_to_node"), show=False):
             node1 = Node("node1")
@@ -101,6 +115,45 @@ class DiagramTest(unittest.TestCase):
             Node("node1")
         self.assertTrue(os.path.exists(f"{self.name}.png"))
 
+    def test_icon_relative_to_imagepath(self):
+        with Diagram(name=os.path.join(self.name, "icon_relative_to_imagepath"), show=False) as d:
+            node = EC2("node1")
+            self.assertEqual(node._attrs["image"], "aws/compute/ec2.png")
+            imagepath = d.dot.graph_attr["imagepath"]
+            self.assertTrue(os.path.exists(os.path.join(imagepath, node._attrs["image"])))
+
+    def test_embed_icons(self):
+        filename = os.path.join(self.name, "embed_icons")
+        with Diagram(name=filename, outformat="svg", embed_icons=True, show=False):
+            EC2("node1") >> EC2("node2")
+        with open(f"{filename}.svg") as f:
+            self.assertNotIn("ec2.png", f.read())
+
+    def test_no_reference_cycles(self):
+        gc.collect()
+        gc.disable()
+        try:
+            with Diagram(name=os.path.join(self.name, "no_reference_cycles"), show=False) as d:
+                node1 = Node("node1")
+                with Cluster() as c:
+                    node2 = EC2("node2")
+                    with EC2("node3") as node3:
+                        node4 = Node("node4")
+                node1 >> Edge(color="red") >> node2 >> node4
+            refs = [weakref.ref(o) for o in (d, c, node1, node2, node3, node4)]
+            del d, c, node1, node2, node3, node4
+            # Everything must be freed by the reference counting alone.
+            self.assertEqual([ref() for ref in refs], [None] * len(refs))
+        finally:
+            gc.enable()
+
+    def test_close(self):
+        with Diagram(name=os.path.join(self.name, "close"), show=False) as d:
+            Node("node1") >> Node("node2")
+        d.close()
+        self.assertEqual(d.dot.body, [])
+        self.assertEqual(d.snapshot().nodes, ())
+
     def test_empty_name(self):
         """Check that providing an empty name don't crash, but save in a diagrams_image.xxx file."""
         self.name = 'diagrams_image'
@@ -292,3 +345,55 @@ class EdgeTest(unittest.TestCase):
                 self.assertEqual(
                     nodes << Edge(color="green", label="6.3") << Edge(color="pink", label="6.4") << node1, node1
                 )
+
+
+class ThemeTest(unittest.TestCase):
+    def setUp(self):
+        self.name = "theme_test"
+
+    def tearDown(self):
+        setdiagram(None)
+        setcluster(None)
+        # Only some tests generate the image file.
+        try:
+            shutil.rmtree(self.name)
+        except OSError:
+            pass
+
+    def test_icon_node_attrs_are_hoisted(self):
+        with Diagram(name=os.path.join(self.name, "icon_node_attrs_are_hoisted"), show=False) as d:
+            node = EC2("node1")
+            self.assertNotIn("shape", node._attrs)
+            self.assertNotIn("height", node._attrs)
+            self.assertIn("image", node._attrs)
+            self.assertEqual(d.dot.node_attr["shape"], "none")
+
+    def test_plain_node_overrides_hoisted_attrs(self):
+        with Diagram(name=os.path.join(self.name, "plain_node_overrides_hoisted_attrs"), show=False):
+            node = Node("node1")
+            self.assertEqual(node._attrs["shape"], "box")
+            self.assertEqual(node._attrs["height"], "1.4")
+
+    def test_edge_default_attrs_are_hoisted(self):
+        with Diagram(name=os.path.join(self.name, "edge_default_attrs_are_hoisted"), show=False) as d:
+            Node("node1") >> Edge(color="red") >> Node("node2")
+            self.assertEqual(d.dot.edge_attr["fontsize"], "13")
+            self.assertEqual(d.edge_overrides(Edge(color="red", fontsize="13").attrs), {"color": "red", "dir": "none"})
+
+    def test_nested_cluster_attrs_are_inherited(self):
+        with Diagram(name=os.path.join(self.name, "nested_cluster_attrs_are_inherited"), show=False):
+            with Cluster("outer") as outer:
+                with Cluster("inner") as inner:
+                    Node("node1")
+                self.assertNotIn("pencolor", inner.dot.graph_attr)
+                self.assertIn("bgcolor", inner.dot.graph_attr)
+            self.assertIn("pencolor", outer.dot.graph_attr)
+
+    def test_custom_theme(self):
+        theme = Theme(edge_attr={"color": "red"}, cluster_attr={"pencolor": "blue"}, bgcolors=("white",))
+        with Diagram(name=os.path.join(self.name, "custom_theme"), show=False, theme=theme) as d:
+            with Cluster("cluster") as c:
+                Node("node1")
+            self.assertEqual(d.dot.edge_attr["color"], "red")
+            self.assertEqual(c.dot.graph_attr["pencolor"], "blue")
+            self.assertEqual(c.dot.graph_attr["bgcolor"], "white")
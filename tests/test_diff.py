@@ -0,0 +1,142 @@
+import os
+import shutil
+import unittest
+
+from diagrams import Cluster, Diagram, setcluster, setdiagram
+from diagrams.aws.compute import EC2
+from diagrams.aws.database import RDS
+from diagrams.diff import ADDED_COLOR, CHANGED_COLOR, REMOVED_COLOR, diff, fingerprint, highlight
+from diagrams.spec import build
+
+
+def _spec(**changes):
+    spec = {
+        "name": "Web",
+        "clusters": [{"id": "db", "label": "DB"}],
+        "nodes": [
+            {"id": "web", "class": "aws.compute.EC2"},
+            {"id": "rds", "class": "aws.database.RDS", "cluster": "db"},
+            {"id": "cache", "class": "aws.database.ElastiCache"},
+        ],
+        "edges": [{"tail": "web", "head": "rds"}, {"tail": "web", "head": "cache"}],
+    }
+    spec.update(changes)
+    return spec
+
+
+class DiffTest(unittest.TestCase):
+    def setUp(self):
+        self.name = "diff_test"
+
+    def tearDown(self):
+        setdiagram(None)
+        setcluster(None)
+        try:
+            shutil.rmtree(self.name)
+        except OSError:
+            pass
+
+    def _script(self, web_label="web"):
+        with Diagram(name=os.path.join(self.name, "diagram"), show=False) as diagram:
+            with Cluster("DB"):
+                db = RDS("rds")
+            EC2(web_label) >> db
+            model = diagram.snapshot()
+        diagram.close()
+        return model
+
+    def test_diff_by_id(self):
+        old = build(_spec())
+        self.assertFalse(diff(old, build(_spec())))
+
+        new_spec = _spec()
+        new_spec["nodes"] = [
+            {"id": "web", "class": "aws.compute.EC2", "label": "frontend"},
+            {"id": "rds", "class": "aws.database.RDS", "cluster": "db"},
+            {"id": "queue", "class": "aws.integration.SQS"},
+        ]
+        new_spec["edges"] = [{"tail": "web", "head": "rds", "color": "red"}, {"tail": "web", "head": "queue"}]
+        changes = diff(old, build(new_spec))
+        self.assertTrue(changes)
+        self.assertEqual([n.id for n in changes.added_nodes], ["queue"])
+        self.assertEqual([n.id for n in changes.removed_nodes], ["cache"])
+        self.assertEqual([(o.label, n.label) for o, n in changes.changed_nodes], [("", "frontend")])
+        self.assertEqual([(e.tail, e.head) for e in changes.added_edges], [("web", "queue")])
+        self.assertEqual([(e.tail, e.head) for e in changes.removed_edges], [("web", "cache")])
+        self.assertEqual([n.attrs["color"] for _, n in changes.changed_edges], ["red"])
+        self.assertEqual(changes.changed_clusters, ())
+
+    def test_diff_metadata(self):
+        new_spec = _spec()
+        new_spec["nodes"][0] = {"id": "web", "class": "aws.compute.EC2", "tags": ["api"], "metadata": {"owner": "a"}}
+        changes = diff(build(_spec()), build(new_spec))
+        # The tags and the metadata aren't drawn, so the node isn't changed.
+        self.assertTrue(changes)
+        self.assertEqual(changes.changed_nodes, ())
+        self.assertEqual([(o.tags, n.tags) for o, n in changes.changed_metadata], [((), ("api",))])
+        self.assertEqual(highlight(build(_spec()), build(new_spec)).nodes[0].attrs, build(new_spec).nodes[0].attrs)
+        self.assertEqual(fingerprint(build(_spec())), fingerprint(build(new_spec)))
+
+    def test_diff_attrs(self):
+        changes = diff(build(_spec()), build(_spec(direction="TB")))
+        self.assertEqual(changes.graph_attr, {"rankdir": ("LR", "TB")})
+        self.assertTrue(changes)
+
+    def test_diff_by_structure(self):
+        old, new = self._script(), self._script()
+        self.assertNotEqual({n.id for n in old.nodes}, {n.id for n in new.nodes})
+        self.assertTrue(diff(old, new))
+        self.assertFalse(diff(old, new, by="structure"))
+
+        changes = diff(old, self._script(web_label="frontend"), by="structure")
+        self.assertEqual([n.label for n in changes.added_nodes], ["frontend"])
+        self.assertEqual([n.label for n in changes.removed_nodes], ["web"])
+        self.assertEqual(len(changes.added_edges), 1)
+        self.assertEqual(changes.changed_clusters, ())
+
+        with self.assertRaises(ValueError):
+            diff(old, new, by="label")
+
+    def test_fingerprint(self):
+        self.assertEqual(fingerprint(self._script()), fingerprint(self._script()))
+        self.assertNotEqual(fingerprint(self._script()), fingerprint(self._script(web_label="frontend")))
+        self.assertEqual(fingerprint(build(_spec())), fingerprint(build(_spec())))
+
+    def test_highlight(self):
+        old = build(_spec())
+        new_spec = _spec()
+        new_spec["clusters"] = []
+        new_spec["nodes"] = [
+            {"id": "web", "class": "aws.compute.EC2", "label": "frontend"},
+            {"id": "cache", "class": "aws.database.ElastiCache"},
+            {"id": "queue", "class": "aws.integration.SQS"},
+        ]
+        new_spec["edges"] = [{"tail": "web", "head": "cache"}, {"tail": "web", "head": "queue"}]
+        model = highlight(old, build(new_spec))
+
+        nodes = {n.id: n for n in model.nodes}
+        self.assertEqual(nodes["queue"].attrs["color"], ADDED_COLOR)
+        self.assertEqual(nodes["web"].attrs["color"], CHANGED_COLOR)
+        self.assertEqual(nodes["rds"].attrs["color"], REMOVED_COLOR)
+        self.assertIn("dashed", nodes["rds"].attrs["style"])
+        self.assertNotIn("color", nodes["cache"].attrs)
+        self.assertEqual(nodes["rds"].cluster, "cluster_db")
+
+        clusters = {c.id: c for c in model.clusters}
+        self.assertEqual(clusters["cluster_db"].attrs["pencolor"], REMOVED_COLOR)
+        edges = {(e.tail, e.head): e for e in model.edges}
+        self.assertEqual(edges[("web", "rds")].attrs["style"], "dashed")
+        self.assertEqual(edges[("web", "queue")].attrs["color"], ADDED_COLOR)
+        self.assertNotIn("color", edges[("web", "cache")].attrs)
+
+    def test_highlight_by_structure(self):
+        old, new = self._script(), self._script(web_label="frontend")
+        model = highlight(old, new, by="structure")
+        self.assertEqual(len(model.nodes), 3)
+        self.assertEqual(len(model.clusters), 1)
+        # The removed edge points at the node of the new diagram.
+        removed = [e for e in model.edges if e.attrs.get("style") == "dashed"]
+        self.assertEqual(len(removed), 1)
+        self.assertIn(removed[0].head, {n.id for n in new.nodes})
+        model.render(directory=self.name)
+        self.assertTrue(os.path.exists(os.path.join(self.name, f"{model.filename}.png")))
@@ -0,0 +1,66 @@
+import os
+import shutil
+import unittest
+
+from diagrams import Cluster, Diagram, Edge, draw, setcluster, setdiagram
+from diagrams.aws.compute import EC2
+from diagrams.layout import export_layout, parse_layout
+from diagrams.utils import resource_dir
+from tests.test_layout import _json_output
+
+
+class DrawTest(unittest.TestCase):
+    def setUp(self):
+        self.name = "draw_test"
+
+    def tearDown(self):
+        setdiagram(None)
+        setcluster(None)
+        try:
+            shutil.rmtree(self.name)
+        except OSError:
+            pass
+
+    def _exported(self):
+        with Diagram(name=os.path.join(self.name, "draw"), show=False, edge_attr={"color": "gray"}) as diagram:
+            with EC2("group"):
+                web = EC2("web")
+            with Cluster("plain"):
+                app = EC2("app")
+            web >> Edge(style="dashed") >> app
+            web >> app
+            model = diagram.snapshot()
+        diagram.close()
+        return model, export_layout(model, parse_layout(model, _json_output(model)))
+
+    def test_clusters(self):
+        model, exported = self._exported()
+        (group, group_model, group_attrs), (plain, plain_model, plain_attrs) = draw.clusters(model, exported)
+        self.assertEqual(group_model.label, "group")
+        self.assertEqual(draw.cluster_icon_size(group_model), 30)
+
+        # The icon is left of the label, both of them vertically centered at the label position.
+        label = draw.cluster_label(group, group_model, group_attrs)
+        left, top, size = label.icon
+        self.assertEqual(label.align, "start")
+        self.assertEqual(left, group["bb"][0] + draw.CLUSTER_LABEL_PADDING)
+        self.assertEqual(label.x, left + size + draw.CLUSTER_LABEL_PADDING)
+        self.assertEqual(top + size / 2, label.y)
+
+        label = draw.cluster_label(plain, plain_model, {**plain_attrs, "labeljust": "c"})
+        self.assertIsNone(label.icon)
+        self.assertEqual((label.align, label.x), ("middle", (plain["bb"][0] + plain["bb"][2]) / 2))
+
+    def test_edges(self):
+        model, exported = self._exported()
+        (_, dashed), (_, plain) = draw.edges(model, exported)
+        self.assertEqual(draw.line_style(dashed, "color"), draw.LineStyle("gray", 1, (5, 2)))
+        self.assertEqual(draw.line_style(plain, "color"), draw.LineStyle("gray", 1, ()))
+        self.assertIsNone(draw.line_style({"style": "invis"}, "color").color)
+        self.assertEqual(draw.line_style({"color": "red:blue", "style": "bold"}, "pencolor").width, 2)
+
+    def test_icon_path(self):
+        model, _ = self._exported()
+        icon = os.path.join(resource_dir(), "aws", "compute", "ec2.png")
+        self.assertEqual(draw.icon_path(model, "aws/compute/ec2.png"), icon)
+        self.assertEqual(draw.icon_path(model, "/icons/web.png"), os.path.normpath("/icons/web.png"))
@@ -0,0 +1,98 @@
+import os
+import shutil
+import sys
+import unittest
+from unittest import mock
+
+from diagrams import Cluster, Diagram, Edge, setcluster, setdiagram
+from diagrams.aws.compute import EC2
+from diagrams.diff import _Keys
+from diagrams.force import force_layout
+from diagrams.layout import _box, _edge_key, _point, _spline, export_layout
+
+
+class ForceLayoutTest(unittest.TestCase):
+    def setUp(self):
+        self.name = "force_test"
+
+    def tearDown(self):
+        setdiagram(None)
+        setcluster(None)
+        try:
+            shutil.rmtree(self.name)
+        except OSError:
+            pass
+
+    def _model(self, workers=30):
+        with Diagram(name=os.path.join(self.name, "diagram"), show=False) as diagram:
+            lb = EC2("lb")
+            with Cluster("Web"):
+                web = [EC2(f"web{i}") for i in range(3)]
+            lb >> web
+            for i in range(workers):
+                web[i % 3] >> EC2(f"worker{i}")
+            web[0] << Edge(color="red") << EC2("client")
+            web[0] >> web[0]
+            model = diagram.snapshot()
+        diagram.close()
+        return model
+
+    def test_force_layout(self):
+        model = self._model()
+        layout = force_layout(model)
+        keys = _Keys(model, "structure")
+        self.assertEqual(len(layout.nodes), len(model.nodes))
+        self.assertEqual(layout.graph["splines"], "line")
+
+        # No nodes overlap.
+        boxes = []
+        for node in model.nodes:
+            positions = layout.nodes[keys.node(node)]
+            x, y = _point(positions["pos"])
+            width, height = float(positions["width"]) * 72, float(positions["height"]) * 72
+            boxes.append((x - width / 2, y - height / 2, x + width / 2, y + height / 2))
+        for i, box in enumerate(boxes):
+            for other in boxes[i + 1 :]:
+                self.assertTrue(box[2] <= other[0] or other[2] <= box[0] or box[3] <= other[1] or other[3] <= box[1])
+
+        # The cluster encloses its nodes.
+        left, bottom, right, top = _box(layout.clusters[keys.cluster(model.clusters[0])]["bb"])
+        for node, box in zip(model.nodes, boxes):
+            if node.cluster is not None:
+                self.assertTrue(left <= box[0] and bottom <= box[1] and box[2] <= right and box[3] <= top)
+
+        # The same seed gives the same layout.
+        self.assertEqual(force_layout(model), layout)
+        self.assertNotEqual(force_layout(model, seed=1).nodes, layout.nodes)
+
+    def test_edge_positions(self):
+        model = self._model(workers=3)
+        layout = force_layout(model)
+        keys = _Keys(model, "structure")
+        loop, back = model.edges[-1], model.edges[-2]
+        self.assertNotIn(_edge_key(keys.edge(loop)), layout.edges)
+        forward = _spline(layout.edges[_edge_key(keys.edge(model.edges[0]))]["pos"])
+        self.assertIn("end", forward)
+        self.assertNotIn("start", forward)
+        self.assertEqual(len(forward["points"]), 4)
+        self.assertIn("start", _spline(layout.edges[_edge_key(keys.edge(back))]["pos"]))
+        # The exported layout has the edges too.
+        self.assertEqual(len(export_layout(model, layout)["edges"]), len(model.edges) - 1)
+
+    def test_empty(self):
+        with Diagram(name=os.path.join(self.name, "empty"), show=False) as diagram:
+            model = diagram.snapshot()
+        diagram.close()
+        self.assertEqual(force_layout(model).graph["bb"], "0,0,0,0")
+
+    def test_diagram_layout_engine(self):
+        with self.assertRaises(ValueError):
+            Diagram(show=False, layout_engine="circo")
+        # A missing NumPy is reported when the diagram is created.
+        with mock.patch.dict(sys.modules, {"numpy": None}):
+            with self.assertRaisesRegex(ImportError, "diagrams\\[force\\]"):
+                Diagram(show=False, layout_engine="force")
+        filename = os.path.join(self.name, "force")
+        with Diagram(name=filename, show=False, outformat="json", layout_engine="force") as diagram:
+            EC2("web") >> EC2("app")
+        self.assertTrue(os.path.exists(f"{filename}.json"))
@@ -0,0 +1,85 @@
+import json
+import os
+import shutil
+import unittest
+
+from diagrams import Cluster, Diagram, Edge, setcluster, setdiagram
+from diagrams.aws.compute import EC2
+from diagrams.aws.database import RDS
+from diagrams.html import write_html
+from diagrams.layout import LayoutCache, parse_layout
+from tests.test_layout import _json_output
+
+
+def _data(page):
+    start = page.index("const diagram = ") + len("const diagram = ")
+    return json.loads(page[start : page.index(";\n", start)].replace("<\\/", "</"))
+
+
+class HtmlTest(unittest.TestCase):
+    def setUp(self):
+        self.name = "html_test"
+
+    def tearDown(self):
+        setdiagram(None)
+        setcluster(None)
+        try:
+            shutil.rmtree(self.name)
+        except OSError:
+            pass
+
+    def _model(self, name="diagram"):
+        with Diagram(name=os.path.join(self.name, name), show=False) as diagram:
+            with Cluster("DB"):
+                db = RDS("rds")
+            EC2("web") >> Edge(label="</script>", style="dashed") >> db
+            EC2("worker") >> db
+            model = diagram.snapshot()
+        diagram.close()
+        return model
+
+    def test_write_html(self):
+        model = self._model()
+        page = write_html(model, parse_layout(model, _json_output(model)))
+        self.assertIn(f"<title>{model.name}</title>", page)
+        self.assertEqual(page.count("</script>"), 1)
+        data = _data(page)
+        # Each distinct icon is embedded once.
+        self.assertEqual(sorted(data["icons"]), ["aws/compute/ec2.png", "aws/database/rds.png"])
+        self.assertTrue(all(uri.startswith("data:image/png;base64,") for uri in data["icons"].values()))
+        nodes = {node["label"]: node for node in data["nodes"]}
+        self.assertEqual(nodes["web"]["icon"], "aws/compute/ec2.png")
+        self.assertTrue(nodes["web"]["style"]["bottom"])
+        cluster = data["clusters"][0]
+        self.assertEqual(cluster["style"]["fill"], Diagram(show=False).bgcolors[1 % 4])
+        self.assertEqual(cluster["style"]["label"]["align"], "left")
+        self.assertIsNone(cluster["style"]["icon"])
+        edges = data["edges"]
+        self.assertEqual(edges[0]["label"], "</script>")
+        self.assertEqual(edges[0]["style"]["dash"], [5, 2])
+        self.assertEqual(edges[1]["style"]["dash"], [])
+
+    def test_cluster_icons(self):
+        with Diagram(name=os.path.join(self.name, "icons"), show=False) as diagram:
+            with EC2("group"):
+                RDS("rds")
+            model = diagram.snapshot()
+        diagram.close()
+        data = _data(write_html(model, parse_layout(model, _json_output(model))))
+        cluster = data["clusters"][0]
+        self.assertEqual(cluster["icon"], "aws/compute/ec2.png")
+        self.assertEqual(cluster["style"]["icon"][2], 30)
+        self.assertEqual(sorted(data["icons"]), ["aws/compute/ec2.png", "aws/database/rds.png"])
+
+    def test_html_outformat(self):
+        cache = LayoutCache(os.path.join(self.name, "cache"))
+        model = self._model("page")
+        cache.put(model, parse_layout(model, _json_output(model)))
+        filename = os.path.join(self.name, "page")
+        with Diagram(name=filename, outformat="html", show=False, layout_cache=cache):
+            with Cluster("DB"):
+                db = RDS("rds")
+            EC2("web") >> Edge(label="</script>", style="dashed") >> db
+            EC2("worker") >> db
+        with open(f"{filename}.html", encoding="utf-8") as f:
+            self.assertEqual(len(_data(f.read())["nodes"]), 3)
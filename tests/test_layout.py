@@ -0,0 +1,517 @@
+import json
+import math
+import os
+import shutil
+import subprocess
+import unittest
+from unittest import mock
+
+from diagrams import Cluster, Diagram, Edge, setcluster, setdiagram
+from diagrams.aws.compute import EC2
+from diagrams.aws.database import RDS
+from diagrams.aws.integration import SQS
+from diagrams.diff import _Keys
+from diagrams.layout import (
+    Layout,
+    LayoutCache,
+    _edge_key,
+    _scope_model,
+    compute_cluster_layout,
+    compute_component_layout,
+    compute_layout,
+    export_layout,
+    fallbacks,
+    fit_raster,
+    layout_key,
+    layout_overlap,
+    pack_layouts,
+    parse_layout,
+    positioned,
+    raster_size,
+    seed_layout,
+    split_components,
+)
+
+
+def _json_output(model):
+    """Return the json output of dot for the model, having made-up positions."""
+    objects = [{"_gvid": i, "name": c.id, "bb": f"{i},0,100,100", "lp": "50,90"} for i, c in enumerate(model.clusters)]
+    for node in model.nodes:
+        index = len(objects)
+        objects.append({"_gvid": index, "name": node.id, "pos": f"{index * 10},20", "width": "1.4", "height": "1.9"})
+    indexes = {obj["name"]: obj["_gvid"] for obj in objects}
+    # Dot lists the edges grouped by their tail nodes, not in the order they were added.
+    order = sorted(range(len(model.edges)), key=lambda i: indexes[model.edges[i].tail])
+    edges = [
+        {"_gvid": i, "tail": indexes[e.tail], "head": indexes[e.head], "pos": f"e,{i},0 0,0 1,1 2,2"}
+        for i, e in ((i, model.edges[i]) for i in order)
+    ]
+    graph = {"name": model.name, "bb": "0,0,300,200", "_subgraph_cnt": len(model.clusters), "objects": objects}
+    return json.dumps({**graph, "edges": edges}).encode()
+
+
+def _edge_key_of(model, tail_label):
+    tail = next(n.id for n in model.nodes if n.label == tail_label)
+    edge = next(e for e in model.edges if e.tail == tail)
+    return _edge_key(_Keys(model, "structure").edge(edge))
+
+
+class LayoutTest(unittest.TestCase):
+    def setUp(self):
+        self.name = "layout_test"
+
+    def tearDown(self):
+        setdiagram(None)
+        setcluster(None)
+        try:
+            shutil.rmtree(self.name)
+        except OSError:
+            pass
+
+    def _model(self, label="web", color="red", **edge_attrs):
+        with Diagram(name=os.path.join(self.name, "diagram"), show=False) as diagram:
+            with Cluster("DB"):
+                db = RDS("rds")
+            EC2(label) >> Edge(color=color, **edge_attrs) >> db
+            model = diagram.snapshot()
+        diagram.close()
+        return model
+
+    def test_layout_key(self):
+        self.assertEqual(layout_key(self._model()), layout_key(self._model()))
+        self.assertEqual(layout_key(self._model()), layout_key(self._model(color="blue")))
+        self.assertNotEqual(layout_key(self._model()), layout_key(self._model(label="frontend")))
+        # The edges are clipped to make room for their arrows.
+        self.assertNotEqual(layout_key(self._model()), layout_key(self._model(arrowhead="diamond")))
+        self.assertNotEqual(layout_key(self._model()), layout_key(self._model(arrowsize="2")))
+
+    def test_parse_layout(self):
+        model = self._model()
+        layout = parse_layout(model, _json_output(model))
+        self.assertEqual(layout.graph, {"bb": "0,0,300,200"})
+        self.assertEqual(len(layout.nodes), 2)
+        self.assertEqual(list(layout.clusters.values()), [{"bb": "0,0,100,100", "lp": "50,90"}])
+        self.assertEqual(len(layout.edges), 1)
+
+    def _crossing(self):
+        with Diagram(name=os.path.join(self.name, "crossing"), show=False, curvestyle="curved") as diagram:
+            lb, web, worker, db = EC2("lb"), EC2("web"), EC2("worker"), RDS("db")
+            lb >> web
+            web >> worker
+            lb >> db
+            lb >> Edge(color="red") >> db
+            model = diagram.snapshot()
+        diagram.close()
+        return model
+
+    def test_parse_layout_edge_order(self):
+        model = self._crossing()
+        layout = parse_layout(model, _json_output(model))
+        keys = _Keys(model, "structure")
+        # Each edge gets its own spline, although dot lists them by their tails.
+        for i, edge in enumerate(model.edges):
+            self.assertTrue(layout.edges[_edge_key(keys.edge(edge))]["pos"].startswith(f"e,{i},"))
+
+    def test_compute_layout_edge_order(self):
+        model = self._crossing()
+        layout = compute_layout(model)
+        keys = _Keys(model, "structure")
+        for edge in model.edges:
+            # The arrow of each edge points at its own head node.
+            head = layout.nodes[keys.node(next(n for n in model.nodes if n.id == edge.head))]
+            x, y = (float(v) for v in head["pos"].split(","))
+            tip = layout.edges[_edge_key(keys.edge(edge))]["pos"].split()[0]
+            tx, ty = (float(v) for v in tip[2:].split(","))
+            self.assertLess(math.hypot(tx - x, ty - y), float(head["height"]) * 72)
+
+    def test_positioned(self):
+        model = self._model()
+        layout = parse_layout(model, _json_output(model))
+        # The positions are keyed by the structure, so they apply to another build restyled.
+        restyled = self._model(color="blue")
+        result = positioned(restyled, layout)
+        self.assertEqual(result.graph_attr["splines"], "true")
+        self.assertEqual(result.graph_attr["bb"], "0,0,300,200")
+        self.assertTrue(all("pos" in n.attrs for n in result.nodes))
+        self.assertEqual(result.clusters[0].attrs["bb"], "0,0,100,100")
+        self.assertEqual(result.edges[0].attrs["color"], "blue")
+        self.assertTrue(result.edges[0].attrs["pos"].startswith("e,"))
+        self.assertIsNone(positioned(self._model(label="frontend"), layout))
+
+    def test_cache(self):
+        cache = LayoutCache(os.path.join(self.name, "cache"))
+        model = self._model()
+        self.assertIsNone(cache.get(model))
+        layout = parse_layout(model, _json_output(model))
+        cache.put(model, layout)
+        self.assertEqual(cache.get(self._model(color="blue")), layout)
+        self.assertIsInstance(cache.get(model), Layout)
+        self.assertIsNone(cache.get(self._model(label="frontend")))
+
+    def test_render_cached(self):
+        cache = LayoutCache(os.path.join(self.name, "cache"))
+        model = self._model()
+        cache.put(model, parse_layout(model, _json_output(model)))
+        rendered = cache.render(self._model(color="blue"))
+        self.assertEqual(rendered, f"{model.filename}.png")
+        self.assertTrue(os.path.exists(rendered))
+        self.assertFalse(os.path.exists(model.filename))
+
+    def test_seed_layout(self):
+        model = self._model()
+        previous = parse_layout(model, _json_output(model))
+        with Diagram(name=os.path.join(self.name, "diagram"), show=False) as diagram:
+            with Cluster("DB"):
+                db = RDS("rds")
+                replica = RDS("replica")
+            web = EC2("web")
+            web >> Edge(color="red") >> db
+            db >> replica
+            grown = diagram.snapshot()
+        diagram.close()
+
+        layout = seed_layout(grown, previous)
+
+        def position(layout, label):
+            pos = next(v["pos"] for k, v in layout.nodes.items() if k.endswith(f":{label}#0"))
+            return tuple(map(float, pos.split(",")))
+
+        # The previous nodes stay in place.
+        self.assertEqual(position(layout, "rds"), position(previous, "rds"))
+        self.assertEqual(position(layout, "web"), position(previous, "web"))
+        # The new node is placed on the next rank after its neighbour.
+        x, _ = position(layout, "replica")
+        self.assertGreater(x, position(layout, "rds")[0] + 1.4 * 72)
+        # The cluster is fitted around both its nodes.
+        left, _, right, _ = map(float, list(layout.clusters.values())[0]["bb"].split(","))
+        self.assertLess(left, position(layout, "rds")[0])
+        self.assertGreater(right, x)
+        # Only the previous edge keeps its route, the new one is routed when rendering.
+        self.assertEqual(len(layout.edges), 1)
+        self.assertEqual(len(positioned(grown, layout).edges), 2)
+
+    def test_render_incremental(self):
+        cache = LayoutCache(os.path.join(self.name, "cache"), incremental=True)
+        model = self._model()
+        layout = parse_layout(model, _json_output(model))
+        cache.put(model, layout)
+        cache.render(model)
+        self.assertEqual(cache.previous(self._model(label="frontend")), layout)
+        # The renamed node is placed from the previous layout without running dot.
+        changed = self._model(label="frontend")
+        cache.render(changed)
+        self.assertIsNotNone(cache.get(changed))
+        self.assertNotEqual(cache.previous(model), layout)
+
+    def test_incremental_fallback(self):
+        cache = LayoutCache(os.path.join(self.name, "cache"), incremental=True, max_edits=2)
+        model = self._model()
+        cache.put(model, parse_layout(model, _json_output(model)))
+        cache.layout(model)
+
+        # The diagrams sharing no nodes with the previous one are laid out by dot.
+        with Diagram(name=os.path.join(self.name, "diagram"), show=False) as diagram:
+            SQS("queue") >> SQS("dlq")
+            other = diagram.snapshot()
+        diagram.close()
+        self.assertEqual(layout_overlap(other, cache.previous(other)), 0)
+        with mock.patch("diagrams.layout.compute_layout", return_value=parse_layout(other, _json_output(other))) as dot:
+            self.assertEqual(cache.layout(other).seeded, 0)
+        dot.assert_called_once_with(other, None)
+
+        # The diagrams are laid out by dot again after the incremental edits.
+        cache.layout(model)
+        for i, label in enumerate(("web1", "web2"), 1):
+            changed = self._model(label=label)
+            self.assertEqual(layout_overlap(changed, cache.previous(changed)), 0.5)
+            self.assertEqual(cache.layout(changed).seeded, i)
+        changed = self._model(label="web3")
+        dot_layout = parse_layout(changed, _json_output(changed))
+        with mock.patch("diagrams.layout.compute_layout", return_value=dot_layout) as dot:
+            self.assertEqual(cache.layout(changed).seeded, 0)
+        dot.assert_called_once()
+
+    def test_export_layout(self):
+        model = self._model()
+        exported = export_layout(model, parse_layout(model, _json_output(model)))
+        self.assertEqual((exported["width"], exported["height"]), (300, 200))
+        nodes = {n["label"]: n for n in exported["nodes"]}
+        self.assertEqual(nodes["web"]["class"], "aws.compute.EC2")
+        self.assertEqual(nodes["web"]["icon"], "aws/compute/ec2.png")
+        # The y axis points down like in the svg output.
+        self.assertEqual(nodes["rds"]["pos"], [10, 180])
+        self.assertEqual(nodes["rds"]["cluster"], exported["clusters"][0]["id"])
+        self.assertEqual((nodes["rds"]["width"], nodes["rds"]["height"]), (100.8, 136.8))
+        self.assertEqual(exported["clusters"][0]["bb"], [0, 100, 100, 200])
+        edge = exported["edges"][0]
+        self.assertEqual((edge["tail"], edge["head"]), (nodes["web"]["id"], nodes["rds"]["id"]))
+        self.assertEqual(edge["points"], [[0, 200], [1, 199], [2, 198]])
+        self.assertEqual(edge["end"], [0, 200])
+        self.assertNotIn("start", edge)
+
+    def test_json_outformat(self):
+        cache = LayoutCache(os.path.join(self.name, "cache"))
+        model = self._model()
+        cache.put(model, parse_layout(model, _json_output(model)))
+        filename = os.path.join(self.name, "diagram")
+        with Diagram(name=filename, outformat="json", show=False, layout_cache=cache):
+            with Cluster("DB"):
+                db = RDS("rds")
+            EC2("web") >> Edge(color="red") >> db
+        with open(f"{filename}.json") as f:
+            exported = json.load(f)
+        self.assertEqual([n["label"] for n in exported["nodes"]], ["rds", "web"])
+        self.assertEqual(len(exported["edges"]), 1)
+        self.assertFalse(os.path.exists(filename))
+
+    def test_raster_size(self):
+        layout = Layout({"bb": "0,0,720,360"}, {}, {}, {})
+        self.assertEqual(raster_size({}, layout), (971, 491))
+        self.assertEqual(raster_size({"pad": "0", "dpi": "72"}, layout), (720, 360))
+        self.assertEqual(raster_size({"pad": "1,0", "dpi": "72"}, layout), (864, 360))
+        # The size scales the drawing down only, unless it ends with "!".
+        self.assertEqual(raster_size({"pad": "0", "dpi": "72", "size": "5,5"}, layout), (360, 180))
+        self.assertEqual(raster_size({"pad": "0", "dpi": "72", "size": "20,20"}, layout), (720, 360))
+        self.assertEqual(raster_size({"pad": "0", "dpi": "72", "size": "20,20!"}, layout), (1440, 720))
+
+    def test_fit_raster(self):
+        layout = Layout({"bb": "0,0,720,360"}, {}, {}, {})
+        graph_attr = {"pad": "0", "dpi": "72"}
+        self.assertIsNone(fit_raster(graph_attr, layout))
+        self.assertIsNone(fit_raster(graph_attr, layout, max_pixels=720 * 360))
+        dpi = fit_raster(graph_attr, layout, max_pixels=720 * 360 // 4)
+        self.assertLessEqual(dpi, 36)
+        width, height = raster_size({**graph_attr, "dpi": str(dpi)}, layout)
+        self.assertLessEqual(width * height, 720 * 360 // 4)
+        # The surfaces take 4 bytes per pixel.
+        self.assertEqual(fit_raster(graph_attr, layout, max_bytes=720 * 360), dpi)
+
+    def test_max_pixels(self):
+        cache = LayoutCache(os.path.join(self.name, "cache"))
+        model = self._model()
+        cache.put(model, parse_layout(model, _json_output(model)))
+        filename = os.path.join(self.name, "diagram")
+        with self.assertRaises(ValueError):
+            Diagram(name=filename, show=False, oversize="crop")
+        with self.assertRaises(ValueError):
+            with Diagram(name=filename, show=False, layout_cache=cache, max_pixels=10000, oversize="error"):
+                with Cluster("DB"):
+                    db = RDS("rds")
+                EC2("web") >> Edge(color="red") >> db
+        setdiagram(None)
+        setcluster(None)
+        with Diagram(name=filename, show=False, layout_cache=cache, max_pixels=10000):
+            with Cluster("DB"):
+                db = RDS("rds")
+            EC2("web") >> Edge(color="red") >> db
+        self.assertTrue(os.path.exists(f"{filename}.png"))
+
+    def test_fallbacks(self):
+        model = self._model()
+        self.assertEqual([name for name, _, _ in fallbacks(model)], ["no_ortho", "reduced_mincross", "sfdp"])
+        # Dropping the orthogonal edges of a diagram without them makes it no cheaper.
+        model = model._replace(graph_attr={**model.graph_attr, "splines": "curved"})
+        self.assertEqual([name for name, _, _ in fallbacks(model)], ["reduced_mincross", "sfdp"])
+
+    def test_layout_timeout(self):
+        model = self._model()
+        layout = compute_layout(model, timeout=60)
+        self.assertIsNone(layout.fallback)
+        self.assertEqual(len(layout.nodes), 2)
+        # No layout finishes instantly, so every fallback times out.
+        with self.assertRaises(subprocess.TimeoutExpired):
+            compute_layout(model, timeout=0)
+
+    def test_cache_fallback(self):
+        cache = LayoutCache(os.path.join(self.name, "cache"))
+        model = self._model()
+        cache.put(model, parse_layout(model, _json_output(model))._replace(fallback="sfdp"))
+        self.assertEqual(cache.get(model).fallback, "sfdp")
+        filename = os.path.join(self.name, "diagram")
+        with Diagram(name=filename, show=False, layout_cache=cache, layout_timeout=60) as diagram:
+            with Cluster("DB"):
+                db = RDS("rds")
+            EC2("web") >> Edge(color="red") >> db
+        self.assertEqual(diagram.layout_fallback, "sfdp")
+        self.assertTrue(os.path.exists(f"{filename}.png"))
+
+    def _disconnected(self):
+        with Diagram(name=os.path.join(self.name, "disconnected"), show=False) as diagram:
+            with Cluster("DB"):
+                db = RDS("rds")
+                RDS("replica")
+            EC2("web") >> db
+            EC2("worker") >> SQS("queue")
+            EC2("lonely")
+            model = diagram.snapshot()
+        diagram.close()
+        return model
+
+    def test_split_components(self):
+        model = self._disconnected()
+        components = split_components(model)
+        self.assertEqual(
+            [sorted(n.label for n in c.nodes) for c in components],
+            [["rds", "replica", "web"], ["queue", "worker"], ["lonely"]],
+        )
+        self.assertEqual([len(c.clusters) for c in components], [1, 0, 0])
+        self.assertEqual([len(c.edges) for c in components], [1, 1, 0])
+        self.assertNotIn("label", components[0].graph_attr)
+
+    def test_pack_layouts(self):
+        model = self._disconnected()
+        components = split_components(model)
+        layouts = [parse_layout(c, _json_output(c)) for c in components]
+        packed = pack_layouts(model, components, layouts)
+        self.assertIsNotNone(positioned(model, packed))
+        self.assertEqual((len(packed.nodes), len(packed.clusters), len(packed.edges)), (6, 1, 2))
+        # The components of 300x200 points are stacked with a nodesep margin,
+        # and the diagram label is placed below them.
+        self.assertEqual(packed.graph["bb"], "0.00,-30.00,300.00,686.40")
+        tops = sorted({float(p["pos"].split(",")[1]) for p in packed.nodes.values()}, reverse=True)
+        self.assertEqual(tops, [20 + 2 * 243.2, 20 + 243.2, 20])
+        edge = packed.edges[_edge_key_of(model, "worker")]
+        self.assertEqual(edge["pos"].split()[0], "e,0.00,243.20")
+
+    def test_component_layout(self):
+        model = self._disconnected()
+        layout = compute_component_layout(model, max_workers=2)
+        self.assertEqual(len(layout.nodes), 6)
+        self.assertIsNotNone(positioned(model, layout))
+
+    def test_component_layout_threads(self):
+        # Worker processes would import the calling script again under the spawn start method.
+        model = self._disconnected()
+        with mock.patch("concurrent.futures.ProcessPoolExecutor", side_effect=AssertionError):
+            layout = compute_component_layout(model, max_workers=2)
+        self.assertEqual(len(layout.nodes), 6)
+
+    def _nested(self):
+        with Diagram(name=os.path.join(self.name, "nested"), show=False) as diagram:
+            with Cluster("DB", direction="TB"):
+                db = RDS("rds")
+                with Cluster("Replicas"):
+                    replica = RDS("replica")
+                db >> replica
+            EC2("web") >> db
+            model = diagram.snapshot()
+        diagram.close()
+        return model
+
+    def _cache_scopes(self, model, cache):
+        """Cache the made-up layouts of the clusters of the nested model, as compute_cluster_layout would."""
+        clusters = {c.id: c for c in model.clusters}
+        effective = model.effective_cluster_attrs()
+        db, replicas = (c.id for c in sorted(model.clusters, key=lambda c: c.label))
+        sizes = {}
+        for scope in (replicas, db, None):
+            sub, _ = _scope_model(model, scope, clusters, effective[scope], sizes)
+            cache.put(sub, parse_layout(sub, _json_output(sub)))
+            # The made-up layouts are 300x200 points, and the clusters are labelled.
+            sizes[scope] = (316, 236)
+        return clusters[db], clusters[replicas]
+
+    def test_scope_model(self):
+        model = self._nested()
+        clusters = {c.id: c for c in model.clusters}
+        db = next(c for c in model.clusters if c.label == "DB")
+        replicas = next(c for c in model.clusters if c.label == "Replicas")
+        effective = model.effective_cluster_attrs()
+        sizes = {replicas.id: (100, 50), db.id: (200, 150)}
+
+        sub, pairs = _scope_model(model, None, clusters, effective[None], sizes)
+        self.assertEqual([n.label for n in sub.nodes], ["web", ""])
+        self.assertEqual(sub.nodes[1].id, db.id)
+        self.assertEqual((sub.nodes[1].attrs["width"], sub.nodes[1].attrs["height"]), ("2.7778", "2.0833"))
+        self.assertEqual(sub.graph_attr["rankdir"], "LR")
+        self.assertNotIn("label", sub.graph_attr)
+        # The edge into the cluster connects its box only.
+        self.assertEqual([(e.head, edge) for e, edge in pairs], [(db.id, None)])
+
+        sub, pairs = _scope_model(model, db.id, clusters, effective[db.id], sizes)
+        self.assertEqual([n.id for n in sub.nodes][1:], [replicas.id])
+        self.assertEqual(sub.graph_attr["rankdir"], "TB")
+        self.assertEqual(len(pairs), 1)
+        self.assertIsNone(pairs[0][1])
+
+        sub, pairs = _scope_model(model, replicas.id, clusters, effective[replicas.id], sizes)
+        self.assertEqual([n.label for n in sub.nodes], ["replica"])
+        # The clusters without a direction of their own inherit the one of their parent.
+        self.assertEqual(sub.graph_attr["rankdir"], "TB")
+        self.assertEqual(pairs, [])
+
+    def test_scope_model_inherited_direction(self):
+        with Diagram(name=os.path.join(self.name, "inherited"), show=False, direction="TB") as diagram:
+            with Cluster("Web"):
+                with Cluster("App"):
+                    EC2("app")
+                EC2("web")
+            model = diagram.snapshot()
+        diagram.close()
+        clusters = {c.id: c for c in model.clusters}
+        effective = model.effective_cluster_attrs()
+        web, app = (c.id for c in sorted(model.clusters, key=lambda c: c.label, reverse=True))
+        self.assertNotIn("rankdir", clusters[web].attrs)
+        # The clusters of the default direction are laid out top to bottom like the diagram.
+        sizes = {app: (100, 50)}
+        for scope in (app, web):
+            sub, _ = _scope_model(model, scope, clusters, effective[scope], sizes)
+            self.assertEqual(sub.graph_attr["rankdir"], "TB")
+
+    def test_cluster_layout(self):
+        model = self._nested()
+        cache = LayoutCache(os.path.join(self.name, "cache"))
+        db, replicas = self._cache_scopes(model, cache)
+        # All the clusters are cached, so none is laid out.
+        layout = compute_cluster_layout(model, cache=cache)
+        self.assertIsNotNone(positioned(model, layout))
+        keys = _Keys(model, "structure")
+        # The DB box is placed at 10,20 of the top layout, and is 316x236 points.
+        self.assertEqual(layout.clusters[keys.cluster(db)]["bb"], "-148.00,-98.00,168.00,138.00")
+        # The content of DB is centered below its label.
+        rds = next(n for n in model.nodes if n.label == "rds")
+        self.assertEqual(layout.nodes[keys.node(rds)]["pos"], "-140.00,-70.00")
+        self.assertEqual(layout.clusters[keys.cluster(replicas)]["bb"], "-288.00,-188.00,28.00,48.00")
+        # The edges crossing the clusters are left to be routed when rendering.
+        self.assertEqual(layout.edges, {})
+        self.assertEqual(layout.graph["bb"], "0.00,-30.00,300.00,200.00")
+
+    def test_scope_model_source(self):
+        model = self._nested()
+        clusters = {c.id: c for c in model.clusters}
+        effective = model.effective_cluster_attrs()
+        sizes = {c.id: (100, 50) for c in model.clusters}
+        for scope in (None, *clusters):
+            sub, _ = _scope_model(model, scope, clusters, effective[scope], sizes)
+            # The boxes of the child clusters can be drawn by graphviz.
+            source = sub.source
+            for node in sub.nodes:
+                self.assertIn(node.id, source)
+
+    def test_cluster_layout_uncached(self):
+        model = self._nested()
+        layout = compute_cluster_layout(model)
+        self.assertIsNotNone(positioned(model, layout))
+        filename = os.path.join(self.name, "uncached")
+        with Diagram(name=filename, show=False, cluster_layout=True):
+            with Cluster("DB", direction="TB"):
+                db = RDS("rds")
+                with Cluster("Replicas"):
+                    replica = RDS("replica")
+                db >> replica
+            EC2("web") >> db
+        self.assertTrue(os.path.exists(f"{filename}.png"))
+
+    def test_cluster_layout_outformat(self):
+        model = self._nested()
+        cache = LayoutCache(os.path.join(self.name, "cache"))
+        self._cache_scopes(model, cache)
+        filename = os.path.join(self.name, "nested")
+        with Diagram(name=filename, show=False, layout_cache=cache, cluster_layout=True):
+            with Cluster("DB", direction="TB"):
+                db = RDS("rds")
+                with Cluster("Replicas"):
+                    replica = RDS("replica")
+                db >> replica
+            EC2("web") >> db
+        self.assertTrue(os.path.exists(f"{filename}.png"))
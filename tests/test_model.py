@@ -0,0 +1,89 @@
+import os
+import pickle
+import shutil
+import unittest
+from unittest import mock
+
+from diagrams import Cluster, Diagram, Edge, Node, setcluster, setdiagram
+from diagrams.aws.compute import EC2
+from diagrams.model import DiagramModel, class_path, render_all
+
+
+class ModelTest(unittest.TestCase):
+    def setUp(self):
+        self.name = "model_test"
+
+    def tearDown(self):
+        setdiagram(None)
+        setcluster(None)
+        try:
+            shutil.rmtree(self.name)
+        except OSError:
+            pass
+
+    def test_class_path(self):
+        self.assertEqual(class_path(EC2), "aws.compute.EC2")
+        self.assertEqual(class_path(Node), "Node")
+        self.assertEqual(class_path(Cluster), "Cluster")
+
+    def test_snapshot(self):
+        with Diagram(name=os.path.join(self.name, "snapshot"), show=False) as d:
+            node1 = EC2("node1")
+            with Cluster("cluster") as c:
+                node2 = Node("node2")
+            node1 >> Edge(color="red") >> node2
+        model = d.snapshot()
+        self.assertIsInstance(model, DiagramModel)
+        self.assertEqual([n.id for n in model.nodes], [node1.nodeid, node2.nodeid])
+        self.assertEqual(model.nodes[0].icon, "aws/compute/ec2.png")
+        self.assertEqual(model.nodes[1].cluster, c.dot.name)
+        self.assertEqual(model.clusters[0].label, "cluster")
+        self.assertEqual(model.edges[0].attrs, {"color": "red", "dir": "forward"})
+        self.assertNotIn("imagepath", model.graph_attr)
+
+    def test_snapshot_node_as_cluster(self):
+        with Diagram(name=os.path.join(self.name, "snapshot_node_as_cluster"), show=False) as d:
+            with EC2("node1"):
+                Node("node2")
+        model = d.snapshot()
+        self.assertEqual([n.label for n in model.nodes], ["node2"])
+        self.assertEqual(model.clusters[0].cls, "aws.compute.EC2")
+
+    def test_snapshot_tags(self):
+        with Diagram(name=os.path.join(self.name, "snapshot_tags"), show=False) as d:
+            EC2("node1", tags=["web", "edge"], metadata={"account": "prod"})
+        node = d.snapshot().nodes[0]
+        self.assertEqual(node.tags, ("web", "edge"))
+        self.assertEqual(node.metadata, {"account": "prod"})
+        self.assertNotIn("tags", node.attrs)
+
+    def test_pickle(self):
+        with Diagram(name=os.path.join(self.name, "pickle"), show=False) as d:
+            with Cluster("cluster"):
+                EC2("node1") >> EC2("node2")
+        model = d.snapshot()
+        self.assertEqual(pickle.loads(pickle.dumps(model)), model)
+
+    def test_to_dot(self):
+        with Diagram(name=os.path.join(self.name, "to_dot"), show=False) as d:
+            with Cluster("cluster") as c:
+                node1 = EC2("node1")
+            node2 = EC2("node2")
+            node1 >> node2
+        source = d.snapshot().source
+        self.assertIn(f"subgraph {c.dot.name}", source)
+        self.assertIn(f"{node1.nodeid} -> {node2.nodeid}", source.replace('"', ""))
+        self.assertIn("imagepath=", source)
+
+    def test_render_all(self):
+        models = []
+        for name in ("first", "second"):
+            with Diagram(name=os.path.join(self.name, name), show=False) as d:
+                EC2("web") >> EC2("db")
+            models.append(d.snapshot())
+        # Worker processes would import the calling script again under the spawn start method.
+        with mock.patch("concurrent.futures.ProcessPoolExecutor", side_effect=AssertionError):
+            paths = render_all(models, max_workers=2)
+        expected = [os.path.abspath(os.path.join(self.name, f"{name}.png")) for name in ("first", "second")]
+        self.assertEqual(paths, expected)
+        self.assertTrue(all(os.path.exists(path) for path in paths))
@@ -0,0 +1,153 @@
+import os
+import re
+import shutil
+import struct
+import unittest
+import zlib
+
+from diagrams import Cluster, Diagram, setcluster, setdiagram
+from diagrams.aws.compute import EC2
+from diagrams.aws.database import RDS
+from diagrams.colors import rgb
+from diagrams.layout import parse_layout
+from diagrams.pdf import decode_icon, write_pdf
+from diagrams.utils import resource_dir
+from tests.test_layout import _json_output
+
+
+def _png(header, *rows, chunks=None):
+    """Return a png of the given IHDR fields and unfiltered rows, or of the given chunks."""
+    if chunks is None:
+        ihdr = struct.pack(">IIBBBBB", *header, 0, 0, 0)
+        chunks = [(b"IHDR", ihdr), (b"IDAT", zlib.compress(b"".join(b"\0" + row for row in rows))), (b"IEND", b"")]
+    data = b"".join(struct.pack(">I4s", len(body), kind) + body + struct.pack(">I", 0) for kind, body in chunks)
+    return b"\x89PNG\r\n\x1a\n" + data
+
+
+class PdfTest(unittest.TestCase):
+    def setUp(self):
+        self.name = "pdf_test"
+
+    def tearDown(self):
+        setdiagram(None)
+        setcluster(None)
+        try:
+            shutil.rmtree(self.name)
+        except OSError:
+            pass
+
+    def _model(self, name, database=RDS):
+        with Diagram(name=os.path.join(self.name, name), show=False) as diagram:
+            with Cluster("DB"):
+                db = database("db")
+            EC2("web") >> db
+            EC2("worker") >> db
+            model = diagram.snapshot()
+        diagram.close()
+        return model
+
+    def test_cluster_icons(self):
+        with Diagram(name=os.path.join(self.name, "icons"), show=False) as diagram:
+            with EC2("group"):
+                RDS("rds")
+            model = diagram.snapshot()
+        diagram.close()
+        path = write_pdf([model], os.path.join(self.name, "icons.pdf"), [parse_layout(model, _json_output(model))])
+        with open(path, "rb") as f:
+            pdf = f.read()
+        streams = re.findall(rb"/Filter /FlateDecode /Length \d+ >>\nstream\n(.*?)\nendstream", pdf, re.DOTALL)
+        content = zlib.decompress(streams[-1]).decode("latin-1")
+        # The icons of the cluster and of its node are drawn.
+        self.assertEqual(len(re.findall(r"/Im\d+ Do", content)), 2)
+
+    def test_colors(self):
+        self.assertEqual(rgb("firebrick"), (178 / 255, 34 / 255, 34 / 255))
+        self.assertEqual(rgb("Light Blue"), rgb("lightblue"))
+        self.assertEqual(rgb("/x11/gray50"), (127 / 255,) * 3)
+        self.assertEqual(rgb("#f00"), (1, 0, 0))
+        self.assertEqual(rgb("#f00c"), (1, 0, 0))
+        self.assertEqual(rgb("#ff000080:blue"), (1, 0, 0))
+        self.assertEqual(rgb("0.000 1.000 1.000"), (1, 0, 0))
+        for transparent in ("transparent", "none", "#ff000000", "#f000"):
+            self.assertIsNone(rgb(transparent))
+        with self.assertRaises(ValueError):
+            rgb("nocolor")
+        with self.assertRaises(ValueError):
+            rgb("#ff0000f")
+
+        with Diagram(name=os.path.join(self.name, "colors"), show=False, edge_attr={"color": "firebrick"}) as diagram:
+            EC2("web") >> EC2("app")
+            model = diagram.snapshot()
+        diagram.close()
+        path = write_pdf([model], os.path.join(self.name, "colors.pdf"), [parse_layout(model, _json_output(model))])
+        with open(path, "rb") as f:
+            pdf = f.read()
+        streams = re.findall(rb"/Filter /FlateDecode /Length \d+ >>\nstream\n(.*?)\nendstream", pdf, re.DOTALL)
+        self.assertIn("0.7 0.13 0.13 RG", zlib.decompress(streams[-1]).decode("latin-1"))
+
+    def test_decode_icon(self):
+        image = decode_icon(os.path.join(resource_dir(), "aws", "compute", "ec2.png"))
+        self.assertEqual(image.color_space, "/DeviceRGB")
+        self.assertEqual(len(zlib.decompress(image.data)), image.width * image.height * 3)
+        self.assertEqual(len(zlib.decompress(image.smask)), image.width * image.height)
+        # The icons are decoded once for the whole process.
+        self.assertIs(decode_icon(os.path.join(resource_dir(), "aws", "compute", "ec2.png")), image)
+        self.assertIsNone(decode_icon(os.path.join(resource_dir(), "missing.png")))
+
+    def _decode(self, name, data):
+        os.makedirs(self.name, exist_ok=True)
+        path = os.path.join(self.name, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return decode_icon(path)
+
+    def test_decode_icon_16_bits(self):
+        # The samples are reduced to their high bytes, as pdf 1.4 has no 16 bit images.
+        gray = self._decode("gray16.png", _png((2, 1, 16, 0), b"\x12\x34\xab\xcd"))
+        self.assertEqual((gray.color_space, gray.bits, gray.decode_parms), ("/DeviceGray", 8, None))
+        self.assertEqual(zlib.decompress(gray.data), b"\x12\xab")
+        color = self._decode("rgb16.png", _png((1, 1, 16, 2), b"\x01\x02\x03\x04\x05\x06"))
+        self.assertEqual((color.color_space, color.bits), ("/DeviceRGB", 8))
+        self.assertEqual(zlib.decompress(color.data), b"\x01\x03\x05")
+        alpha = self._decode("rgba16.png", _png((1, 1, 16, 6), b"\x01\x02\x03\x04\x05\x06\x07\x08"))
+        self.assertEqual(zlib.decompress(alpha.data), b"\x01\x03\x05")
+        self.assertEqual(zlib.decompress(alpha.smask), b"\x07")
+
+    def test_decode_icon_malformed(self):
+        valid = _png((1, 1, 16, 0), b"\x00\x00")
+        ihdr = struct.pack(">IIBBBBB", 1, 1, 16, 0, 0, 0, 0)
+        malformed = {
+            "no_header.png": _png(None, chunks=[(b"IDAT", zlib.compress(b"\0\0\0")), (b"IEND", b"")]),
+            "short_header.png": _png(None, chunks=[(b"IHDR", ihdr[:8]), (b"IEND", b"")]),
+            "no_data.png": _png(None, chunks=[(b"IHDR", ihdr), (b"IEND", b"")]),
+            "bad_bits.png": _png((1, 1, 16, 3), b"\x00"),
+            "bad_color_type.png": _png((1, 1, 8, 5), b"\x00"),
+            "truncated.png": valid[:-20],
+            "corrupt.png": _png(None, chunks=[(b"IHDR", ihdr), (b"IDAT", b"corrupt"), (b"IEND", b"")]),
+            "short_data.png": _png((2, 2, 16, 0), b"\x00\x00"),
+        }
+        for name, data in malformed.items():
+            with self.subTest(name):
+                with self.assertRaises(ValueError):
+                    self._decode(name, data)
+        self.assertIsNotNone(self._decode("valid.png", valid))
+
+    def test_write_pdf(self):
+        models = [self._model("first"), self._model("second"), self._model("third", database=EC2)]
+        layouts = [parse_layout(model, _json_output(model)) for model in models]
+        path = write_pdf(models, os.path.join(self.name, "book.pdf"), layouts)
+        with open(path, "rb") as f:
+            pdf = f.read()
+        self.assertTrue(pdf.startswith(b"%PDF-1.4"))
+        self.assertTrue(pdf.rstrip().endswith(b"%%EOF"))
+        self.assertEqual(len(re.findall(rb"/Type /Page /Parent", pdf)), 3)
+        # The two distinct icons are embedded once, with their transparency masks.
+        self.assertEqual(len(re.findall(rb"/Subtype /Image", pdf)), 4)
+        self.assertEqual(len(re.findall(rb"/Resources \d+ 0 R", pdf)), 3)
+        self.assertEqual(len(set(re.findall(rb"/Resources (\d+) 0 R", pdf))), 1)
+        # The xref table points at the objects.
+        xref = int(re.search(rb"startxref\n(\d+)", pdf).group(1))
+        self.assertTrue(pdf[xref:].startswith(b"xref"))
+        offsets = [int(offset) for offset in re.findall(rb"(\d{10}) 00000 n", pdf)]
+        for number, offset in enumerate(offsets, 1):
+            self.assertTrue(pdf[offset:].startswith(f"{number} 0 obj".encode()))
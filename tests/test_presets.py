@@ -0,0 +1,99 @@
+import os
+import shutil
+import unittest
+from unittest import mock
+
+from diagrams import Cluster, Diagram, Node, setcluster, setdiagram
+from diagrams.aws.compute import EC2
+from diagrams.presets import PRESETS, PREVIEW_ENV, apply_preset, auto_preset, preset_attrs, preview
+
+
+class PresetsTest(unittest.TestCase):
+    def setUp(self):
+        self.name = "presets_test"
+
+    def tearDown(self):
+        setdiagram(None)
+        setcluster(None)
+        try:
+            shutil.rmtree(self.name)
+        except OSError:
+            pass
+
+    def test_auto_preset(self):
+        self.assertEqual(auto_preset(10, 10), "quality")
+        self.assertEqual(auto_preset(200, 250), "balanced")
+        self.assertEqual(auto_preset(200, 160), "quality")
+        self.assertEqual(auto_preset(200, 160, clusters=10), "balanced")
+        self.assertEqual(auto_preset(1000, 2000), "fast")
+
+    def test_preset_attrs(self):
+        self.assertEqual(preset_attrs("fast"), PRESETS["fast"])
+        self.assertEqual(preset_attrs("auto", 1000, 2000)["splines"], "line")
+        with self.assertRaises(ValueError):
+            preset_attrs("slow")
+
+    def test_apply_preset(self):
+        with Diagram(name=os.path.join(self.name, "model"), show=False) as diagram:
+            EC2("web") >> EC2("app")
+            model = diagram.snapshot()
+        diagram.close()
+        model = apply_preset(model, "balanced")
+        self.assertEqual(model.graph_attr["splines"], "spline")
+        self.assertEqual(model.graph_attr["searchsize"], "20")
+
+    def test_diagram_preset(self):
+        with self.assertRaises(ValueError):
+            Diagram(show=False, preset="slow")
+        with Diagram(name=os.path.join(self.name, "fast"), show=False, preset="fast") as diagram:
+            EC2("web") >> EC2("app")
+        self.assertEqual(diagram.dot.graph_attr["splines"], "line")
+        self.assertEqual(diagram.dot.graph_attr["mclimit"], "0.1")
+
+        # The explicit attributes are kept.
+        filename = os.path.join(self.name, "explicit")
+        graph_attr = {"mclimit": "2.0"}
+        with Diagram(name=filename, show=False, preset="fast", curvestyle="curved", graph_attr=graph_attr) as diagram:
+            EC2("web")
+        self.assertEqual(diagram.dot.graph_attr["splines"], "curved")
+        self.assertEqual(diagram.dot.graph_attr["mclimit"], "2.0")
+
+        with Diagram(name=os.path.join(self.name, "auto"), show=False, preset="auto") as diagram:
+            with Cluster("web"):
+                web = [EC2(f"web{i}") for i in range(150)]
+            for node in web:
+                node >> EC2("db")
+            model = diagram.snapshot()
+        self.assertEqual(model.graph_attr["splines"], "spline")
+
+    def test_preview(self):
+        with Diagram(name=os.path.join(self.name, "model"), show=False) as diagram:
+            with EC2("group"):
+                EC2("web") >> Node("plain", shape="ellipse")
+            model = diagram.snapshot()
+        diagram.close()
+        model = preview(model)
+        self.assertEqual(model.graph_attr["splines"], "line")
+        self.assertEqual(model.graph_attr["dpi"], "48")
+        web, plain = model.nodes
+        self.assertNotIn("image", web.attrs)
+        self.assertEqual(web.attrs["shape"], "box")
+        self.assertEqual(plain.attrs["shape"], "ellipse")
+        self.assertEqual(model.clusters[0].attrs["label"], "group")
+        self.assertNotIn(" image=", model.source)
+        self.assertNotIn("<IMG", model.source)
+
+    def test_diagram_preview(self):
+        filename = os.path.join(self.name, "preview")
+        with Diagram(name=filename, show=False, preview=True) as diagram:
+            EC2("web") >> EC2("app")
+        self.assertTrue(os.path.exists(f"{filename}.png"))
+        # The diagram itself keeps the full quality.
+        self.assertEqual(diagram.dot.graph_attr["splines"], "ortho")
+
+        with mock.patch.dict(os.environ, {PREVIEW_ENV: "1"}):
+            self.assertTrue(Diagram(show=False).preview)
+            self.assertFalse(Diagram(show=False, preview=False).preview)
+        with mock.patch.dict(os.environ):
+            os.environ.pop(PREVIEW_ENV, None)
+            self.assertFalse(Diagram(show=False).preview)
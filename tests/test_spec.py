@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from diagrams import Cluster, Diagram, Edge, Node, setcluster, setdiagram
+from diagrams.aws.compute import EC2
+from diagrams.spec import build, dump, export, load, resolve_class
+
+
+class SpecTest(unittest.TestCase):
+    def setUp(self):
+        self.name = "spec_test"
+        self.spec = {
+            "name": "Spec",
+            "direction": "TB",
+            "clusters": [
+                {"id": "web", "label": "Web"},
+                {"id": "app", "label": "App", "class": "aws.compute.EC2", "parent": "web"},
+            ],
+            "nodes": [
+                {"id": "lb", "class": "aws.network.ELB", "label": "lb"},
+                {"id": "web1", "class": "aws.compute.EC2", "label": "web1", "cluster": "web"},
+                {"id": "app1", "label": "app1", "cluster": "app", "attrs": {"color": "red"}},
+            ],
+            "edges": [
+                {"tail": "lb", "head": "web1", "forward": True, "label": "http"},
+                {"tail": "lb", "head": "app"},
+            ],
+        }
+
+    def tearDown(self):
+        setdiagram(None)
+        setcluster(None)
+        try:
+            shutil.rmtree(self.name)
+        except OSError:
+            pass
+
+    def test_resolve_class(self):
+        self.assertEqual(resolve_class("aws.compute.EC2"), EC2)
+        self.assertEqual(resolve_class("Node"), Node)
+        self.assertEqual(resolve_class("diagrams.aws.compute.EC2"), EC2)
+        with self.assertRaises(ValueError):
+            resolve_class("aws.compute.Unknown")
+
+    def test_build(self):
+        model = build(self.spec)
+        self.assertEqual(model.graph_attr["rankdir"], "TB")
+        self.assertEqual([n.id for n in model.nodes], ["lb", "web1", "app1"])
+        self.assertEqual(model.nodes[1].icon, "aws/compute/ec2.png")
+        self.assertEqual(model.nodes[1].cluster, "cluster_web")
+        self.assertEqual(model.nodes[2].attrs["color"], "red")
+        self.assertEqual([c.id for c in model.clusters], ["cluster_web", "cluster_app"])
+        self.assertEqual(model.clusters[1].parent, "cluster_web")
+        self.assertIn("<IMG", model.clusters[1].attrs["label"])
+        self.assertEqual(model.edges[0].attrs, {"label": "http", "dir": "forward"})
+        # An edge to a cluster is clipped at the cluster boundary.
+        self.assertEqual(model.edges[1].head, "app1")
+        self.assertEqual(model.edges[1].attrs["lhead"], "cluster_app")
+
+    def test_build_invalid(self):
+        with self.assertRaises(ValueError):
+            build({"nodes": [{"id": "a", "cluster": "unknown"}]})
+        with self.assertRaises(ValueError):
+            build({"nodes": [{"id": "a", "class": "Cluster"}]})
+
+    def test_build_invalid_ids(self):
+        for spec, bad in (
+            ({"nodes": [{"id": "a"}], "edges": [{"tail": "a", "head": "b"}]}, "b"),
+            ({"nodes": [{"id": "a"}], "edges": [{"tail": "c", "head": "a"}]}, "c"),
+            ({"nodes": [{"id": "a"}, {"id": "a", "label": "other"}]}, "a"),
+            ({"clusters": [{"id": "web"}, {"id": "web"}]}, "web"),
+            ({"clusters": [{"id": "web"}], "nodes": [{"id": "web", "cluster": "web"}]}, "web"),
+        ):
+            with self.assertRaises(ValueError) as cm:
+                build(spec)
+            self.assertIn(f'"{bad}"', str(cm.exception))
+
+    def test_export(self):
+        with Diagram(name=os.path.join(self.name, "export"), show=False) as d:
+            node1 = EC2("node1")
+            with Cluster("cluster", graph_attr={"bgcolor": "red"}):
+                node2 = Node("node2", color="blue")
+            node1 >> Edge(color="red") >> node2
+        spec = export(d)
+        self.assertEqual(spec["nodes"][0], {"id": node1.nodeid, "class": "aws.compute.EC2", "label": "node1"})
+        self.assertEqual(spec["nodes"][1]["attrs"], {"color": "blue"})
+        self.assertEqual(spec["clusters"][0]["attrs"], {"bgcolor": "red"})
+        self.assertEqual(spec["edges"][0]["attrs"], {"color": "red"})
+        self.assertEqual(build(spec), d.snapshot())
+
+    def test_export_options(self):
+        model = build({**self.spec, "curvestyle": "curved"})
+        spec = export(model)
+        self.assertEqual((spec["direction"], spec["curvestyle"]), ("TB", "curved"))
+        # The values the diagram options don't take are exported as the graph attributes.
+        spec = export(model._replace(graph_attr={**model.graph_attr, "splines": "polyline"}))
+        self.assertNotIn("curvestyle", spec)
+        self.assertEqual(spec["graph_attr"]["splines"], "polyline")
+
+    def test_dump_and_load(self):
+        model = build(self.spec)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for ext in ("json", "yaml"):
+                path = os.path.join(tmpdir, f"spec.{ext}")
+                dump(model, path)
+                self.assertEqual(load(path), model)
@@ -0,0 +1,157 @@
+import os
+import re
+import shutil
+import tempfile
+import unittest
+from xml.etree import ElementTree
+
+from diagrams import Cluster, Diagram, Edge, setcluster, setdiagram
+from diagrams.aws.compute import EC2
+from diagrams.aws.database import RDS
+from diagrams.layout import parse_layout
+from diagrams.svg import absolute_icons, embed_icons, encode_icon, write_svg
+from diagrams.utils import resource_dir
+from tests.test_layout import _json_output
+
+_SVG = """<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<svg width="300pt" height="200pt" viewBox="0.00 0.00 300.00 200.00"
+ xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">
+<g id="graph0" class="graph">
+<g id="node1" class="node">
+<image xlink:href="aws/compute/ec2.png" width="101px" height="101px" preserveAspectRatio="xMinYMin meet" x="10" y="10"/>
+</g>
+<g id="node2" class="node">
+<image xlink:href="aws/compute/ec2.png" width="101px" height="101px" preserveAspectRatio="xMinYMin meet" x="120" y="10"/>
+</g>
+<g id="node3" class="node">
+<image xlink:href="{rds}" width="101px" height="101px" preserveAspectRatio="xMinYMin meet" x="10" y="120"/>
+</g>
+<g id="node4" class="node">
+<image xlink:href="missing.png" width="101px" height="101px" x="120" y="120"/>
+</g>
+</g>
+</svg>
+"""
+
+
+class SvgTest(unittest.TestCase):
+    def test_encode_icon(self):
+        path = os.path.join(resource_dir(), "aws", "compute", "ec2.png")
+        icon = encode_icon(path)
+        self.assertTrue(icon.data_uri.startswith("data:image/png;base64,"))
+        self.assertGreater(icon.width, 0)
+        self.assertGreater(icon.height, 0)
+        # The icons are encoded once for the whole process.
+        self.assertIs(encode_icon(path), icon)
+
+    def test_embed_icons(self):
+        rds = os.path.join(resource_dir(), "aws", "database", "rds.png")
+        svg = embed_icons(_SVG.replace("{rds}", rds))
+        # Each distinct icon is embedded once and reused by the nodes.
+        self.assertEqual(svg.count("<symbol "), 2)
+        self.assertEqual(svg.count("data:image/png;base64,"), 2)
+        self.assertEqual(svg.count('<use xlink:href="#icon0"'), 2)
+        self.assertEqual(svg.count('<use xlink:href="#icon1"'), 1)
+        self.assertNotIn("aws/compute/ec2.png", svg)
+        self.assertNotIn(rds, svg)
+        self.assertIn('x="120" y="10"', svg)
+        self.assertIn('preserveAspectRatio="xMinYMin meet"', svg)
+        self.assertLess(svg.index("<defs>"), svg.index('<g id="graph0"'))
+        # The icons which can't be found are left as they are.
+        self.assertIn('<image xlink:href="missing.png"', svg)
+
+    def test_absolute_icons(self):
+        rds = os.path.join(resource_dir(), "aws", "database", "rds.png")
+        svg = absolute_icons(_SVG.replace("{rds}", rds))
+        ec2 = os.path.join(resource_dir(), "aws", "compute", "ec2.png")
+        self.assertEqual(svg.count(f'<image xlink:href="{ec2}"'), 2)
+        self.assertIn(f'<image xlink:href="{rds}"', svg)
+        # The icons which can't be found are left as they are.
+        self.assertIn('<image xlink:href="missing.png"', svg)
+
+    def test_embed_icons_without_images(self):
+        svg = _SVG.split('<g id="node1"')[0] + "</g>\n</svg>\n"
+        self.assertEqual(embed_icons(svg), svg)
+
+
+class WriteSvgTest(unittest.TestCase):
+    def setUp(self):
+        self.name = "svg_test"
+
+    def tearDown(self):
+        setdiagram(None)
+        setcluster(None)
+        try:
+            shutil.rmtree(self.name)
+        except OSError:
+            pass
+
+    def _model(self):
+        with Diagram(name=os.path.join(self.name, "write_svg"), show=False) as diagram:
+            with Cluster("DB"):
+                db = RDS("rds")
+            EC2("web") >> Edge(label="query", style="dashed") >> db
+            EC2("worker") >> db
+            model = diagram.snapshot()
+        diagram.close()
+        return model
+
+    def test_write_svg(self):
+        model = self._model()
+        layout = parse_layout(model, _json_output(model))
+        svg = write_svg(model, layout)
+        root = ElementTree.fromstring(svg)
+        ns = {"svg": "http://www.w3.org/2000/svg"}
+        # The two EC2 nodes share one embedded icon.
+        self.assertEqual(len(root.findall("svg:defs/svg:symbol", ns)), 2)
+        self.assertEqual(len(root.findall(".//svg:use", ns)), 3)
+        texts = ["".join(t.itertext()) for t in root.iter("{http://www.w3.org/2000/svg}text")]
+        self.assertEqual(sorted(texts), sorted(["DB", "rds", "web", "worker", model.name]))
+        # The cluster is filled with the background color of its depth.
+        rects = root.findall("svg:g/svg:rect", ns)
+        self.assertEqual(rects[0].get("fill"), Diagram(show=False).bgcolors[1 % 4])
+        paths = root.findall("svg:g/svg:path", ns)
+        self.assertEqual(len(paths), 2)
+        self.assertEqual(paths[0].get("stroke-dasharray"), "5,2")
+        self.assertEqual(len(root.findall("svg:g/svg:polygon", ns)), 2)
+
+    def test_write_svg_referring_icons(self):
+        model = self._model()
+        svg = write_svg(model, parse_layout(model, _json_output(model)), embed_icons=False)
+        self.assertNotIn("data:image", svg)
+        self.assertIn(os.path.join(resource_dir(), "aws", "compute", "ec2.png"), svg)
+
+    def test_write_svg_cluster_icons(self):
+        with Diagram(name=os.path.join(self.name, "cluster_icons"), show=False) as diagram:
+            with EC2("group"):
+                RDS("rds")
+            model = diagram.snapshot()
+        diagram.close()
+        svg = write_svg(model, parse_layout(model, _json_output(model)), embed_icons=False)
+        root = ElementTree.fromstring(svg)
+        images = root.findall(".//{http://www.w3.org/2000/svg}image")
+        # The cluster icon is drawn left of its label.
+        hrefs = [image.get("{http://www.w3.org/1999/xlink}href") for image in images]
+        self.assertEqual(hrefs[0], os.path.join(resource_dir(), "aws", "compute", "ec2.png"))
+        text = next(t for t in root.iter("{http://www.w3.org/2000/svg}text") if "".join(t.itertext()) == "group")
+        self.assertEqual(text.get("text-anchor"), "start")
+        icon_right = float(images[0].get("x")) + float(images[0].get("width"))
+        self.assertLess(icon_right, float(text.find("{http://www.w3.org/2000/svg}tspan").get("x")))
+
+    def test_diagram_svg_icons(self):
+        filename = os.path.abspath(os.path.join(self.name, "icons"))
+        with Diagram(name=filename, show=False, outformat="svg"):
+            with EC2("group"):
+                EC2("web")
+        with open(f"{filename}.svg", encoding="utf-8") as f:
+            hrefs = re.findall(r'<image\b[^>]*xlink:href="([^"]*)"', f.read())
+        self.assertEqual(len(hrefs), 2)
+        # The icons resolve wherever the svg is opened from.
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.chdir(tmpdir)
+            try:
+                for href in hrefs:
+                    self.assertTrue(os.path.exists(href), href)
+            finally:
+                os.chdir(cwd)
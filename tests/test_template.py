@@ -0,0 +1,66 @@
+import unittest
+
+from diagrams.spec import build
+from diagrams.template import ClusterTemplate
+
+
+class ClusterTemplateTest(unittest.TestCase):
+    def setUp(self):
+        self.template = ClusterTemplate(
+            {
+                "label": "Web",
+                "clusters": [{"id": "app", "label": "App"}],
+                "nodes": [
+                    {"id": "lb", "class": "aws.network.ELB", "label": "lb"},
+                    {"id": "web1", "class": "aws.compute.EC2", "label": "web1", "cluster": "app"},
+                ],
+                "edges": [{"tail": "lb", "head": "app", "forward": True}],
+            }
+        )
+        self.model = build({"name": "Global", "clusters": [{"id": "eu", "label": "EU"}]})
+
+    def test_instantiate(self):
+        instance = self.template.instantiate(self.model, "us")
+        self.assertEqual([c.id for c in instance.clusters], ["cluster_us", "cluster_us.app"])
+        self.assertEqual([c.parent for c in instance.clusters], [None, "cluster_us"])
+        self.assertEqual([n.id for n in instance.nodes], ["us.lb", "us.web1"])
+        self.assertEqual([n.cluster for n in instance.nodes], ["cluster_us", "cluster_us.app"])
+        self.assertEqual((instance.edges[0].tail, instance.edges[0].head), ("us.lb", "us.web1"))
+        self.assertEqual(instance.edges[0].attrs["lhead"], "cluster_us.app")
+
+    def test_instantiate_with_labels(self):
+        instance = self.template.instantiate(self.model, "us", label="Web (us)", labels={"web1": "web\nus"})
+        self.assertEqual(instance.clusters[0].label, "Web (us)")
+        self.assertEqual(instance.clusters[0].attrs["label"], "Web (us)")
+        self.assertEqual(instance.nodes[1].label, "web\nus")
+        self.assertEqual(instance.nodes[1].attrs["height"], "2.3")
+
+    def test_instantiate_in_cluster(self):
+        top = self.template.instantiate(self.model, "us")
+        nested = self.template.instantiate(self.model, "eu1", parent="cluster_eu")
+        self.assertEqual(nested.clusters[0].parent, "cluster_eu")
+        self.assertNotEqual(nested.clusters[0].attrs["bgcolor"], top.clusters[0].attrs["bgcolor"])
+        with self.assertRaises(ValueError):
+            self.template.instantiate(self.model, "unknown", parent="cluster_unknown")
+
+    def test_instances_share_structure(self):
+        instance1 = self.template.instantiate(self.model, "us")
+        instance2 = self.template.instantiate(self.model, "ap")
+        self.assertEqual(instance1.nodes[0].attrs, instance2.nodes[0].attrs)
+        model = self.model.extend(instance1, instance2)
+        self.assertEqual(len(model.nodes), 4)
+        self.assertEqual(len(model.clusters), 5)
+        self.assertEqual(len(model.edges), 2)
+
+    def test_instances_own_attrs(self):
+        instance1 = self.template.instantiate(self.model, "us")
+        instance2 = self.template.instantiate(self.model, "ap")
+        instance1.nodes[0].attrs["color"] = "red"
+        instance1.clusters[0].attrs["bgcolor"] = "red"
+        instance1.edges[0].attrs["color"] = "red"
+        self.assertNotIn("color", instance2.nodes[0].attrs)
+        self.assertNotEqual(instance2.clusters[0].attrs["bgcolor"], "red")
+        self.assertNotIn("color", instance2.edges[0].attrs)
+        # The compiled template isn't changed either.
+        instance3 = self.template.instantiate(self.model, "eu2")
+        self.assertNotIn("color", instance3.nodes[0].attrs)
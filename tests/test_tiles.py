@@ -0,0 +1,71 @@
+import json
+import os
+import shutil
+import unittest
+
+from diagrams import Cluster, Diagram, setcluster, setdiagram
+from diagrams.aws.compute import EC2
+from diagrams.aws.database import RDS
+from diagrams.layout import LayoutCache, parse_layout
+from diagrams.tiles import render_tiles, tile_levels
+from tests.test_layout import _json_output
+
+
+class TilesTest(unittest.TestCase):
+    def setUp(self):
+        self.name = "tiles_test"
+
+    def tearDown(self):
+        setdiagram(None)
+        setcluster(None)
+        try:
+            shutil.rmtree(self.name)
+        except OSError:
+            pass
+
+    def _model(self, name="diagram"):
+        with Diagram(name=os.path.join(self.name, name), show=False) as diagram:
+            with Cluster("DB"):
+                db = RDS("rds")
+            EC2("web") >> db
+            model = diagram.snapshot()
+        diagram.close()
+        return model
+
+    def test_tile_levels(self):
+        levels = tile_levels(1000, 300, tile_size=256)
+        self.assertEqual([level["scale"] for level in levels], [0.25, 0.5, 1.0])
+        self.assertEqual([(level["columns"], level["rows"]) for level in levels], [(1, 1), (2, 1), (4, 2)])
+        self.assertEqual((levels[-1]["width"], levels[-1]["height"]), (1000, 300))
+        # A small drawing fits into a single level.
+        self.assertEqual(len(tile_levels(100, 50, tile_size=256)), 1)
+        self.assertEqual(tile_levels(1000, 300, tile_size=256, max_zoom=2)[-1]["width"], 2000)
+
+    def test_render_tiles(self):
+        model = self._model()
+        layout = parse_layout(model, _json_output(model))
+        directory = os.path.join(self.name, "tiles")
+        manifest = render_tiles(model, directory, layout, tile_size=64)
+        self.assertEqual(manifest, os.path.join(directory, "manifest.json"))
+        with open(manifest) as f:
+            data = json.load(f)
+        self.assertEqual(data["tile_size"], 64)
+        self.assertEqual(data["tiles"], "{level}/{column}_{row}.png")
+        for level in data["levels"]:
+            for column in range(level["columns"]):
+                for row in range(level["rows"]):
+                    tile = data["tiles"].format(level=level["level"], column=column, row=row)
+                    self.assertTrue(os.path.exists(os.path.join(directory, tile)))
+        self.assertFalse(os.path.exists(os.path.join(directory, "tiles.gv")))
+
+    def test_tiles_outformat(self):
+        cache = LayoutCache(os.path.join(self.name, "cache"))
+        model = self._model("big")
+        cache.put(model, parse_layout(model, _json_output(model)))
+        filename = os.path.join(self.name, "big")
+        with Diagram(name=filename, outformat="tiles", show=False, layout_cache=cache):
+            with Cluster("DB"):
+                db = RDS("rds")
+            EC2("web") >> db
+        self.assertTrue(os.path.exists(os.path.join(f"{filename}_tiles", "manifest.json")))
+        self.assertTrue(os.path.exists(os.path.join(f"{filename}_tiles", "0", "0_0.png")))
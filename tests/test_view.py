@@ -0,0 +1,57 @@
+import unittest
+
+from diagrams.spec import build
+from diagrams.view import ModelIndex
+
+
+class ModelIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.model = build(
+            {
+                "name": "Inventory",
+                "clusters": [{"id": "db", "label": "DB"}, {"id": "web", "label": "Web"}],
+                "nodes": [
+                    {"id": "dns", "class": "aws.network.Route53"},
+                    {"id": "lb", "class": "aws.network.ELB", "tags": ["edge"]},
+                    {"id": "web1", "class": "aws.compute.EC2", "cluster": "web", "tags": ["edge", "web"]},
+                    {"id": "rds", "class": "aws.database.RDS", "cluster": "db"},
+                    {"id": "sql", "class": "gcp.database.SQL", "cluster": "db"},
+                ],
+                "edges": [
+                    {"tail": "dns", "head": "lb"},
+                    {"tail": "lb", "head": "web", "forward": True},
+                    {"tail": "web1", "head": "rds"},
+                    {"tail": "web1", "head": "db"},
+                ],
+            }
+        )
+        self.index = ModelIndex(self.model)
+
+    def test_select(self):
+        self.assertEqual(self.index.select(tags="edge"), {"lb", "web1"})
+        self.assertEqual(self.index.select(type="database"), {"rds", "sql"})
+        self.assertEqual(self.index.select(type="aws.database"), {"rds"})
+        self.assertEqual(self.index.select(provider="aws", type=["database", "compute"]), {"web1", "rds"})
+        self.assertEqual(self.index.select(cls="aws.network.ELB"), {"lb"})
+        self.assertEqual(len(self.index.select()), 5)
+
+    def test_neighbourhood(self):
+        self.assertEqual(self.index.neighbourhood(["lb"], hops=0), {"lb"})
+        self.assertEqual(self.index.neighbourhood(["lb"]), {"dns", "lb", "web1"})
+        self.assertEqual(self.index.neighbourhood(["dns"], hops=2), {"dns", "lb", "web1"})
+        self.assertEqual(self.index.neighbourhood(["dns"], hops=3), {"dns", "lb", "web1", "rds"})
+
+    def test_view(self):
+        view = self.index.view(self.index.select(tags="edge"), name="Edge Services")
+        self.assertEqual(view.filename, "edge_services")
+        self.assertEqual(view.graph_attr["label"], "Edge Services")
+        self.assertEqual([n.id for n in view.nodes], ["lb", "web1"])
+        self.assertEqual([c.id for c in view.clusters], ["cluster_web"])
+        self.assertEqual([(e.tail, e.head) for e in view.edges], [("lb", "web1")])
+        self.assertEqual(view.edges[0].attrs["lhead"], "cluster_web")
+
+    def test_view_drops_clipping_at_missing_cluster(self):
+        view = self.index.view({"web1", "rds"})
+        self.assertEqual([c.id for c in view.clusters], ["cluster_db", "cluster_web"])
+        view = self.index.view({"web1", "lb"})
+        self.assertEqual(view.edges[0].attrs["lhead"], "cluster_web")